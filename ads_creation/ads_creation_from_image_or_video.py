@@ -1,3 +1,4 @@
+import argparse
 import json
 import logging
 import os
@@ -15,7 +16,10 @@ from facebook_business.adobjects.campaign import Campaign
 from facebook_business.adobjects.targeting import Targeting
 from facebook_business.adobjects.user import User as AdUser
 from facebook_business.api import FacebookAdsApi
+from constants import apply_graph_url_override
 from facebook_business.exceptions import FacebookRequestError
+from prefetch import prefetch_edge
+from profiling import add_profile_arguments, profiled
 
 logging.basicConfig(level=logging.INFO)
 
@@ -23,6 +27,7 @@ logging.basicConfig(level=logging.INFO)
 class AdsManager:
     def __init__(self, access_token):
         self.access_token = access_token
+        apply_graph_url_override()
         FacebookAdsApi.init(access_token=self.access_token)
 
     def _format_account_id(self, account_id):
@@ -32,10 +37,10 @@ class AdsManager:
     def _get_campaign_by_name(self, ad_account_id, campaign_name):
         """Retrieve a campaign by its name."""
         ad_account = AdAccount(fbid=self._format_account_id(ad_account_id))
-        campaigns = ad_account.get_campaigns(fields=[Campaign.Field.name])
-        for campaign in campaigns:
-            if campaign[Campaign.Field.name] == campaign_name:
-                return campaign
+        with prefetch_edge(ad_account.get_campaigns, fields=[Campaign.Field.name]) as campaigns:
+            for campaign in campaigns:
+                if campaign[Campaign.Field.name] == campaign_name:
+                    return campaign
         return None
 
     def create_image_hash(self, ad_account_id, photo_path):
@@ -155,13 +160,12 @@ class AdsManager:
         campaign = Campaign(fbid=campaign.get_id())
 
         # Search for existing AdSets
-        adsets = campaign.get_ad_sets(fields=[AdSet.Field.name])
-
-        # Check if AdSet already exists
-        for adset in adsets:
-            if adset[AdSet.Field.name] == adset_name:
-                print("AdSet already exists with the name: ", adset_name)
-                return adset
+        with prefetch_edge(campaign.get_ad_sets, fields=[AdSet.Field.name]) as adsets:
+            # Check if AdSet already exists
+            for adset in adsets:
+                if adset[AdSet.Field.name] == adset_name:
+                    print("AdSet already exists with the name: ", adset_name)
+                    return adset
 
         if not target:  # default values can change
             target = {
@@ -207,32 +211,31 @@ class AdsManager:
         ad_account = AdAccount(fbid="act_{}".format(ad_account_id))
 
         # Search for existing campaigns
-        campaigns = ad_account.get_campaigns(fields=[Campaign.Field.name])
-
-        # Iterate over campaigns to find the right one
-        for campaign in campaigns:
-            if campaign[Campaign.Field.name] == campaign_name:
+        with prefetch_edge(ad_account.get_campaigns, fields=[Campaign.Field.name]) as campaigns:
+            # Iterate over campaigns to find the right one
+            for campaign in campaigns:
+                if campaign[Campaign.Field.name] != campaign_name:
+                    continue
                 # Found the campaign, now look for AdSet
-                adsets = campaign.get_ad_sets(fields=[AdSet.Field.name])
-
-                # Check if AdSet with provided name exists
-                for adset in adsets:
-                    if adset[AdSet.Field.name] == adset_name:
-                        try:
-                            adset.api_delete()
-                            print(f"AdSet with name {adset_name} deleted successfully.")
-                            return True
-                        except FacebookRequestError as e:
-                            print("Failed to delete AdSet: ", e)
-                            return False
+                with prefetch_edge(campaign.get_ad_sets, fields=[AdSet.Field.name]) as adsets:
+                    # Check if AdSet with provided name exists
+                    for adset in adsets:
+                        if adset[AdSet.Field.name] == adset_name:
+                            try:
+                                adset.api_delete()
+                                print(f"AdSet with name {adset_name} deleted successfully.")
+                                return True
+                            except FacebookRequestError as e:
+                                print("Failed to delete AdSet: ", e)
+                                return False
 
         print(f"No AdSet found with name {adset_name} under campaign {campaign_name}.")
         return False
 
     def _get_matching_ads(self, adset, ad_name):
         """Retrieve existing Ads with the given name."""
-        existing_ads = AdSet(fbid=adset.get_id()).get_ads(fields=[Ad.Field.name])
-        return [ad for ad in existing_ads if ad[Ad.Field.name] == ad_name]
+        with prefetch_edge(AdSet(fbid=adset.get_id()).get_ads, fields=[Ad.Field.name]) as existing_ads:
+            return [ad for ad in existing_ads if ad[Ad.Field.name] == ad_name]
 
     def _create_ad(self, ad_account_id, adset, ad_name, ad_creative):
         """Create and return a new Ad instance.
@@ -339,12 +342,11 @@ class AdsManager:
         Returns:
             str: The hash of the uploaded image.
         """
-        ad_account = AdAccount(fbid=self._format_account_id(ad_account_id))
-        # image = AdImage(parent_id='act_{}'.format(ad_account_id))
-        image = ad_account.create_ad_image(params={"filename": image_path})
-        # image[AdImage.Field.filename] = image_path
-        # image.remote_create()
-        return image["hash"]
+        # remote_create uploads the file; a filename param alone would only send its path
+        image = AdImage(parent_id=self._format_account_id(ad_account_id))
+        image[AdImage.Field.filename] = image_path
+        image.remote_create()
+        return image[AdImage.Field.hash]
 
     def _upload_video(self, ad_account_id, video_path):
         """Create a video and return its ID.
@@ -356,15 +358,11 @@ class AdsManager:
         Returns:
             int: The ID of the created video.
         """
-        ad_account = AdAccount(fbid=self._format_account_id(ad_account_id))
-        video = ad_account.create_ad_video(
-            params={"names": os.path.basename(video_path), "source": video_path}
-        )
-
-        # video = AdVideo(parent_id='act_{}'.format(ad_account_id))
-        # video[AdVideo.Field.name] = os.path.basename(video_path)
-        # video[AdVideo.Field.filepath] = video_path
-        # video.remote_create()
+        # remote_create uploads in chunks through the SDK's video uploader
+        video = AdVideo(parent_id=self._format_account_id(ad_account_id))
+        video[AdVideo.Field.name] = os.path.basename(video_path)
+        video[AdVideo.Field.filepath] = video_path
+        video.remote_create()
         video_id = video.get_id()
         print("video successfully created {}".format(video_id))
         return video_id
@@ -425,7 +423,14 @@ PAGE_ID = ""
 PIXEL_ID = ""
 
 
-if __name__ == "__main__":
+def parse_arguments():
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(description="Create a sales campaign with an image ad and a video ad.")
+    add_profile_arguments(parser)
+    return parser.parse_args()
+
+
+def main():
     ads_manager = AdsManager(ACCESS_TOKEN)
 
     # how to create a manual sales campaign with age, gender, country and budget setting
@@ -483,3 +488,9 @@ if __name__ == "__main__":
         thumb_nail_image,
         video_path,
     )
+
+
+if __name__ == "__main__":
+    args = parse_arguments()
+    with profiled(args.profile, output_dir=args.profile_dir):
+        main()
@@ -6,6 +6,7 @@ This script creates ads from a CSV file. For the example CSV file, the output st
 - Campaign 4: 1-2-*
 """
 
+import argparse
 import csv
 import sys
 import time
@@ -22,118 +23,139 @@ from constants import (
     APP_ID as app_id,
     APP_SECRET as app_secret,
     PAGE_ID as page_id,
+    apply_graph_url_override,
 )
 from demo_utils import print_and_log
+from profiling import add_profile_arguments, profiled
 from facebook_business.adobjects.ad import Ad
-from facebook_business.adobjects.adaccount import AdAccount
 from facebook_business.adobjects.adcreative import AdCreative
 from facebook_business.adobjects.adset import AdSet
 from facebook_business.adobjects.campaign import Campaign
 from facebook_business.api import FacebookAdsApi
+from facebook_business.exceptions import FacebookRequestError
+from graph_batch import GraphBatch
 from test_creds import LL_ACCESS_TOKEN as access_token
 
-# Initialize the Facebook API
-FacebookAdsApi.init(app_id, app_secret, access_token)
-
 RUN_ID = str(abs(hash(time.time())))[:8]
 
-print_and_log(RUN_ID, "Ad setup from csv beginning.")
-
-
-# Read the CSV file and build the hierarchy
-hierarchy = {}
-with open("demo_input.csv", mode="r") as file:
-    reader = csv.DictReader(file)
-    for row in reader:
-        obj_type = row["type"]
-        identifier = row["identifier"]
-        name = row["name"]
-        parent_identifier = row["parent_identifier"]
-
-        if obj_type == "CAMPAIGN":
-            hierarchy[identifier] = {"name": name, "adsets": {}}
-        elif obj_type == "ADSET":
-            hierarchy[parent_identifier]["adsets"][identifier] = {
-                "name": name,
-                "ads": [],
-            }
-        elif obj_type == "AD":
-            for campaign in hierarchy.values():
-                if parent_identifier in campaign["adsets"]:
-                    campaign["adsets"][parent_identifier]["ads"].append(name)
-
-# Create campaigns, ad sets, and ads based on the hierarchy
-for campaign_id, campaign_data in hierarchy.items():
-    campaign_params = {
-        Campaign.Field.name: campaign_data["name"],
-        Campaign.Field.objective: Campaign.Objective.outcome_sales,
-        Campaign.Field.status: "PAUSED",
-        Campaign.Field.special_ad_categories: [],
-    }
-
-    campaign = AdAccount(ad_account_id).create_campaign(
-        fields=[],
-        params=campaign_params,
-    )
-    print_and_log(RUN_ID, f"Campaign {campaign.get_id()} created.")
-
-    for adset_id, adset_data in campaign_data["adsets"].items():
-        adset_params = {
-            AdSet.Field.name: adset_data["name"],
-            AdSet.Field.campaign_id: campaign.get_id(),
-            AdSet.Field.daily_budget: 100,
-            AdSet.Field.billing_event: AdSet.BillingEvent.impressions,
-            AdSet.Field.optimization_goal: AdSet.OptimizationGoal.reach,
-            AdSet.Field.bid_strategy: AdSet.BidStrategy.lowest_cost_without_cap,
-            AdSet.Field.targeting: {
-                "geo_locations": {
-                    "countries": ["US"],
-                },
-            },
-            AdSet.Field.status: AdSet.Status.paused,
+
+def parse_arguments():
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(description="Create campaigns, ad sets and ads from demo_input.csv.")
+    add_profile_arguments(parser)
+    return parser.parse_args()
+
+
+def main():
+    # Initialize the Facebook API
+    apply_graph_url_override()
+    FacebookAdsApi.init(app_id, app_secret, access_token)
+
+    print_and_log(RUN_ID, "Ad setup from csv beginning.")
+
+    # Read the CSV file and build the hierarchy
+    hierarchy = {}
+    with open("demo_input.csv", mode="r") as file:
+        reader = csv.DictReader(file)
+        for row in reader:
+            obj_type = row["type"]
+            identifier = row["identifier"]
+            name = row["name"]
+            parent_identifier = row["parent_identifier"]
+
+            if obj_type == "CAMPAIGN":
+                hierarchy[identifier] = {"name": name, "adsets": {}}
+            elif obj_type == "ADSET":
+                hierarchy[parent_identifier]["adsets"][identifier] = {
+                    "name": name,
+                    "ads": [],
+                }
+            elif obj_type == "AD":
+                for campaign in hierarchy.values():
+                    if parent_identifier in campaign["adsets"]:
+                        campaign["adsets"][parent_identifier]["ads"].append(name)
+
+    # Queue campaigns, ad sets, and ads based on the hierarchy. Children reference their
+    # parents inside the batch, so the whole hierarchy goes out in as few round trips as possible
+    batch = GraphBatch()
+    queued = []
+    for campaign_id, campaign_data in hierarchy.items():
+        campaign_params = {
+            Campaign.Field.name: campaign_data["name"],
+            Campaign.Field.objective: Campaign.Objective.outcome_sales,
+            Campaign.Field.status: "PAUSED",
+            Campaign.Field.special_ad_categories: [],
         }
-        ad_set = AdAccount(ad_account_id).create_ad_set(
-            fields=[],
-            params=adset_params,
-        )
-        adset_id = ad_set.get_id()
-        print_and_log(RUN_ID, f"Ad set {adset_id} created.")
-
-        for ad_name in adset_data["ads"]:
-            creative_params = {
-                AdCreative.Field.name: ad_name,
-                AdCreative.Field.object_story_spec: {
-                    "page_id": page_id,
-                    "link_data": {
-                        "image_hash": "bf6823a7c358936b7a99e9a2efc78fc6",
-                        "link": "https://scontent-sjc3-1.xx.fbcdn.net/v/t45.1600-4/474708412_120216956652780558_5968519555980627928_n.png?stp=dst-jpg_tt6&_nc_cat=101&ccb=1-7&_nc_sid=890911&_nc_ohc=_5CLqLZ2zn0Q7kNvgHHQCrj&_nc_zt=1&_nc_ht=scontent",
-                        "message": "Check out our website!",
+
+        campaign = batch.add("POST", f"{ad_account_id}/campaigns", campaign_params)
+        queued.append(("Campaign", campaign_data["name"], campaign))
+
+        for adset_id, adset_data in campaign_data["adsets"].items():
+            adset_params = {
+                AdSet.Field.name: adset_data["name"],
+                AdSet.Field.campaign_id: batch.ref(campaign),
+                AdSet.Field.daily_budget: 100,
+                AdSet.Field.billing_event: AdSet.BillingEvent.impressions,
+                AdSet.Field.optimization_goal: AdSet.OptimizationGoal.reach,
+                AdSet.Field.bid_strategy: AdSet.BidStrategy.lowest_cost_without_cap,
+                AdSet.Field.targeting: {
+                    "geo_locations": {
+                        "countries": ["US"],
                     },
                 },
-                AdCreative.Field.degrees_of_freedom_spec: {
-                    "creative_features_spec": {
-                        "standard_enhancements": {"enroll_status": "OPT_IN"}
-                    }
-                },
-            }
-            creative = AdAccount(ad_account_id).create_ad_creative(
-                fields=[],
-                params=creative_params,
-            )
-            print_and_log(RUN_ID, f"Creative {creative.get_id()} created.")
-
-            params = {
-                Ad.Field.name: ad_name,
-                Ad.Field.adset_id: ad_set.get_id(),
-                Ad.Field.creative: {
-                    "creative_id": creative.get_id(),
-                },
-                Ad.Field.status: Ad.Status.paused,
+                AdSet.Field.status: AdSet.Status.paused,
             }
-            ad = AdAccount(ad_account_id).create_ad(
-                fields=[],
-                params=params,
-            )
-            print_and_log(RUN_ID, f"Ad {ad.get_id()} created.")
+            ad_set = batch.add("POST", f"{ad_account_id}/adsets", adset_params)
+            queued.append(("Ad set", adset_data["name"], ad_set))
+
+            for ad_name in adset_data["ads"]:
+                creative_params = {
+                    AdCreative.Field.name: ad_name,
+                    AdCreative.Field.object_story_spec: {
+                        "page_id": page_id,
+                        "link_data": {
+                            "image_hash": "bf6823a7c358936b7a99e9a2efc78fc6",
+                            "link": "https://scontent-sjc3-1.xx.fbcdn.net/v/t45.1600-4/474708412_120216956652780558_5968519555980627928_n.png?stp=dst-jpg_tt6&_nc_cat=101&ccb=1-7&_nc_sid=890911&_nc_ohc=_5CLqLZ2zn0Q7kNvgHHQCrj&_nc_zt=1&_nc_ht=scontent",
+                            "message": "Check out our website!",
+                        },
+                    },
+                    AdCreative.Field.degrees_of_freedom_spec: {
+                        "creative_features_spec": {
+                            "standard_enhancements": {"enroll_status": "OPT_IN"}
+                        }
+                    },
+                }
+                creative = batch.add("POST", f"{ad_account_id}/adcreatives", creative_params)
+                queued.append(("Creative", ad_name, creative))
+
+                params = {
+                    Ad.Field.name: ad_name,
+                    Ad.Field.adset_id: batch.ref(ad_set),
+                    Ad.Field.creative: {
+                        "creative_id": batch.ref(creative),
+                    },
+                    Ad.Field.status: Ad.Status.paused,
+                }
+                ad = batch.add("POST", f"{ad_account_id}/ads", params)
+                queued.append(("Ad", ad_name, ad))
+
+    try:
+        batch.execute()
+    except FacebookRequestError as e:
+        print_and_log(RUN_ID, f"Error creating ads from csv: {e.api_error_message()}")
+
+    for label, name, result in queued:
+        if result.is_success():
+            print_and_log(RUN_ID, f"{label} {result.get_id()} created.")
+        elif result.executed:
+            print_and_log(RUN_ID, f"Error creating {label.lower()} {name}: {result.error().api_error_message()}")
+        else:
+            print_and_log(RUN_ID, f"{label} {name} was not created: its parent or its batch request failed.")
+
+    print_and_log(RUN_ID, "Ad setup from csv complete")
+
 
-print_and_log(RUN_ID, "Ad setup from csv complete") 
\ No newline at end of file
+if __name__ == "__main__":
+    args = parse_arguments()
+    with profiled(args.profile, RUN_ID, args.profile_dir):
+        main()
@@ -3,6 +3,7 @@ This script demonstrates common configurations for sales campaigns that advertis
 It reads campaign configurations from a CSV file and creates campaigns accordingly.
 """
 
+import argparse
 import csv
 import sys
 import time
@@ -19,25 +20,28 @@ from constants import (
     APP_ID as app_id,
     APP_SECRET as app_secret,
     PAGE_ID as page_id,
+    apply_graph_url_override,
 )
 from demo_utils import print_and_log
+from profiling import add_profile_arguments, profiled
 from facebook_business.adobjects.ad import Ad
-from facebook_business.adobjects.adaccount import AdAccount
 from facebook_business.adobjects.adcreative import AdCreative
 from facebook_business.adobjects.adset import AdSet
 from facebook_business.adobjects.campaign import Campaign
 from facebook_business.api import FacebookAdsApi
+from facebook_business.exceptions import FacebookRequestError
+from graph_batch import GraphBatch
 from test_creds import LL_ACCESS_TOKEN as access_token
 
-# Initialize the Facebook API
-FacebookAdsApi.init(app_id, app_secret, access_token)
-
 RUN_ID = str(abs(hash(time.time())))[:8]
 
-print_and_log(RUN_ID, "Sales campaign configuration demo beginning.")
 
-def create_campaign_from_config(config):
-    """Create a campaign, ad set, creative, and ad from a configuration dictionary."""
+def create_campaign_from_config(config, batch):
+    """
+    Queue a campaign, ad set, creative, and ad from a configuration dictionary.
+    The four objects reference each other inside the batch, so the whole chain
+    is created in a single round trip.
+    """
     
     # 1. Campaign Configuration
     campaign_params = {
@@ -51,16 +55,12 @@ def create_campaign_from_config(config):
         },
     }
 
-    campaign = AdAccount(ad_account_id).create_campaign(
-        fields=[],
-        params=campaign_params,
-    )
-    print_and_log(RUN_ID, f"Campaign {campaign.get_id()} created.")
+    campaign = batch.add("POST", f"{ad_account_id}/campaigns", campaign_params)
 
     # 2. Ad Set Configuration
     adset_params = {
         AdSet.Field.name: f"Ad Set for {config['campaign_name']} {RUN_ID}",
-        AdSet.Field.campaign_id: campaign.get_id(),
+        AdSet.Field.campaign_id: batch.ref(campaign),
         AdSet.Field.daily_budget: int(config['daily_budget']),
         AdSet.Field.billing_event: AdSet.BillingEvent.impressions,
         AdSet.Field.optimization_goal: AdSet.OptimizationGoal.conversion,
@@ -81,11 +81,7 @@ def create_campaign_from_config(config):
         AdSet.Field.status: AdSet.Status.paused,
     }
 
-    ad_set = AdAccount(ad_account_id).create_ad_set(
-        fields=[],
-        params=adset_params,
-    )
-    print_and_log(RUN_ID, f"Ad set {ad_set.get_id()} created.")
+    ad_set = batch.add("POST", f"{ad_account_id}/adsets", adset_params)
 
     # 3. Creative Configuration
     creative_params = {
@@ -111,18 +107,14 @@ def create_campaign_from_config(config):
         },
     }
 
-    creative = AdAccount(ad_account_id).create_ad_creative(
-        fields=[],
-        params=creative_params,
-    )
-    print_and_log(RUN_ID, f"Creative {creative.get_id()} created.")
+    creative = batch.add("POST", f"{ad_account_id}/adcreatives", creative_params)
 
     # 4. Ad Configuration
     ad_params = {
         Ad.Field.name: f"Ad for {config['campaign_name']} {RUN_ID}",
-        Ad.Field.adset_id: ad_set.get_id(),
+        Ad.Field.adset_id: batch.ref(ad_set),
         Ad.Field.creative: {
-            "creative_id": creative.get_id(),
+            "creative_id": batch.ref(creative),
         },
         Ad.Field.tracking_specs: [
             {
@@ -141,19 +133,57 @@ def create_campaign_from_config(config):
         Ad.Field.priority: 1,
     }
 
-    ad = AdAccount(ad_account_id).create_ad(
-        fields=[],
-        params=ad_params,
-    )
-    print_and_log(RUN_ID, f"Ad {ad.get_id()} created.")
+    ad = batch.add("POST", f"{ad_account_id}/ads", ad_params)
+
+    return {"Campaign": campaign, "Ad set": ad_set, "Creative": creative, "Ad": ad}
 
 # Read configurations from CSV and create campaigns
-with open("campaign_configs.csv", mode="r") as file:
-    reader = csv.DictReader(file)
-    for config in reader:
-        try:
-            create_campaign_from_config(config)
-        except Exception as e:
-            print_and_log(RUN_ID, f"Error creating campaign {config['campaign_name']}: {str(e)}")
-
-print_and_log(RUN_ID, "Sales campaign configuration demo complete.") 
\ No newline at end of file
+
+
+def parse_arguments():
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(description="Create sales campaigns from campaign_configs.csv.")
+    add_profile_arguments(parser)
+    return parser.parse_args()
+
+
+def main():
+    # Initialize the Facebook API
+    apply_graph_url_override()
+    FacebookAdsApi.init(app_id, app_secret, access_token)
+
+    print_and_log(RUN_ID, "Sales campaign configuration demo beginning.")
+
+    batch = GraphBatch()
+    queued = []
+    with open("campaign_configs.csv", mode="r") as file:
+        reader = csv.DictReader(file)
+        for config in reader:
+            try:
+                queued.append((config, create_campaign_from_config(config, batch)))
+            except Exception as e:
+                print_and_log(RUN_ID, f"Error creating campaign {config['campaign_name']}: {str(e)}")
+
+    try:
+        batch.execute()
+    except FacebookRequestError as e:
+        print_and_log(RUN_ID, f"Error creating campaigns: {e.api_error_message()}")
+
+    for config, results in queued:
+        for label, result in results.items():
+            if result.is_success():
+                print_and_log(RUN_ID, f"{label} {result.get_id()} created.")
+            elif not result.executed:
+                print_and_log(RUN_ID, f"Error creating campaign {config['campaign_name']}: {label} was not created.")
+                break
+            else:
+                print_and_log(RUN_ID, f"Error creating campaign {config['campaign_name']}: {label} failed: {result.error().api_error_message()}")
+                break
+
+    print_and_log(RUN_ID, "Sales campaign configuration demo complete.")
+
+
+if __name__ == "__main__":
+    args = parse_arguments()
+    with profiled(args.profile, RUN_ID, args.profile_dir):
+        main()
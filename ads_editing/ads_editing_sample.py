@@ -1,3 +1,4 @@
+import argparse
 import sys
 import time
 
@@ -9,24 +10,17 @@ sys.path.append(
 )  # same as above
 sys.path.append("..")  # Add parent directory to path for imports
 
-from utils.constants import (
-    AD_ACCOUNT_ID as ad_account_id,
-    APP_ID as app_id,
-    APP_SECRET as app_secret,
-    PAGE_ID as page_id,
-)
+from utils import constants, test_creds
+from utils.constants import apply_graph_url_override
 from utils.demo_utils import print_and_log
+from utils.profiling import add_profile_arguments, profiled
 from facebook_business.adobjects.adset import AdSet
 from facebook_business.api import FacebookAdsApi
 from facebook_business.exceptions import FacebookRequestError
-from utils.test_creds import LL_ACCESS_TOKEN as access_token
+from utils.graph_batch import GraphBatch
 
-# Initialize the Facebook API
-sdk = FacebookAdsApi.init(app_id, app_secret, access_token)
 RUN_ID = str(abs(hash(time.time())))[:8]
 
-print_and_log(RUN_ID, "Interpreter beginning.")
-
 
 def load_adset_ids_from_input():
     user_input = input("Enter ad set IDs as a CSV of integers: ").strip()
@@ -38,6 +32,28 @@ def load_adset_ids_from_input():
     return adset_ids
 
 
+def update_adsets(adset_ids, params, success_message, field_label):
+    """Apply the same update to every ad set with one batch request per 50 ad sets."""
+    batch = GraphBatch()
+    for adset_id in adset_ids:
+        batch.add("POST", str(adset_id), params)
+
+    try:
+        results = batch.execute()
+    except FacebookRequestError as e:
+        print_and_log(RUN_ID, f"Failed to update ad sets {field_label}: {e.api_error_message()}")
+        return
+
+    for adset_id, result in zip(adset_ids, results):
+        if result.is_success():
+            print_and_log(RUN_ID, f"Ad set {adset_id} {success_message}")
+        else:
+            print_and_log(
+                RUN_ID,
+                f"Failed to update ad set {adset_id} {field_label}: {result.error().api_error_message()}",
+            )
+
+
 def interpreter_loop(adset_ids):
     while True:
         command = input(
@@ -60,20 +76,12 @@ def interpreter_loop(adset_ids):
                 # DEMO MEAT START
                 # ----------------
                 new_budget = int(value)
-                for adset_id in adset_ids:
-                    try:
-                        adset = AdSet(adset_id).api_update(
-                            params={AdSet.Field.daily_budget: new_budget}
-                        )
-                        print_and_log(
-                            RUN_ID,
-                            f"Ad set {adset_id} daily budget updated to {new_budget}",
-                        )
-                    except FacebookRequestError as e:
-                        print_and_log(
-                            RUN_ID,
-                            f"Failed to update ad set {adset_id} daily budget: {e.api_error_message()}",
-                        )
+                update_adsets(
+                    adset_ids,
+                    {AdSet.Field.daily_budget: new_budget},
+                    f"daily budget updated to {new_budget}",
+                    "daily budget",
+                )
             # ----------------
             # DEMO MEAT END
             # ----------------
@@ -84,21 +92,12 @@ def interpreter_loop(adset_ids):
                 # ----------------
                 # DEMO MEAT START
                 # ----------------
-                for adset_id in adset_ids:
-                    try:
-                        adset = AdSet(adset_id).api_update(
-                            params={
-                                AdSet.Field.status: value.upper()  # 'ACTIVE' or 'INACTIVE'
-                            }
-                        )
-                        print_and_log(
-                            RUN_ID, f"Ad set {adset_id} status updated to {value}"
-                        )
-                    except FacebookRequestError as e:
-                        print_and_log(
-                            RUN_ID,
-                            f"Failed to update ad set {adset_id} status: {e.api_error_message()}",
-                        )
+                update_adsets(
+                    adset_ids,
+                    {AdSet.Field.status: value.upper()},  # 'ACTIVE' or 'INACTIVE'
+                    f"status updated to {value}",
+                    "status",
+                )
             # ----------------
             # DEMO MEAT END
             # ----------------
@@ -110,7 +109,26 @@ def interpreter_loop(adset_ids):
             print_and_log(RUN_ID, "Unknown command. Please try again.")
 
 
-# Example usage
-adset_ids = load_adset_ids_from_input()
-if adset_ids:
-    interpreter_loop(adset_ids)
+def parse_arguments():
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(description="Edit the budget or status of ad sets interactively.")
+    add_profile_arguments(parser)
+    return parser.parse_args()
+
+
+def main():
+    # Initialize the Facebook API
+    apply_graph_url_override()
+    FacebookAdsApi.init(constants.APP_ID, constants.APP_SECRET, test_creds.LL_ACCESS_TOKEN)
+    print_and_log(RUN_ID, "Interpreter beginning.")
+
+    # Example usage
+    adset_ids = load_adset_ids_from_input()
+    if adset_ids:
+        interpreter_loop(adset_ids)
+
+
+if __name__ == "__main__":
+    args = parse_arguments()
+    with profiled(args.profile, RUN_ID, args.profile_dir):
+        main()
@@ -1,3 +1,4 @@
+import argparse
 import sys
 import os
 import random
@@ -12,12 +13,9 @@ script_dir = os.path.dirname(os.path.abspath(__file__))
 project_root = os.path.dirname(script_dir)
 sys.path.insert(0, project_root)
 
-from utils.constants import (
-    AD_ACCOUNT_ID as ad_account_id,
-    APP_ID as app_id,
-    APP_SECRET as app_secret,
-)
-from utils.test_creds import LL_ACCESS_TOKEN as access_token
+from utils import constants, test_creds
+from utils.constants import apply_graph_url_override
+from utils.profiling import add_profile_arguments, profiled
 
 def create_random_image(size=(1080, 1080)):
     # Create a new image with a random background color
@@ -37,17 +35,17 @@ def create_random_image(size=(1080, 1080)):
             random.randint(0, 255)
         )
         # Draw a random rectangle
-        x1 = random.randint(0, size[0])
-        y1 = random.randint(0, size[1])
-        x2 = random.randint(0, size[0])
-        y2 = random.randint(0, size[1])
+        # Pillow requires the corners in order
+        x1, x2 = sorted((random.randint(0, size[0]), random.randint(0, size[0])))
+        y1, y2 = sorted((random.randint(0, size[1]), random.randint(0, size[1])))
         draw.rectangle([x1, y1, x2, y2], fill=shape_color)
     
     return image
 
 def upload_image_to_facebook():
     # Initialize the Facebook API
-    FacebookAdsApi.init(app_id, app_secret, access_token)
+    apply_graph_url_override()
+    FacebookAdsApi.init(constants.APP_ID, constants.APP_SECRET, test_creds.LL_ACCESS_TOKEN)
     
     # Create and save the random image
     image = create_random_image()
@@ -56,7 +54,7 @@ def upload_image_to_facebook():
     
     try:
         # Create the image object
-        image = AdImage(parent_id=ad_account_id)
+        image = AdImage(parent_id=constants.AD_ACCOUNT_ID)
         
         # Upload the image
         image[AdImage.Field.filename] = temp_image_path
@@ -78,5 +76,13 @@ def upload_image_to_facebook():
         if os.path.exists(temp_image_path):
             os.remove(temp_image_path)
 
+def parse_arguments():
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(description="Upload a randomly generated image to the ad account.")
+    add_profile_arguments(parser)
+    return parser.parse_args()
+
 if __name__ == "__main__":
-    upload_image_to_facebook() 
\ No newline at end of file
+    args = parse_arguments()
+    with profiled(args.profile, output_dir=args.profile_dir):
+        upload_image_to_facebook()
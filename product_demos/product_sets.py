@@ -49,6 +49,7 @@ Keys
     ];
 """
 
+import argparse
 import sys
 import time
 
@@ -60,25 +61,16 @@ sys.path.append(
 )  # same as above
 sys.path.append("..")
 
-from utils.constants import (
-    APP_ID as app_id,
-    APP_SECRET as app_secret,
-    CATALOG_ID as catalog_id,
-)
+from utils import constants, test_creds
+from utils.constants import apply_graph_url_override
 from utils.demo_utils import print_and_log
+from utils.profiling import add_profile_arguments, profiled
 from facebook_business.adobjects.productcatalog import ProductCatalog
 from facebook_business.adobjects.productset import ProductSet
 from facebook_business.api import FacebookAdsApi
-from utils.test_creds import LL_ACCESS_TOKEN as access_token
-
-
-# Initialize the Facebook API
-FacebookAdsApi.init(app_id, app_secret, access_token)
 
 RUN_ID = str(abs(hash(time.time())))[:8]
 
-print_and_log(RUN_ID, "Product set creation beginning.")
-
 
 def create_product_set(catalog_id, product_set_name, skus):
     catalog = ProductCatalog(catalog_id)
@@ -90,12 +82,31 @@ def create_product_set(catalog_id, product_set_name, skus):
     )
 
 
-# Example usage
-skus_list = [
-    "DRS-MD-BLU-NA",
-    "HAT-XL-PNK-NA",
-    "BAG-XS-BRN-NA",
-]
-create_product_set(catalog_id, "My Product Set", skus_list)
+def parse_arguments():
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(description="Create a product set from a list of SKUs.")
+    add_profile_arguments(parser)
+    return parser.parse_args()
+
+
+def main():
+    # Initialize the Facebook API
+    apply_graph_url_override()
+    FacebookAdsApi.init(constants.APP_ID, constants.APP_SECRET, test_creds.LL_ACCESS_TOKEN)
+    print_and_log(RUN_ID, "Product set creation beginning.")
+
+    # Example usage
+    skus_list = [
+        "DRS-MD-BLU-NA",
+        "HAT-XL-PNK-NA",
+        "BAG-XS-BRN-NA",
+    ]
+    create_product_set(constants.CATALOG_ID, "My Product Set", skus_list)
+
+    print_and_log(RUN_ID, "Product set creation end.")
+
 
-print_and_log(RUN_ID, "Product set creation end.")
+if __name__ == "__main__":
+    args = parse_arguments()
+    with profiled(args.profile, RUN_ID, args.profile_dir):
+        main()
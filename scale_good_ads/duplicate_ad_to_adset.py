@@ -20,12 +20,9 @@ from facebook_business.adobjects.ad import Ad
 from facebook_business.adobjects.adset import AdSet
 from facebook_business.exceptions import FacebookRequestError
 
-from utils.constants import (
-    AD_ACCOUNT_ID as ad_account_id,
-    APP_ID as app_id,
-    APP_SECRET as app_secret,
-)
-from utils.test_creds import LL_ACCESS_TOKEN as access_token
+from utils import constants, test_creds
+from utils.constants import apply_graph_url_override
+from utils.profiling import add_profile_arguments, profiled
 
 def parse_arguments():
     """Parse command line arguments."""
@@ -35,12 +32,14 @@ def parse_arguments():
     parser.add_argument("--suffix", default="(Copy)", help="Suffix to add to the copied ad name")
     parser.add_argument("--status", choices=["active", "paused"], default="active", 
                        help="Status for the duplicated ad (active or paused)")
+    add_profile_arguments(parser)
     return parser.parse_args()
 
 def duplicate_ad(ad_id, adset_id, suffix="(Copy)", status="active"):
     """Duplicate an ad to a target ad set using the Ad Copy API."""
     # Initialize the Facebook API
-    FacebookAdsApi.init(app_id, app_secret, access_token)
+    apply_graph_url_override()
+    FacebookAdsApi.init(constants.APP_ID, constants.APP_SECRET, test_creds.LL_ACCESS_TOKEN)
     
     try:
         # Get ad and adset names for better logging
@@ -85,4 +84,5 @@ def duplicate_ad(ad_id, adset_id, suffix="(Copy)", status="active"):
 
 if __name__ == "__main__":
     args = parse_arguments()
-    duplicate_ad(args.ad_id, args.adset_id, args.suffix, args.status)
\ No newline at end of file
+    with profiled(args.profile, output_dir=args.profile_dir):
+        duplicate_ad(args.ad_id, args.adset_id, args.suffix, args.status)
\ No newline at end of file
@@ -21,29 +21,24 @@ sys.path.insert(0, project_root)
 from facebook_business.api import FacebookAdsApi
 from facebook_business.adobjects.adaccount import AdAccount
 from facebook_business.adobjects.ad import Ad
-from facebook_business.adobjects.adset import AdSet
 from facebook_business.adobjects.adcreative import AdCreative
 from facebook_business.exceptions import FacebookRequestError
 
-from utils.constants import (
-    AD_ACCOUNT_ID as ad_account_id,
-    APP_ID as app_id,
-    APP_SECRET as app_secret,
-)
-from utils.test_creds import LL_ACCESS_TOKEN as access_token
+from utils import constants, test_creds
+from utils.constants import apply_graph_url_override
+from utils.instrumentation import enable_instrumentation_from_env
+from utils.profiling import add_profile_arguments, profiled
 from utils.demo_utils import print_and_log
+from utils.graph_batch import GraphBatch
+from utils.prefetch import prefetch_edge
 
 # Configuration
 MIN_ROAS_THRESHOLD = 2.5  # Minimum ROAS to consider an ad successful
 DEFAULT_LOOKBACK_DAYS = 7  # Default days to look back for performance metrics
 DEFAULT_TARGET_ADSETS_FILE = os.path.join(script_dir, "target_adsets.txt")
 
-# Initialize the Facebook API
-FacebookAdsApi.init(app_id, app_secret, access_token)
 RUN_ID = str(abs(hash(time.time())))[:8]
 
-print_and_log(RUN_ID, "Starting Scale Good Ads Demo.")
-
 
 def parse_arguments():
     """Parse command line arguments."""
@@ -64,6 +59,7 @@ def parse_arguments():
         "-n", "--dry-run", action="store_true",
         help="Dry run mode (no actual changes will be made)"
     )
+    add_profile_arguments(parser)
     return parser.parse_args()
 
 
@@ -77,23 +73,24 @@ def load_target_adsets(file_path):
     target_adsets = []
     try:
         with open(file_path, 'r') as file:
-            for line in file:
-                adset_id = line.strip()
-                if adset_id and not adset_id.startswith('#'):  # Skip empty lines and comments
-                    # Fetch adset name if possible
-                    adset_name = "Unknown"
-                    try:
-                        adset = AdSet(adset_id).api_get(fields=['name'])
-                        if adset and 'name' in adset:
-                            adset_name = adset['name']
-                    except:
-                        # Continue even if we can't get the name
-                        pass
-                    
-                    target_adsets.append({
-                        'id': adset_id,
-                        'name': adset_name
-                    })
+            adset_ids = [
+                line.strip() for line in file
+                if line.strip() and not line.strip().startswith('#')  # Skip empty lines and comments
+            ]
+
+        # Fetch all adset names in batched requests, continuing even if some can't be read
+        batch = GraphBatch()
+        name_results = [batch.add('GET', adset_id, {'fields': 'name'}) for adset_id in adset_ids]
+        try:
+            batch.execute()
+        except FacebookRequestError:
+            pass
+
+        for adset_id, result in zip(adset_ids, name_results):
+            target_adsets.append({
+                'id': adset_id,
+                'name': result.json().get('name', "Unknown") if result.is_success() else "Unknown"
+            })
     except Exception as e:
         print_and_log(RUN_ID, f"Error loading target ad sets: {str(e)}")
         return []
@@ -103,15 +100,12 @@ def load_target_adsets(file_path):
 
 
 def get_active_ads():
-    """Get all active ads in the account."""
+    """Get all active ads in the account, loading further pages while earlier ads are checked."""
     try:
-        account = AdAccount(ad_account_id)
-        ads = account.get_ads(params={
+        account = AdAccount(constants.AD_ACCOUNT_ID)
+        return prefetch_edge(account.get_ads, params={
             'status': ['ACTIVE'],
-            'limit': 1000,
-        })
-        print_and_log(RUN_ID, f"Found {len(ads)} active ads in account {ad_account_id}")
-        return ads
+        }, page_size=1000)
     except FacebookRequestError as e:
         print_and_log(RUN_ID, f"Error fetching ads: {e.api_error_message()}")
         return []
@@ -226,9 +220,15 @@ def duplicate_ad_to_adset(ad_id, adset_id, adset_name, dry_run=False):
         return False
 
 
-def main():
+def main(args=None):
     """Main entry point for the script."""
-    args = parse_arguments()
+    args = args or parse_arguments()
+
+    # Initialize the Facebook API
+    apply_graph_url_override()
+    FacebookAdsApi.init(constants.APP_ID, constants.APP_SECRET, test_creds.LL_ACCESS_TOKEN)
+    enable_instrumentation_from_env(RUN_ID)
+    print_and_log(RUN_ID, "Starting Scale Good Ads Demo.")
     
     # Load target ad sets
     target_adsets = load_target_adsets(args.file)
@@ -236,17 +236,12 @@ def main():
         print_and_log(RUN_ID, "No target ad sets found. Exiting.")
         return
     
-    # Get active ads
-    active_ads = get_active_ads()
-    if not active_ads:
-        print_and_log(RUN_ID, "No active ads found. Exiting.")
-        return
-    
-    print_and_log(RUN_ID, f"Checking {len(active_ads)} active ads for performance metrics...")
-    
-    # Check performance of each ad
+    # Check performance of each active ad while the next pages load
+    print_and_log(RUN_ID, f"Checking active ads in account {constants.AD_ACCOUNT_ID} for performance metrics...")
     high_performing_ads = []
-    for ad in active_ads:
+    active_ad_count = 0
+    for ad in get_active_ads():
+        active_ad_count += 1
         performance = get_ad_performance(ad['id'], args.days)
         if performance and performance['roas'] >= args.roas:
             high_performing_ads.append({
@@ -255,6 +250,10 @@ def main():
                 'roas': performance['roas'],
             })
     
+    if not active_ad_count:
+        print_and_log(RUN_ID, "No active ads found. Exiting.")
+        return
+    print_and_log(RUN_ID, f"Found {active_ad_count} active ads in account {constants.AD_ACCOUNT_ID}")
     print_and_log(RUN_ID, f"Found {len(high_performing_ads)} ads with ROAS greater than {args.roas}")
     
     # Scale high-performing ads
@@ -278,4 +277,6 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    args = parse_arguments()
+    with profiled(args.profile, RUN_ID, args.profile_dir):
+        main(args)
\ No newline at end of file
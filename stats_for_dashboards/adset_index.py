@@ -0,0 +1,87 @@
+"""
+Local index of the pixel each ad set promotes, for spend attribution.
+
+The index holds one compact adset_id -> pixel_id row per ad set. The first run
+for an ad account lists every ad set with promoted_object expanded. Later runs
+only list the ad sets whose updated_time is after the newest one already in the
+index, so an unchanged account costs one near-empty listing.
+"""
+
+import os
+import sqlite3
+import threading
+from datetime import datetime
+
+DEFAULT_ADSET_INDEX_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".dashboard_adset_index.sqlite"
+)
+
+
+def updated_time_to_timestamp(updated_time):
+    """Converts a Graph API time such as 2024-01-01T12:00:00+0000 to a Unix timestamp."""
+    return int(datetime.strptime(updated_time, "%Y-%m-%dT%H:%M:%S%z").timestamp())
+
+
+class AdSetPixelIndex:
+    """SQLite backed adset_id -> pixel_id index per ad account."""
+
+    def __init__(self, path=DEFAULT_ADSET_INDEX_PATH):
+        self.path = path
+        self._connection = None
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        # Opened on first use so that constructing the index never touches disk
+        if self._connection is None:
+            self._connection = sqlite3.connect(self.path, check_same_thread=False)
+            self._connection.executescript(
+                "CREATE TABLE IF NOT EXISTS adset_pixel ("
+                "ad_account_id TEXT, adset_id TEXT, pixel_id TEXT, "
+                "PRIMARY KEY (ad_account_id, adset_id));"
+                "CREATE TABLE IF NOT EXISTS adset_index_sync ("
+                "ad_account_id TEXT PRIMARY KEY, last_updated_time TEXT);"
+            )
+        return self._connection
+
+    def last_updated_time(self, ad_account_id):
+        """Returns the newest updated_time indexed for an ad account, or None if it was never indexed."""
+        with self._lock:
+            row = self._connect().execute(
+                "SELECT last_updated_time FROM adset_index_sync WHERE ad_account_id = ?", (ad_account_id,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def save(self, ad_account_id, rows):
+        """
+        Adds or replaces ad sets of an ad account
+
+        rows is an iterable of (adset_id, pixel_id, updated_time); pixel_id is None for
+        ad sets that promote no pixel, so they are not listed again until they change.
+        """
+        rows = list(rows)
+        last_updated_time = self.last_updated_time(ad_account_id)
+        for _, _, updated_time in rows:
+            if updated_time and (
+                last_updated_time is None
+                or updated_time_to_timestamp(updated_time) > updated_time_to_timestamp(last_updated_time)
+            ):
+                last_updated_time = updated_time
+
+        with self._lock:
+            connection = self._connect()
+            connection.executemany(
+                "INSERT OR REPLACE INTO adset_pixel VALUES (?, ?, ?)",
+                [(ad_account_id, adset_id, pixel_id) for adset_id, pixel_id, _ in rows],
+            )
+            connection.execute(
+                "INSERT OR REPLACE INTO adset_index_sync VALUES (?, ?)", (ad_account_id, last_updated_time)
+            )
+            connection.commit()
+
+    def get_pixel_map(self, ad_account_id):
+        """Returns {adset_id: pixel_id} for the ad sets of an ad account that promote a pixel."""
+        with self._lock:
+            return dict(self._connect().execute(
+                "SELECT adset_id, pixel_id FROM adset_pixel WHERE ad_account_id = ? AND pixel_id IS NOT NULL",
+                (ad_account_id,),
+            ).fetchall())
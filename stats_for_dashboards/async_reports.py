@@ -0,0 +1,80 @@
+"""
+Asynchronous insights report runs shared by the dashboards.
+
+Report runs for every ad account are submitted up front and then polled
+together on one backoff schedule, so a dashboard waits roughly as long as its
+slowest report rather than the sum of all of them.
+"""
+
+import time
+
+from facebook_business.adobjects.adreportrun import AdReportRun
+
+DEFAULT_POLL_INTERVAL = 2  # Seconds before the first status poll
+MAX_POLL_INTERVAL = 30  # Upper bound for the poll interval while nothing completes
+POLL_BACKOFF = 1.5
+DEFAULT_TIMEOUT = 30 * 60
+
+JOB_COMPLETED = "Job Completed"
+JOB_FAILED_STATUSES = ("Job Failed", "Job Skipped")
+
+
+def submit_report_runs(ad_accounts, params):
+    """
+    Submits one async insights report run per ad account
+
+    Returns (ad_account_id, AdReportRun) pairs in the order of ad_accounts.
+    """
+    return [
+        (ad_account["id"], ad_account.get_insights(params=params, is_async=True))
+        for ad_account in ad_accounts
+    ]
+
+
+def wait_for_report_runs(report_runs, poll_interval=DEFAULT_POLL_INTERVAL, max_poll_interval=MAX_POLL_INTERVAL,
+                         timeout=DEFAULT_TIMEOUT):
+    """
+    Polls report runs on a shared backoff schedule and yields (key, report_run) as each one finishes
+
+    Finished runs are either completed or failed; check report_run[AdReportRun.Field.async_status].
+    The interval grows by POLL_BACKOFF while nothing finishes and resets when a run does.
+    """
+    pending = list(report_runs)
+    interval = poll_interval
+    deadline = time.monotonic() + timeout
+
+    while pending:
+        still_pending = []
+        for key, report_run in pending:
+            report_run.api_get(fields=[
+                AdReportRun.Field.async_status,
+                AdReportRun.Field.async_percent_completion,
+            ])
+            if is_finished(report_run):
+                yield key, report_run
+            else:
+                still_pending.append((key, report_run))
+
+        if not still_pending:
+            return
+        if time.monotonic() + interval > deadline:
+            raise TimeoutError(f"{len(still_pending)} report runs did not finish within {timeout} seconds")
+
+        interval = poll_interval if len(still_pending) < len(pending) else min(interval * POLL_BACKOFF, max_poll_interval)
+        pending = still_pending
+        time.sleep(interval)
+
+
+def is_finished(report_run):
+    return report_run[AdReportRun.Field.async_status] in (JOB_COMPLETED,) + JOB_FAILED_STATUSES
+
+
+def is_completed(report_run):
+    return report_run[AdReportRun.Field.async_status] == JOB_COMPLETED
+
+
+def stream_report_results(report_run, page_size=500):
+    """
+    Iterates the rows of a completed report run, fetching one page at a time
+    """
+    return report_run.get_insights(params={'limit': page_size})
@@ -2,6 +2,7 @@
 This script retrieves catalog health details for a given business portfolio.
 """
 
+import argparse
 import sys
 import time
 
@@ -14,31 +15,121 @@ sys.path.append(
 sys.path.append("..")  # Add parent directory to path for imports
 
 from facebook_business.api import FacebookAdsApi
-from stats_for_dashboards.helpers import get_catalogs_for_business_id, get_stats_for_catalogs
-from utils.constants import (
-    APP_ID as app_id,
-    APP_SECRET as app_secret,
-    BUSINESS_ID as business_id,
+from stats_for_dashboards.catalog_snapshots import CatalogSnapshotStore
+from stats_for_dashboards.export import (
+    CATALOG_HEALTH_SCHEMA,
+    DASHBOARD_FORMATS,
+    LEGACY_CSV_FORMAT,
+    TableWriter,
+    flatten_catalog_health,
+    output_path,
+    write_table,
 )
+from stats_for_dashboards.helpers import (
+    get_catalogs_for_business_id,
+    get_stats_for_catalogs,
+    iter_catalogs_for_business_id,
+    iter_stats_for_catalogs,
+)
+from utils import constants, test_creds
+from utils.constants import apply_graph_url_override
 from utils.demo_utils import print_and_log
-from utils.test_creds import LL_ACCESS_TOKEN as access_token
+from utils.instrumentation import enable_instrumentation_from_env
+from utils.profiling import add_profile_arguments, profiled
+from utils.throttle import enable_throttling
 
-def main():
-    RUN_ID = str(abs(hash(time.time())))[:8]
-    print_and_log(RUN_ID, "Catalog health dashboard beginning.")
-    
-    FacebookAdsApi.init(app_id, app_secret, access_token)
-    catalogs = get_catalogs_for_business_id(business_id, RUN_ID, True)
-    stats = get_stats_for_catalogs(catalogs, RUN_ID, True)
-    
-    # Save catalog and stats
-    with open("catalog_health_dashboard.csv", "w") as f:
+def parse_arguments():
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(description="Build the catalog health dashboard.")
+    parser.add_argument(
+        "--refresh", action="store_true",
+        help="Ignore cached business listings and catalog snapshots and fetch them again"
+    )
+    parser.add_argument(
+        "--format", choices=DASHBOARD_FORMATS, default="csv",
+        help="Output format, written with typed, flattened columns (default: csv); "
+             "csv-legacy writes the old layout with stringified stats and diagnostics"
+    )
+    parser.add_argument(
+        "--stream", action="store_true",
+        help="Stream catalogs page by page into the output file instead of loading them all first"
+    )
+    parser.add_argument(
+        "--max-in-flight", type=int, default=None,
+        help="With --stream, the most catalogs fetched or waiting to be written at once"
+    )
+    add_profile_arguments(parser)
+    args = parser.parse_args()
+    if args.stream and args.format == LEGACY_CSV_FORMAT:
+        parser.error("--stream writes flattened columns and can't be combined with --format csv-legacy")
+    return args
+
+def collect_catalog_health_rows(business_id, run_id, refresh=False):
+    """
+    Returns the flattened CATALOG_HEALTH_SCHEMA rows for one business portfolio
+    """
+    catalogs = get_catalogs_for_business_id(business_id, run_id, refresh=refresh)
+    stats = get_stats_for_catalogs(catalogs, run_id, snapshot_store=CatalogSnapshotStore(), refresh=refresh)
+    return [flatten_catalog_health(catalog["id"], stats[str(catalog["id"])]) for catalog in catalogs]
+
+def write_catalog_health_stream(path, output_format, max_in_flight=None):
+    """
+    Streams catalogs page by page through their stats into an incremental writer
+
+    Only the current page of catalogs and at most max_in_flight stats are held in memory.
+    Every format, csv included, is written with the flattened CATALOG_HEALTH_SCHEMA columns.
+    """
+    catalogs = iter_catalogs_for_business_id(constants.BUSINESS_ID)
+    with TableWriter(path, CATALOG_HEALTH_SCHEMA, output_format) as writer:
+        for catalog_id, catalog_stats in iter_stats_for_catalogs(catalogs, max_in_flight=max_in_flight):
+            writer.write_row(flatten_catalog_health(catalog_id, catalog_stats))
+    return writer.rows_written
+
+def write_legacy_catalog_csv(path, catalogs, stats):
+    """
+    Writes the original catalog health layout, with stats and diagnostics as stringified dicts
+    """
+    with open(path, "w") as f:
         f.write("catalog_id,stats,diagnostics,product_count\n")
         for catalog in catalogs:
             catalog_id = catalog["id"]
             f.write(f"{catalog_id},{stats[catalog_id]['stats']},{stats[catalog_id]['diagnostics']},{stats[catalog_id]['product_count']}\n")
+    return path
+
+def main(refresh=False, output_format="csv", stream=False, max_in_flight=None, run_id=None):
+    RUN_ID = run_id or str(abs(hash(time.time())))[:8]
+    print_and_log(RUN_ID, "Catalog health dashboard beginning.")
+    
+    apply_graph_url_override()
+    FacebookAdsApi.init(constants.APP_ID, constants.APP_SECRET, test_creds.LL_ACCESS_TOKEN)
+    enable_throttling()
+    enable_instrumentation_from_env(RUN_ID)
+    if stream:
+        path = output_path("catalog_health_dashboard", output_format)
+        rows_written = write_catalog_health_stream(path, output_format, max_in_flight)
+        print_and_log(RUN_ID, f"Streamed {rows_written} catalogs to {path}")
+        print_and_log(RUN_ID, "Catalog health dashboard complete")
+        return
+
+    catalogs = get_catalogs_for_business_id(constants.BUSINESS_ID, RUN_ID, True, refresh=refresh)
+    # Only catalogs whose product count or feed uploads changed are fetched again
+    stats = get_stats_for_catalogs(catalogs, RUN_ID, True, snapshot_store=CatalogSnapshotStore(), refresh=refresh)
+    
+    # Save catalog and stats
+    path = output_path("catalog_health_dashboard", output_format)
+    if output_format == LEGACY_CSV_FORMAT:
+        write_legacy_catalog_csv(path, catalogs, stats)
+    else:
+        rows = [flatten_catalog_health(catalog["id"], stats[catalog["id"]]) for catalog in catalogs]
+        write_table(rows, CATALOG_HEALTH_SCHEMA, path, output_format)
+    print_and_log(RUN_ID, f"Wrote {len(catalogs)} catalogs to {path}")
     
     print_and_log(RUN_ID, "Catalog health dashboard complete")
 
 if __name__ == "__main__":
-    main()
+    args = parse_arguments()
+    with profiled(args.profile, output_dir=args.profile_dir) as profile:
+        main(
+            refresh=args.refresh, output_format=args.format, stream=args.stream, max_in_flight=args.max_in_flight,
+            run_id=profile.run_id,
+        )
@@ -0,0 +1,118 @@
+"""
+Local snapshots of catalog health for change detection.
+
+Each catalog's last stats, diagnostics and product count are stored with a
+fingerprint: its product count, its number of feeds and the end time of its
+newest feed upload. A catalog whose fingerprint is unchanged since the
+snapshot is served from the snapshot instead of fetching stats and
+diagnostics again, until the snapshot is older than max_age.
+
+Only the first MAX_FINGERPRINT_FEEDS feeds of a catalog are read for the
+fingerprint. Feeds being added or removed past that still change it through
+the feed count, but a new upload to one of the later feeds does not; such
+catalogs are brought up to date when their snapshot reaches max_age.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+
+DEFAULT_SNAPSHOT_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".dashboard_catalog_snapshots.sqlite"
+)
+
+DEFAULT_MAX_SNAPSHOT_AGE = 24 * 60 * 60  # Seconds before a snapshot is fetched again even if unchanged
+MAX_FINGERPRINT_FEEDS = 100  # Feeds read per catalog for the fingerprint, in one page
+
+# Cheap catalog fields read before deciding whether to fetch stats and diagnostics
+CATALOG_FINGERPRINT_FIELDS = (
+    f"product_count,product_feeds.limit({MAX_FINGERPRINT_FEEDS}).summary(true){{latest_upload{{end_time}}}}"
+)
+
+
+def to_jsonable(value):
+    """Converts SDK objects and cursors in catalog stats to plain dicts and lists."""
+    if hasattr(value, "export_all_data"):
+        return to_jsonable(value.export_all_data())
+    if isinstance(value, dict):
+        return {key: to_jsonable(item) for key, item in value.items()}
+    if isinstance(value, (str, bytes, int, float, bool)) or value is None:
+        return value
+    try:
+        return [to_jsonable(item) for item in value]
+    except TypeError:
+        return str(value)
+
+
+def catalog_fingerprint(expanded):
+    """
+    Builds a fingerprint from a catalog read with CATALOG_FINGERPRINT_FIELDS
+
+    A change in product count or number of feeds, or a new upload to one of the
+    first MAX_FINGERPRINT_FEEDS feeds, changes the fingerprint.
+    """
+    feeds = expanded.get("product_feeds") or {}
+    upload_times = [
+        (feed.get("latest_upload") or {}).get("end_time") or ""
+        for feed in feeds.get("data", [])
+    ]
+    feed_count = (feeds.get("summary") or {}).get("total_count", len(upload_times))
+    return f"{expanded.get('product_count', 0)}|{max(upload_times, default='')}|{feed_count}"
+
+
+class CatalogSnapshotStore:
+    """
+    SQLite backed store of the last catalog stats and their fingerprints
+
+    Snapshots saved more than max_age seconds ago are treated as missing, None keeps them forever.
+    """
+
+    def __init__(self, path=DEFAULT_SNAPSHOT_PATH, max_age=DEFAULT_MAX_SNAPSHOT_AGE, clock=time.time):
+        self.path = path
+        self.max_age = max_age
+        self.clock = clock
+        self._connection = None
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        # Opened on first use so that constructing the store never touches disk
+        if self._connection is None:
+            self._connection = sqlite3.connect(self.path, check_same_thread=False)
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS catalog_snapshot ("
+                "catalog_id TEXT PRIMARY KEY, fingerprint TEXT, stats TEXT, saved_at REAL)"
+            )
+        return self._connection
+
+    def get_many(self, catalog_ids):
+        """Returns {catalog_id: (fingerprint, stats)} for the catalogs that have a snapshot younger than max_age."""
+        catalog_ids = [str(catalog_id) for catalog_id in catalog_ids]
+        saved_after = float("-inf") if self.max_age is None else self.clock() - self.max_age
+        snapshots = {}
+        with self._lock:
+            connection = self._connect()
+            # Stay well under SQLite's limit on bound parameters
+            for start in range(0, len(catalog_ids), 500):
+                chunk = catalog_ids[start:start + 500]
+                rows = connection.execute(
+                    "SELECT catalog_id, fingerprint, stats FROM catalog_snapshot "
+                    f"WHERE catalog_id IN ({','.join('?' * len(chunk))}) AND saved_at >= ?",
+                    chunk + [saved_after],
+                ).fetchall()
+                for catalog_id, fingerprint, stats in rows:
+                    snapshots[catalog_id] = (fingerprint, json.loads(stats))
+        return snapshots
+
+    def save_many(self, snapshots):
+        """Stores (catalog_id, fingerprint, stats) snapshots, replacing older ones."""
+        now = self.clock()
+        rows = [
+            (str(catalog_id), fingerprint, json.dumps(to_jsonable(stats), default=str), now)
+            for catalog_id, fingerprint, stats in snapshots
+        ]
+        with self._lock:
+            connection = self._connect()
+            connection.executemany("INSERT OR REPLACE INTO catalog_snapshot VALUES (?, ?, ?, ?)", rows)
+            connection.commit()
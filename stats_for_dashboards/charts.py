@@ -0,0 +1,86 @@
+"""
+Headless batch chart rendering for the dashboards.
+
+Charts are drawn on off-screen Agg figures, so rendering works on workers
+without a display. matplotlib is only imported once a chart is drawn. A batch
+of charts is split across a process pool, and each worker draws all of its
+charts onto one reused figure:
+
+    charts = [
+        Chart(f"spend_{pixel_id}.png", [("Spend", spend)], title=f"Pixel {pixel_id}")
+        for pixel_id, spend in daily_spend.items()
+    ]
+    render_charts(charts, max_workers=4)
+
+The file format follows the extension of each path (.png or .svg).
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+CHART_FORMATS = ("png", "svg")
+DEFAULT_FIGSIZE = (8, 4.5)  # Inches
+DEFAULT_DPI = 100
+
+
+class Chart:
+    """A line chart: one or more (label, values) series written to path."""
+
+    def __init__(self, path, series, title="", x_label="", y_label=""):
+        self.path = path
+        self.series = [(label, list(values)) for label, values in series]
+        self.title = title
+        self.x_label = x_label
+        self.y_label = y_label
+
+    @property
+    def format(self):
+        chart_format = os.path.splitext(self.path)[1].lstrip(".").lower()
+        if chart_format not in CHART_FORMATS:
+            raise ValueError(f"Unsupported chart format {chart_format!r} for {self.path}, expected one of {CHART_FORMATS}")
+        return chart_format
+
+
+def _render_batch(charts, figsize=DEFAULT_FIGSIZE, dpi=DEFAULT_DPI):
+    """Draws every chart of a batch on one reused off-screen figure and returns their paths."""
+    # Figure without pyplot renders through the Agg canvas, with no GUI backend or global state
+    from matplotlib.figure import Figure
+
+    figure = Figure(figsize=figsize, dpi=dpi)
+    axes = figure.add_subplot()
+    paths = []
+    for chart in charts:
+        axes.clear()
+        for label, values in chart.series:
+            axes.plot(values, label=label)
+        axes.set_title(chart.title)
+        axes.set_xlabel(chart.x_label)
+        axes.set_ylabel(chart.y_label)
+        if any(label for label, _ in chart.series):
+            axes.legend()
+        figure.savefig(chart.path, format=chart.format)
+        paths.append(chart.path)
+    return paths
+
+
+def render_charts(charts, max_workers=None, figsize=DEFAULT_FIGSIZE, dpi=DEFAULT_DPI):
+    """
+    Renders charts across up to max_workers processes and returns their paths in input order
+
+    Charts are rendered in the calling process when max_workers is 1 or there is a single chart.
+    """
+    charts = list(charts)
+    if not charts:
+        return []
+    for chart in charts:
+        chart.format  # Fail on unsupported formats before starting any worker
+    max_workers = min(max_workers or os.cpu_count() or 1, len(charts))
+    if max_workers <= 1:
+        return _render_batch(charts, figsize, dpi)
+
+    # Contiguous batches keep the output order and give each worker one figure
+    batch_size = -(-len(charts) // max_workers)
+    batches = [charts[i:i + batch_size] for i in range(0, len(charts), batch_size)]
+    with ProcessPoolExecutor(max_workers=len(batches)) as pool:
+        results = pool.map(_render_batch, batches, [figsize] * len(batches), [dpi] * len(batches))
+        return [path for paths in results for path in paths]
@@ -0,0 +1,55 @@
+"""
+Bounded thread pool fan-out shared by the dashboard helpers.
+
+When throttling is enabled (utils.throttle.enable_throttling), the number of
+concurrent calls follows the throttle's recommended concurrency, so workers
+scale down as the Graph API usage headers approach the limit.
+"""
+
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from utils.throttle import get_active_throttle
+
+# Upper bound on concurrent Graph API requests issued by a single helper
+DEFAULT_MAX_WORKERS = 8
+
+def fan_out(func, items, max_workers=DEFAULT_MAX_WORKERS):
+    """
+    Calls func on every item across a thread pool and returns the results in input order
+
+    The first exception raised by func is re-raised once every submitted call has finished.
+    """
+    items = list(items)
+    max_workers = _allowed_workers(max_workers)
+    if not max_workers or max_workers <= 1 or len(items) <= 1:
+        return [func(item) for item in items]
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(items))) as executor:
+        return list(executor.map(func, items))
+
+def fan_out_iter(func, items, max_workers=DEFAULT_MAX_WORKERS, max_in_flight=None):
+    """
+    Lazily calls func on every item across a thread pool and yields the results in input order
+
+    At most max_in_flight items (default: 2 * max_workers) are submitted or waiting to be
+    consumed at any time, so memory stays bounded however long items is. With throttling
+    enabled, the limit is re-checked before every submission and shrinks with the headroom.
+    """
+    max_workers = max(1, max_workers or 1)
+    max_in_flight = max(1, max_in_flight or 2 * max_workers)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        in_flight = deque()
+        for item in items:
+            while len(in_flight) >= min(max_in_flight, _allowed_workers(max_in_flight)):
+                yield in_flight.popleft().result()
+            in_flight.append(executor.submit(func, item))
+        while in_flight:
+            yield in_flight.popleft().result()
+
+def _allowed_workers(max_workers):
+    throttle = get_active_throttle()
+    if throttle is None or not max_workers:
+        return max_workers
+    return throttle.recommended_concurrency(max_workers)
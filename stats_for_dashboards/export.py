@@ -0,0 +1,276 @@
+"""
+Typed export of dashboard results.
+
+The dashboards collect nested Graph API structures (stats, diagnostics, checks).
+The flatteners here turn them into rows with a fixed schema, and write_table
+stores those rows as Parquet, Arrow IPC or CSV so downstream loaders can read
+typed columns instead of re-parsing stringified dicts.
+
+pyarrow is only needed for the Parquet and Arrow formats.
+"""
+
+import csv
+import json
+
+# Column name and type for each dashboard table. Types are one of
+# 'string', 'int64', 'float64' and 'date' (YYYY-MM-DD strings in rows).
+CATALOG_HEALTH_SCHEMA = [
+    ("catalog_id", "string"),
+    ("product_count", "int64"),
+    ("stats_entries", "int64"),
+    ("diagnostic_groups", "int64"),
+    ("must_fix_diagnostics", "int64"),
+    ("opportunity_diagnostics", "int64"),
+    ("affected_items", "int64"),
+]
+
+SIGNALS_HEALTH_SCHEMA = [
+    ("pixel_id", "string"),
+    ("date", "date"),
+    ("spend", "float64"),
+    ("match_rate", "float64"),
+    ("event_count", "int64"),
+    ("distinct_events", "int64"),
+    ("automatic_matching_fields", "string"),
+    ("checks_passed", "int64"),
+    ("checks_failed", "int64"),
+    ("event_stats", "string"),
+]
+
+INTEGRATION_QUALITY_SCHEMA = [
+    ("dataset_id", "string"),
+    ("event_name", "string"),
+    ("event_match_quality", "float64"),
+    ("event_coverage", "float64"),
+]
+
+OUTPUT_FORMATS = ("parquet", "arrow", "csv")
+FILE_EXTENSIONS = {"parquet": "parquet", "arrow": "arrow", "csv": "csv", "csv-legacy": "csv"}
+
+# The single-business dashboards' original CSV layout, with nested values written as
+# stringified dicts. Only for existing consumers; write_table does not accept it.
+LEGACY_CSV_FORMAT = "csv-legacy"
+DASHBOARD_FORMATS = OUTPUT_FORMATS + (LEGACY_CSV_FORMAT,)
+
+
+def _records(value):
+    """Returns the records of a cursor, list, single object or {'data': [...]} response as a list."""
+    if value is None:
+        return []
+    if hasattr(value, "keys"):
+        return list(value.get("data") or []) if "data" in value else [value]
+    if isinstance(value, (str, bytes)):
+        return [value]
+    return list(value)
+
+
+def _objects(value):
+    """Returns only the records that are objects, skipping anything that can't be read by field."""
+    return [record for record in _records(value) if hasattr(record, "get")]
+
+
+def _int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return 0
+
+
+def _float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def flatten_catalog_health(catalog_id, catalog_stats):
+    """
+    Flattens one entry of get_stats_for_catalogs into a CATALOG_HEALTH_SCHEMA row
+    """
+    diagnostics = _objects(catalog_stats.get("diagnostics"))
+    severities = [diagnostic.get("severity") for diagnostic in diagnostics]
+    return {
+        "catalog_id": str(catalog_id),
+        "product_count": _int(catalog_stats.get("product_count")),
+        "stats_entries": len(_records(catalog_stats.get("stats"))),
+        "diagnostic_groups": len(diagnostics),
+        "must_fix_diagnostics": severities.count("MUST_FIX"),
+        "opportunity_diagnostics": severities.count("OPPORTUNITY"),
+        "affected_items": sum(_int(diagnostic.get("number_of_affected_items")) for diagnostic in diagnostics),
+    }
+
+
+def flatten_signals_health(pixel_id, date, spend, pixel_stats):
+    """
+    Flattens one pixel of get_stats_and_settings_for_pixels, plus its spend, into a SIGNALS_HEALTH_SCHEMA row
+    """
+    event_counts = {}
+    for result in _objects(pixel_stats.get("stats")):
+        for event in _objects(result.get("data")):
+            name = event.get("value") or event.get("event")
+            event_counts[name] = event_counts.get(name, 0) + _int(event.get("count"))
+
+    check_results = [str(check.get("result", "")).lower() for check in _objects(pixel_stats.get("checks"))]
+    event_stats = pixel_stats.get("event_stats")
+    return {
+        "pixel_id": str(pixel_id),
+        "date": date,
+        "spend": _float(spend),
+        "match_rate": _float(pixel_stats.get("match_rate")),
+        "event_count": sum(event_counts.values()),
+        "distinct_events": len(event_counts),
+        "automatic_matching_fields": ",".join(
+            str(field) for field in _records(pixel_stats.get("automatic_matching_fields"))
+        ),
+        "checks_passed": check_results.count("passed"),
+        "checks_failed": check_results.count("failed"),
+        "event_stats": event_stats if isinstance(event_stats, str) else json.dumps(event_stats or {}, default=str),
+    }
+
+
+def _score(value):
+    """Reads a score that is either a number or an object such as {'composite_score': 7.1}."""
+    if hasattr(value, "get"):
+        for key in ("composite_score", "score", "percentage", "value"):
+            if value.get(key) is not None:
+                return _float(value.get(key))
+        return 0.0
+    return _float(value)
+
+
+def flatten_integration_quality(dataset_id, records):
+    """
+    Flattens the integration quality records of one dataset into INTEGRATION_QUALITY_SCHEMA rows, one per event
+    """
+    return [
+        {
+            "dataset_id": str(dataset_id),
+            "event_name": str(record.get("event_name") or ""),
+            "event_match_quality": _score(record.get("event_match_quality")),
+            "event_coverage": _score(record.get("event_coverage")),
+        }
+        for record in _objects(records)
+    ]
+
+
+def output_path(base_name, output_format):
+    return f"{base_name}.{FILE_EXTENSIONS[output_format]}"
+
+
+def arrow_schema(schema):
+    """Builds a pyarrow.Schema for one of the schemas above."""
+    import pyarrow as pa
+
+    types = {"string": pa.string(), "int64": pa.int64(), "float64": pa.float64(), "date": pa.date32()}
+    return pa.schema([(name, types[column_type]) for name, column_type in schema])
+
+
+def to_arrow_table(rows, schema):
+    """Builds a pyarrow.Table from rows, converting values to the schema's types."""
+    import pyarrow as pa
+    from datetime import date, datetime
+
+    columns = {}
+    for name, column_type in schema:
+        values = [row.get(name) for row in rows]
+        if column_type == "date":
+            values = [
+                value if isinstance(value, date) or value is None
+                else datetime.strptime(value, "%Y-%m-%d").date()
+                for value in values
+            ]
+        columns[name] = values
+    return pa.Table.from_pydict(columns, schema=arrow_schema(schema))
+
+
+class TableWriter:
+    """
+    Writes rows incrementally with a fixed schema as Parquet, Arrow IPC or CSV
+
+    Columnar formats are written in record batches of batch_size rows, so only one
+    batch is held in memory at a time.
+    """
+
+    def __init__(self, path, schema, output_format="parquet", batch_size=1000):
+        if output_format not in OUTPUT_FORMATS:
+            raise ValueError(f"Unsupported output format {output_format}, expected one of {OUTPUT_FORMATS}")
+        self.path = path
+        self.schema = schema
+        self.output_format = output_format
+        self.batch_size = batch_size
+        self.rows_written = 0
+        self._pending = []
+        self._file = None
+        self._writer = None
+
+    def __enter__(self):
+        if self.output_format == "csv":
+            self._file = open(self.path, "w", newline="")
+            self._writer = csv.DictWriter(self._file, fieldnames=[name for name, _ in self.schema], extrasaction="ignore")
+            self._writer.writeheader()
+        else:
+            try:
+                schema = arrow_schema(self.schema)
+            except ImportError as e:
+                raise ImportError(f"pyarrow is required to write {self.output_format} files: pip install pyarrow") from e
+            if self.output_format == "parquet":
+                import pyarrow.parquet as pq
+
+                self._writer = pq.ParquetWriter(self.path, schema)
+            else:
+                import pyarrow.ipc as ipc
+
+                self._writer = ipc.new_file(self.path, schema)
+        return self
+
+    def write_row(self, row):
+        if self.output_format == "csv":
+            self._writer.writerow(row)
+        else:
+            self._pending.append(row)
+            if len(self._pending) >= self.batch_size:
+                self._flush()
+        self.rows_written += 1
+
+    def _flush(self):
+        if self._pending:
+            self._writer.write_table(to_arrow_table(self._pending, self.schema))
+            self._pending = []
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self.output_format == "csv":
+            self._file.close()
+        else:
+            self._flush()
+            self._writer.close()
+
+
+def write_table(rows, schema, path, output_format="parquet"):
+    """
+    Writes rows with a fixed schema as Parquet, Arrow IPC (Feather v2) or CSV
+    """
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"Unsupported output format {output_format}, expected one of {OUTPUT_FORMATS}")
+
+    if output_format == "csv":
+        with open(path, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=[name for name, _ in schema], extrasaction="ignore")
+            writer.writeheader()
+            writer.writerows(rows)
+        return path
+
+    try:
+        table = to_arrow_table(rows, schema)
+    except ImportError as e:
+        raise ImportError(f"pyarrow is required to write {output_format} files: pip install pyarrow") from e
+
+    if output_format == "parquet":
+        import pyarrow.parquet as pq
+
+        pq.write_table(table, path)
+    else:
+        import pyarrow.ipc as ipc
+
+        with ipc.new_file(path, table.schema) as writer:
+            writer.write_table(table)
+    return path
@@ -2,102 +2,243 @@ import sys
 import os
 from collections import defaultdict
 from facebook_business.adobjects.business import Business
+from facebook_business.adobjects.adaccount import AdAccount
 from facebook_business.adobjects.adset import AdSet
+from facebook_business.adobjects.adspixel import AdsPixel
+from facebook_business.adobjects.productcatalog import ProductCatalog
 from facebook_business.adobjects.dataset import Dataset
-import matplotlib.pyplot as plt
+from facebook_business.api import FacebookAdsApi
+from facebook_business.exceptions import FacebookRequestError
+from stats_for_dashboards.adset_index import updated_time_to_timestamp
+from stats_for_dashboards.catalog_snapshots import CATALOG_FINGERPRINT_FIELDS, catalog_fingerprint, to_jsonable
+from stats_for_dashboards.charts import Chart, render_charts
+from stats_for_dashboards.executor import DEFAULT_MAX_WORKERS, fan_out, fan_out_iter
+from stats_for_dashboards.moving_average import moving_average
+from stats_for_dashboards.response_cache import cached_listing
+from stats_for_dashboards.spend_store import contiguous_ranges, days_between
+from utils.demo_utils import print_and_log
+from utils.graph_batch import MAX_BATCH_SIZE, GraphBatch
+from utils.prefetch import DEFAULT_READ_AHEAD, prefetch_edge
 
-def print_and_log(run_id: str, message: str):
-    # Print the message to the console
-    print(message)
-
-    # Get root directory path
-    root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-    log_path = os.path.join(root_dir, "demo_out.log")
-
-    # Log the message to demo_out.log with run_id
-    with open(log_path, "a") as log_file:
-        log_file.write(f"{run_id}: {message}\n")
-        
-def get_catalogs_for_business_id(business_id, run_id, should_log=False):
+def get_catalogs_for_business_id(business_id, run_id, should_log=False, refresh=False):
     """
-    Fetches all owned and client catalogs for a given business
+    Fetches all owned and client catalogs for a given business, served from the local cache while fresh
     """
     business = Business(business_id)
-    owned_catalogues = business.get_owned_product_catalogs()
-    client_catalogues = business.get_client_product_catalogs()
+    owned_catalogues = cached_listing(
+        f"{business_id}/owned_product_catalogs", business.get_owned_product_catalogs, ProductCatalog, refresh=refresh
+    )
+    client_catalogues = cached_listing(
+        f"{business_id}/client_product_catalogs", business.get_client_product_catalogs, ProductCatalog, refresh=refresh
+    )
 
     if should_log:
         print_and_log(
             run_id,
             f"Found {len(owned_catalogues)} owned catalogs and {len(client_catalogues)} client catalogs for business {business_id}\n",
         )
-    return list(owned_catalogues) + list(client_catalogues)
+    return owned_catalogues + client_catalogues
 
 
-def get_ad_accounts_for_business_id(business_id, run_id, should_log=False):
+def iter_catalogs_for_business_id(business_id, page_size=100, read_ahead=DEFAULT_READ_AHEAD):
     """
-    Fetches all owned and client ad accounts for a given business
+    Yields owned and then client catalogs for a given business page by page, without materializing either listing
+
+    Up to read_ahead pages are loaded in the background while earlier catalogs are consumed.
     """
     business = Business(business_id)
-    owned_ad_accounts = business.get_owned_ad_accounts()
-    client_ad_accounts = business.get_client_ad_accounts()
+    yield from prefetch_edge(business.get_owned_product_catalogs, page_size=page_size, read_ahead=read_ahead)
+    yield from prefetch_edge(business.get_client_product_catalogs, page_size=page_size, read_ahead=read_ahead)
+
+
+def get_ad_accounts_for_business_id(business_id, run_id, should_log=False, refresh=False):
+    """
+    Fetches all owned and client ad accounts for a given business, served from the local cache while fresh
+    """
+    business = Business(business_id)
+    owned_ad_accounts = cached_listing(
+        f"{business_id}/owned_ad_accounts", business.get_owned_ad_accounts, AdAccount, refresh=refresh
+    )
+    client_ad_accounts = cached_listing(
+        f"{business_id}/client_ad_accounts", business.get_client_ad_accounts, AdAccount, refresh=refresh
+    )
 
     if should_log:
         print_and_log(
             run_id,
             f"Found {len(owned_ad_accounts)} owned ad accounts and {len(client_ad_accounts)} client ad accounts for business {business_id}\n",
         )
-    return list(owned_ad_accounts) + list(client_ad_accounts)
+    return owned_ad_accounts + client_ad_accounts
 
 
-def get_pixels_for_business_id(business_id, run_id, should_log=False):
+def get_pixels_for_business_id(business_id, run_id, should_log=False, refresh=False):
     """
-    Fetches all ads pixels for a given business
+    Fetches all ads pixels for a given business, served from the local cache while fresh
     """
     business = Business(business_id)
-    pixels = business.get_ads_pixels()
+    pixels = cached_listing(f"{business_id}/adspixels", business.get_ads_pixels, AdsPixel, refresh=refresh)
 
     if should_log:
         print_and_log(run_id, f"Found {len(pixels)} pixels for business {business_id}\n")
     return pixels
 
-def get_spend_for_pixels(pixels, business_id, run_id, start_time, end_time, should_log=False):
+def get_adset_spend_for_ad_account(ad_account, start_time, end_time):
     """
-    Fetches spend for all provided pixels
-    Agency Starter Pack: Pixel Spend
+    Fetches spend for every ad set of an ad account with one level=adset insights request
     """
-    pixel_spend = defaultdict(float)
+    insights = prefetch_edge(ad_account.get_insights, params={
+        'level': 'adset',
+        'time_range': {'since': start_time, 'until': end_time},
+        'fields': [
+            'spend',
+            'adset_id',
+        ],
+    })
+    return {insight['adset_id']: float(insight.get('spend', 0)) for insight in insights}
 
-    # Extracting ad accounts for each pixel, filtered by business ID
+def _pixel_id_for_ad_set(ad_set):
+    pixel_id = (ad_set.get('promoted_object') or {}).get('pixel_id')
+    return str(pixel_id) if pixel_id else None
+
+def get_pixel_ids_for_ad_sets(ad_account, adset_index=None):
+    """
+    Maps every ad set of an ad account to the pixel it promotes, expanding promoted_object in the listing
+
+    With an adset_index, only ad sets updated since the last indexed updated_time are listed,
+    and the map is read back from the index.
+    """
+    if adset_index is None:
+        adset_to_pixel = {}
+        for ad_set in prefetch_edge(ad_account.get_ad_sets, fields=['promoted_object']):
+            pixel_id = _pixel_id_for_ad_set(ad_set)
+            if pixel_id:
+                adset_to_pixel[ad_set["id"]] = pixel_id
+        return adset_to_pixel
+
+    ad_account_id = ad_account["id"]
+    params = {}
+    last_updated_time = adset_index.last_updated_time(ad_account_id)
+    if last_updated_time:
+        # One second earlier so ad sets updated within the same second are not missed
+        params['filtering'] = [{
+            'field': 'updated_time',
+            'operator': 'GREATER_THAN',
+            'value': updated_time_to_timestamp(last_updated_time) - 1,
+        }]
+    ad_sets = prefetch_edge(ad_account.get_ad_sets, fields=['promoted_object', 'updated_time'], params=params)
+    adset_index.save(ad_account_id, [
+        (ad_set["id"], _pixel_id_for_ad_set(ad_set), ad_set.get('updated_time'))
+        for ad_set in ad_sets
+    ])
+    return adset_index.get_pixel_map(ad_account_id)
+
+def sync_daily_adset_spend_for_ad_account(ad_account, spend_store, start_time, end_time):
+    """
+    Fetches daily ad set spend for the days the spend store is missing or still
+    considers unsettled, then returns every (adset_id, day, spend) row of the window
+    """
+    ad_account_id = ad_account["id"]
+    for since, until in contiguous_ranges(spend_store.days_to_fetch(ad_account_id, start_time, end_time)):
+        insights = prefetch_edge(ad_account.get_insights, params={
+            'level': 'adset',
+            'time_range': {'since': since, 'until': until},
+            'time_increment': 1,
+            'fields': [
+                'spend',
+                'adset_id',
+            ],
+        })
+        rows = [
+            (insight['adset_id'], insight['date_start'], float(insight.get('spend', 0)))
+            for insight in insights
+        ]
+        spend_store.save_days(ad_account_id, days_between(since, until), rows)
+    return spend_store.get_adset_spend(ad_account_id, start_time, end_time)
+
+def get_ad_accounts_for_pixels(pixels, business_id):
+    """
+    Fetches the ad accounts of all provided pixels, filtered by business ID and deduplicated
+    """
     pixel_to_ad_accounts = {pixel["id"]: pixel.get_ad_accounts(params={
         'business_id': str(business_id)
     }) for pixel in pixels}
 
-    # Extracting ad sets for each ad account
-    ad_account_to_ad_sets = {
-        ad_account["id"]: list(map(lambda ad_set: ad_set, ad_account.get_ad_sets()))
-        for _, ad_accounts in pixel_to_ad_accounts.items()
-        for ad_account in ad_accounts
+    return {
+        ad_account["id"]: ad_account
+        for _, accounts in pixel_to_ad_accounts.items()
+        for ad_account in accounts
     }
-        
-    # Getting spend for each pixel by retrieving insights for each ad set
-    for _, ad_sets in ad_account_to_ad_sets.items():
-        for ad_set in ad_sets:
-            adset_id = ad_set["id"]
-            pixel_id = AdSet(adset_id).api_get(fields=['promoted_object'])
-            insights = ad_set.get_insights(params={
-                'date_preset': 'lifetime',
-                'time_range': {'since': start_time, 'until': end_time},
-                'fields': [
-                    'spend',
-                    'adset_id',
-                ],
-            })  # Assuming this method exists
-            if not insights:
-                continue
-            insight = insights[0]
-            spend = float(insight.get('spend', 0))
-            pixel_spend[pixel_id] += spend
+
+def get_daily_spend_for_pixels(pixels, business_id, start_time, end_time, run_id, spend_store, should_log=False, ad_accounts=None, adset_index=None):
+    """
+    Fetches spend per day for all provided pixels, syncing only the days the spend store is missing
+    """
+    pixel_daily_spend = defaultdict(lambda: defaultdict(float))
+    pixel_ids = {str(pixel["id"]) for pixel in pixels}
+    if ad_accounts is None:
+        ad_accounts = get_ad_accounts_for_pixels(pixels, business_id)
+
+    for ad_account in ad_accounts.values():
+        adset_to_pixel = get_pixel_ids_for_ad_sets(ad_account, adset_index)
+        for adset_id, day, spend in sync_daily_adset_spend_for_ad_account(ad_account, spend_store, start_time, end_time):
+            pixel_id = adset_to_pixel.get(adset_id)
+            if pixel_id in pixel_ids:
+                pixel_daily_spend[pixel_id][day] += spend
+
+    if should_log:
+        print_and_log(run_id, f"Found daily spend for {len(pixel_daily_spend)} pixels between {start_time} and {end_time}\n")
+    return pixel_daily_spend
+
+def get_spend_for_pixels(pixels, business_id, start_time, end_time, run_id, should_log=False, account_level=True, spend_store=None, adset_index=None):
+    """
+    Fetches spend for all provided pixels
+    Agency Starter Pack: Pixel Spend
+
+    Ad sets are attributed to pixels through one ad set listing per ad account,
+    or through an adset_index kept across runs, and spend is joined to pixels in
+    memory. With account_level set, each ad account costs one level=adset
+    insights request; otherwise insights are requested ad set by ad set. With a
+    spend_store, only the days it is missing are fetched and the window total is
+    read from it.
+    """
+    pixel_spend = defaultdict(float)
+
+    # Extracting ad accounts for each pixel, filtered by business ID
+    ad_accounts = get_ad_accounts_for_pixels(pixels, business_id)
+
+    if spend_store is not None:
+        daily_spend = get_daily_spend_for_pixels(
+            pixels, business_id, start_time, end_time, run_id, spend_store, ad_accounts=ad_accounts,
+            adset_index=adset_index,
+        )
+        for pixel_id, spend_by_day in daily_spend.items():
+            pixel_spend[pixel_id] = sum(spend_by_day.values())
+    elif account_level:
+        pixel_ids = {str(pixel["id"]) for pixel in pixels}
+        for ad_account in ad_accounts.values():
+            adset_to_pixel = get_pixel_ids_for_ad_sets(ad_account, adset_index)
+            adset_spend = get_adset_spend_for_ad_account(ad_account, start_time, end_time)
+            for adset_id, spend in adset_spend.items():
+                pixel_id = adset_to_pixel.get(adset_id)
+                if pixel_id in pixel_ids:
+                    pixel_spend[pixel_id] += spend
+    else:
+        # Getting spend for each pixel by retrieving insights for each ad set of a pixel
+        pixel_ids = {str(pixel["id"]) for pixel in pixels}
+        for ad_account in ad_accounts.values():
+            adset_to_pixel = get_pixel_ids_for_ad_sets(ad_account, adset_index)
+            for adset_id, pixel_id in adset_to_pixel.items():
+                if pixel_id not in pixel_ids:
+                    continue
+                insights = AdSet(adset_id).get_insights(params={
+                    'time_range': {'since': start_time, 'until': end_time},
+                    'fields': [
+                        'spend',
+                        'adset_id',
+                    ],
+                })
+                for insight in insights:
+                    pixel_spend[pixel_id] += float(insight.get('spend', 0))
 
     if should_log:
         print_and_log(run_id, f"Found {len(pixel_spend)} pixels with spend\n")
@@ -105,62 +246,228 @@ def get_spend_for_pixels(pixels, business_id, run_id, start_time, end_time, shou
             print_and_log(run_id, f"Pixel {pixel_id} has spent {spend} USD\n")
     return pixel_spend
 
-def get_stats_and_settings_for_pixels(pixels, run_id, should_log=False):
+def get_stats_and_settings_for_pixel(pixel):
+    """
+    Fetches stats, settings and checks for a single pixel
+    """
+    stats = pixel.api_get(fields=['match_rate_approx', 'event_stats', 'automatic_matching_fields'])
+    return {
+        "stats": pixel.get_stats(),
+        "match_rate": stats.get('match_rate_approx', 0),
+        "event_stats": stats.get('event_stats', {}),
+        "automatic_matching_fields": stats.get('automatic_matching_fields', []),
+        "checks": pixel.get_da_checks(),
+    }
+
+def get_stats_and_settings_for_pixels(pixels, run_id, should_log=False, max_workers=DEFAULT_MAX_WORKERS):
     """
-    Fetches stats for all provided pixels
+    Fetches stats for all provided pixels, up to max_workers pixels at a time
     """
     pixel_stats = defaultdict(dict)
-    
-    for pixel in pixels:
-        pixel_id = pixel["id"]
-        stats = pixel.api_get(fields=['match_rate_approx', 'event_stats', 'automatic_matching_fields'])
-        pixel_stats[pixel_id]["stats"] = pixel.get_stats()
-        pixel_stats[pixel_id]["match_rate"] = stats.get('match_rate_approx', 0)
-        pixel_stats[pixel_id]["event_stats"] = stats.get('event_stats', {})
-        pixel_stats[pixel_id]["automatic_matching_fields"] = stats.get('automatic_matching_fields', [])
-        checks = pixel.get_da_checks()
-        pixel_stats[pixel_id]["checks"] = checks
-    
-    # TODO: Integration Quality API
-    
+
+    pixels = list(pixels)
+    results = fan_out(get_stats_and_settings_for_pixel, pixels, max_workers)
+    for pixel, stats in zip(pixels, results):
+        pixel_stats[pixel["id"]] = stats
+
     if should_log:
         print_and_log(run_id, f"Found {len(pixel_stats)} pixels with stats\n")
         for pixel_id, stats in pixel_stats.items():
             print_and_log(run_id, f"Pixel {pixel_id} has stats {stats}\n")
     return pixel_stats
 
-def get_integration_quality_for_datasets(datasets, run_id, should_log=False):
+def _chunks(items, size):
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+# Fields of a dataset's integration_quality edge, one record per event
+INTEGRATION_QUALITY_FIELDS = ['event_name', 'event_match_quality', 'event_coverage']
+
+def _get_integration_quality_for_dataset_group(dataset_ids, api=None):
     """
-    Fetches integration quality for a given dataset
+    Fetches the integration quality records of up to MAX_BATCH_SIZE datasets with one batch request
+
+    Datasets whose request fails get an empty list, as does every dataset of the group when the batch request itself fails.
     """
-    dataset_integration_quality = defaultdict(dict)
-    for dataset in datasets:
-        dataset_id = dataset["id"]
-        dataset_integration_quality[dataset_id] = dataset.get_integration_quality(params={
-            'fields': [
-                'event_match_quality',
-                'event_coverage'
-                'event_name'
-            ]
-        })
+    batch = GraphBatch(api=api)
+    results = [
+        batch.add('GET', f"{dataset_id}/integration_quality", {'fields': ','.join(INTEGRATION_QUALITY_FIELDS)})
+        for dataset_id in dataset_ids
+    ]
+    try:
+        batch.execute()
+    except FacebookRequestError:
+        return [[] for _ in dataset_ids]
+    return [result.json().get('data', []) if result.is_success() else [] for result in results]
+
+def get_integration_quality_for_datasets(datasets, run_id, should_log=False, max_workers=DEFAULT_MAX_WORKERS, api=None):
+    """
+    Fetches integration quality for all provided datasets, one batch request per MAX_BATCH_SIZE datasets
+
+    Returns {dataset_id: [integration quality records]}; see export.flatten_integration_quality for a compact table.
+    """
+    dataset_integration_quality = defaultdict(list)
+
+    groups = list(_chunks((str(dataset["id"]) for dataset in datasets), MAX_BATCH_SIZE))
+    results = fan_out(lambda group: _get_integration_quality_for_dataset_group(group, api), groups, max_workers)
+    for group, group_quality in zip(groups, results):
+        for dataset_id, quality in zip(group, group_quality):
+            dataset_integration_quality[dataset_id] = quality
+
     if should_log:
         print_and_log(run_id, f"Found {len(dataset_integration_quality)} datasets with integration quality\n")
         for dataset_id, quality in dataset_integration_quality.items():
-            print_and_log(run_id, f"Dataset {dataset_id} has integration quality {quality}\n")
+            print_and_log(run_id, f"Dataset {dataset_id} has integration quality for {len(quality)} events\n")
     return dataset_integration_quality
 
-def get_stats_for_catalogs(catalogs, run_id, should_log=False) -> dict:
+# Catalog fields and edges fetched together with one nested-field request
+CATALOG_STATS_FIELDS = "product_count,stats,diagnostics"
+# Most catalog ids the Graph API accepts in one ?ids= request
+MAX_CATALOGS_PER_REQUEST = 50
+
+def _expanded_edge(expanded, edge, fetch):
+    """
+    Returns the records of an expanded edge, or falls back to fetch() when the edge is missing or has more pages
+    """
+    value = expanded.get(edge)
+    if not isinstance(value, dict) or value.get("paging", {}).get("next"):
+        return fetch()
+    return value.get("data", [])
+
+def _get_edge_records(node_id, edge, api=None):
+    """
+    Fetches every page of an edge with explicit requests
+
+    For edges the SDK has no method for, e.g. ProductCatalog has no get_stats.
     """
-    Fetches stats for all provided catalogs
+    api = api or FacebookAdsApi.get_default_api()
+    page = api.call('GET', (str(node_id), edge)).json()
+    records = list(page.get("data", []))
+    while page.get("paging", {}).get("next"):
+        page = api.call('GET', page["paging"]["next"]).json()
+        records.extend(page.get("data", []))
+    return records
+
+def _catalog_stats_from_expanded(catalog, expanded, api=None):
+    return {
+        "stats": _expanded_edge(expanded, "stats", lambda: _get_edge_records(catalog["id"], "stats", api)),
+        "diagnostics": _expanded_edge(expanded, "diagnostics", lambda: catalog.get_diagnostics()),
+        "product_count": expanded.get("product_count", 0),
+    }
+
+def get_stats_for_catalog_separately(catalog, api=None):
+    """
+    Fetches stats, diagnostics and product count for a single catalog with one request each
+    """
+    stats = catalog.api_get(fields=['product_count'])
+    return {
+        "stats": _get_edge_records(catalog["id"], "stats", api),
+        "diagnostics": catalog.get_diagnostics(),
+        "product_count": stats.get('product_count', 0),
+    }
+
+def get_stats_for_catalog(catalog, api=None):
+    """
+    Fetches stats, diagnostics and product count for a single catalog with one nested-field request
+    """
+    api = api or FacebookAdsApi.get_default_api()
+    try:
+        expanded = api.call('GET', (catalog["id"],), params={'fields': CATALOG_STATS_FIELDS}).json()
+    except FacebookRequestError:
+        return get_stats_for_catalog_separately(catalog, api)
+    return _catalog_stats_from_expanded(catalog, expanded, api)
+
+def get_stats_for_catalog_group(catalogs, api=None):
+    """
+    Fetches stats, diagnostics and product count for up to MAX_CATALOGS_PER_REQUEST catalogs with one ?ids= request
+
+    Falls back to separate requests per catalog if the group request fails.
+    """
+    api = api or FacebookAdsApi.get_default_api()
+    ids = [str(catalog["id"]) for catalog in catalogs]
+    try:
+        expanded = api.call('GET', ('',), params={'ids': ','.join(ids), 'fields': CATALOG_STATS_FIELDS}).json()
+    except FacebookRequestError:
+        return [get_stats_for_catalog_separately(catalog, api) for catalog in catalogs]
+    return [
+        _catalog_stats_from_expanded(catalog, expanded[catalog_id], api) if catalog_id in expanded
+        else get_stats_for_catalog_separately(catalog, api)
+        for catalog_id, catalog in zip(ids, catalogs)
+    ]
+
+def _get_catalog_fingerprint_group(catalogs, api=None):
+    api = api or FacebookAdsApi.get_default_api()
+    ids = [str(catalog["id"]) for catalog in catalogs]
+    try:
+        expanded = api.call('GET', ('',), params={'ids': ','.join(ids), 'fields': CATALOG_FINGERPRINT_FIELDS}).json()
+    except FacebookRequestError:
+        return [None] * len(ids)
+    return [catalog_fingerprint(expanded[catalog_id]) if catalog_id in expanded else None for catalog_id in ids]
+
+def get_catalog_fingerprints(catalogs, max_workers=DEFAULT_MAX_WORKERS) -> dict:
+    """
+    Fetches a fingerprint (product count, feed count and newest feed upload) for every catalog, one request per group of catalogs
+
+    Catalogs whose fingerprint could not be read map to None.
+    """
+    groups = list(_chunks(catalogs, MAX_CATALOGS_PER_REQUEST))
+    results = fan_out(_get_catalog_fingerprint_group, groups, max_workers)
+    return {
+        str(catalog["id"]): fingerprint
+        for group, fingerprints in zip(groups, results)
+        for catalog, fingerprint in zip(group, fingerprints)
+    }
+
+def get_stats_for_catalogs(catalogs, run_id, should_log=False, max_workers=DEFAULT_MAX_WORKERS, snapshot_store=None,
+                           refresh=False) -> dict:
+    """
+    Fetches stats for all provided catalogs, one request per group of catalogs and up to max_workers groups at a time
+
+    With a snapshot_store, a cheap fingerprint sweep runs first and only catalogs whose
+    fingerprint changed since their snapshot, or whose snapshot is older than the store's
+    max_age, are fetched; the rest are served from the snapshot. refresh fetches every
+    catalog and replaces its snapshot.
     """
     catalog_stats = defaultdict(dict)
-    
-    for catalog in catalogs:
-        catalog_id = catalog["id"]
-        stats = catalog.api_get(fields=['product_count'])
-        catalog_stats[str(catalog_id)]["stats"] = catalog.get_stats()
-        catalog_stats[str(catalog_id)]["diagnostics"] = catalog.get_diagnostics()
-        catalog_stats[str(catalog_id)]["product_count"] = stats.get('product_count', 0)
+
+    catalogs = list(catalogs)
+    to_fetch = catalogs
+    if snapshot_store is not None:
+        fingerprints = get_catalog_fingerprints(catalogs, max_workers)
+        snapshots = {} if refresh else snapshot_store.get_many(fingerprints)
+        to_fetch = []
+        for catalog in catalogs:
+            catalog_id = str(catalog["id"])
+            fingerprint = fingerprints.get(catalog_id)
+            snapshot = snapshots.get(catalog_id)
+            if fingerprint is not None and snapshot is not None and snapshot[0] == fingerprint:
+                catalog_stats[catalog_id] = snapshot[1]
+            else:
+                to_fetch.append(catalog)
+        if should_log:
+            print_and_log(run_id, f"{len(to_fetch)} of {len(catalogs)} catalogs changed or have no recent snapshot\n")
+
+    groups = list(_chunks(to_fetch, MAX_CATALOGS_PER_REQUEST))
+    results = fan_out(get_stats_for_catalog_group, groups, max_workers)
+    fetched = []
+    for group, group_stats in zip(groups, results):
+        for catalog, stats in zip(group, group_stats):
+            catalog_stats[str(catalog["id"])] = stats
+            fetched.append(str(catalog["id"]))
+
+    if snapshot_store is not None and fetched:
+        # Cursors from fallback requests can only be read once, so keep the materialized records
+        for catalog_id in fetched:
+            catalog_stats[catalog_id] = to_jsonable(catalog_stats[catalog_id])
+        snapshot_store.save_many(
+            (catalog_id, fingerprints.get(catalog_id), catalog_stats[catalog_id]) for catalog_id in fetched
+        )
     
     if should_log:
         print_and_log(run_id, f"Found {len(catalog_stats)} catalogs with stats\n")
@@ -168,23 +475,37 @@ def get_stats_for_catalogs(catalogs, run_id, should_log=False) -> dict:
             print_and_log(run_id, f"Catalog {catalog_id} has stats {stats}\n")
     return catalog_stats
 
+def iter_stats_for_catalogs(catalogs, max_workers=DEFAULT_MAX_WORKERS, max_in_flight=None):
+    """
+    Yields (catalog_id, stats) for the provided catalogs in order, keeping at most max_in_flight catalogs in memory
+    """
+    def fetch(catalog):
+        return str(catalog["id"]), get_stats_for_catalog(catalog)
+
+    yield from fan_out_iter(fetch, catalogs, max_workers, max_in_flight)
+
 def calculate_moving_average(data, window_size):
     """
     Calculates the moving average of a list of data points
+    See stats_for_dashboards.moving_average for streaming, exponential and weighted variants
     """
-    moving_average = []
-    for i in range(len(data)):
-        if i < window_size:
-            moving_average.append(sum(data[:i + 1]) / (i + 1))
-        else:
-            moving_average.append(sum(data[i - window_size + 1 : i + 1]) / window_size)
-    return moving_average
+    return moving_average(data, window_size).tolist()
 
-def plot_moving_average(data, window_size, title, x_label, y_label):
+def plot_moving_average(data, window_size, title, x_label, y_label, output_path=None):
     """
     Plots the moving average of a list of data points
+
+    With output_path, the chart is written headlessly to a .png or .svg file instead of shown.
+    matplotlib is only imported here, so dashboards that never plot don't pay for it.
     """
     moving_average = calculate_moving_average(data, window_size)
+    if output_path is not None:
+        return render_charts(
+            [Chart(output_path, [("Moving Average", moving_average)], title, x_label, y_label)], max_workers=1
+        )[0]
+
+    import matplotlib.pyplot as plt
+
     plt.plot(moving_average, label="Moving Average")
     plt.title(title)
     plt.xlabel(x_label)
@@ -0,0 +1,117 @@
+"""
+Moving averages for dashboard time series.
+
+All averages share the warm-up behaviour of calculate_moving_average: while
+fewer than window_size points have been seen, the average covers every point
+so far.
+"""
+
+from collections import deque
+
+import numpy as np
+
+
+def moving_average(data, window_size):
+    """
+    Simple moving average in O(n) using a prefix sum
+
+    Returns a float64 NumPy array the same length as data.
+    """
+    if window_size < 1:
+        raise ValueError("window_size must be at least 1")
+    values = np.asarray(data, dtype=np.float64)
+    if values.size == 0:
+        return values
+
+    prefix_sum = np.concatenate(([0.0], np.cumsum(values)))
+    end = np.arange(1, values.size + 1)
+    start = np.maximum(0, end - window_size)
+    return (prefix_sum[end] - prefix_sum[start]) / (end - start)
+
+
+def weighted_moving_average(data, window_size):
+    """
+    Linearly weighted moving average, where the newest point in a window has weight window_size
+    """
+    if window_size < 1:
+        raise ValueError("window_size must be at least 1")
+    values = np.asarray(data, dtype=np.float64)
+    result = np.empty_like(values)
+    if values.size == 0:
+        return result
+
+    # Warm-up: weights 1..i+1 over the points seen so far
+    warm_up = min(window_size - 1, values.size)
+    for i in range(warm_up):
+        weights = np.arange(1, i + 2, dtype=np.float64)
+        result[i] = np.dot(values[:i + 1], weights) / weights.sum()
+
+    if values.size >= window_size:
+        weights = np.arange(1, window_size + 1, dtype=np.float64)
+        # np.convolve flips its second argument, so reversed weights put the largest on the newest point
+        result[window_size - 1:] = np.convolve(values, weights[::-1], mode="valid") / weights.sum()
+    return result
+
+
+def exponential_moving_average(data, span=None, alpha=None):
+    """
+    Exponential moving average seeded with the first point
+
+    Pass either span (alpha = 2 / (span + 1)) or alpha directly.
+    """
+    alpha = _resolve_alpha(span, alpha)
+    values = np.asarray(data, dtype=np.float64)
+    result = np.empty_like(values)
+    current = None
+    for i, value in enumerate(values.tolist()):
+        current = value if current is None else current + alpha * (value - current)
+        result[i] = current
+    return result
+
+
+def _resolve_alpha(span, alpha):
+    if alpha is None:
+        if span is None or span < 1:
+            raise ValueError("Provide a span of at least 1 or an alpha in (0, 1]")
+        alpha = 2.0 / (span + 1)
+    if not 0 < alpha <= 1:
+        raise ValueError("alpha must be in (0, 1]")
+    return alpha
+
+
+class StreamingMovingAverage:
+    """Simple moving average over the last window_size points, updated in O(1) per point."""
+
+    def __init__(self, window_size):
+        if window_size < 1:
+            raise ValueError("window_size must be at least 1")
+        self.window_size = window_size
+        self._window = deque()
+        self._total = 0.0
+
+    def update(self, value):
+        """Adds a point and returns the current average."""
+        value = float(value)
+        self._window.append(value)
+        self._total += value
+        if len(self._window) > self.window_size:
+            self._total -= self._window.popleft()
+        return self.value
+
+    @property
+    def value(self):
+        return self._total / len(self._window) if self._window else 0.0
+
+
+class StreamingExponentialMovingAverage:
+    """Exponential moving average updated in O(1) per point."""
+
+    def __init__(self, span=None, alpha=None):
+        self.alpha = _resolve_alpha(span, alpha)
+        self.value = None
+
+    def update(self, value):
+        """Adds a point and returns the current average."""
+        value = float(value)
+        self.value = value if self.value is None else self.value + self.alpha * (value - self.value)
+        return self.value
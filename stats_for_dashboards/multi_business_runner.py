@@ -0,0 +1,174 @@
+"""
+This script runs a dashboard for many business portfolios at once.
+
+Business IDs are given on the command line or discovered from the businesses
+the access token can see. Each business is one shard; shards run across a
+process pool whose workers each initialize their own FacebookAdsApi session.
+The rows of every shard are merged into one dataset with a business_id column,
+and the time each shard took is reported at the end.
+"""
+
+import argparse
+import statistics
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+sys.path.append("..")  # Add parent directory to path for imports
+
+from facebook_business.adobjects.user import User
+from facebook_business.api import FacebookAdsApi
+from stats_for_dashboards.catalog_health_dashboard import collect_catalog_health_rows
+from stats_for_dashboards.export import (
+    CATALOG_HEALTH_SCHEMA,
+    OUTPUT_FORMATS,
+    SIGNALS_HEALTH_SCHEMA,
+    output_path,
+    write_table,
+)
+from stats_for_dashboards.signals_health_dashboard import DEFAULT_LOOKBACK_DAYS, collect_signals_health_rows
+from utils import constants, test_creds
+from utils.constants import apply_graph_url_override
+from utils.demo_utils import print_and_log
+from utils.instrumentation import enable_instrumentation_from_env
+from utils.profiling import add_profile_arguments, profiled
+from utils.throttle import enable_throttling
+
+# Row collector and schema for each dashboard the runner can shard
+DASHBOARDS = {
+    "catalog_health": (collect_catalog_health_rows, CATALOG_HEALTH_SCHEMA),
+    "signals_health": (collect_signals_health_rows, SIGNALS_HEALTH_SCHEMA),
+}
+
+def parse_arguments():
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(description="Run a dashboard for many business portfolios.")
+    parser.add_argument(
+        "dashboard", choices=sorted(DASHBOARDS),
+        help="Dashboard to run for every business"
+    )
+    parser.add_argument(
+        "-b", "--business-ids", nargs="+", default=None,
+        help="Business IDs to run; by default every business visible to the access token"
+    )
+    parser.add_argument(
+        "-p", "--processes", type=int, default=None,
+        help="Number of worker processes (default: one per CPU)"
+    )
+    parser.add_argument(
+        "--format", choices=OUTPUT_FORMATS, default="parquet",
+        help="Output format of the merged dataset (default: parquet)"
+    )
+    parser.add_argument(
+        "-d", "--days", type=int, default=DEFAULT_LOOKBACK_DAYS,
+        help=f"Days of spend for the signals health dashboard (default: {DEFAULT_LOOKBACK_DAYS})"
+    )
+    parser.add_argument(
+        "--refresh", action="store_true",
+        help="Ignore cached business listings and fetch them again"
+    )
+    add_profile_arguments(parser)
+    return parser.parse_args()
+
+def discover_business_ids():
+    """
+    Returns the IDs of every business the current access token can see
+    """
+    return [str(business["id"]) for business in User(fbid="me").get_businesses(fields=["id"])]
+
+def init_worker(worker_app_id, worker_app_secret, worker_access_token):
+    """Gives each worker process its own FacebookAdsApi session."""
+    apply_graph_url_override()
+    FacebookAdsApi.init(worker_app_id, worker_app_secret, worker_access_token)
+    enable_throttling()
+
+def run_shard(dashboard, business_id, run_id, options):
+    """
+    Collects the rows of one dashboard for one business
+
+    Returns (business_id, rows, seconds, error). A failing business is reported
+    through error instead of raising, so it does not stop the other shards.
+    """
+    collect_rows, _ = DASHBOARDS[dashboard]
+    start = time.perf_counter()
+    try:
+        rows = collect_rows(business_id, run_id, **options)
+        error = None
+    except Exception as e:
+        rows, error = [], f"{type(e).__name__}: {e}"
+    for row in rows:
+        row["business_id"] = business_id
+    return business_id, rows, time.perf_counter() - start, error
+
+def run_businesses(dashboard, business_ids, run_id, processes=None, **options):
+    """
+    Runs a dashboard for every business across a process pool
+
+    Returns the merged rows, in the order of business_ids, and a {business_id: (seconds, error)} map.
+    """
+    if processes is not None and processes <= 1:
+        shards = [run_shard(dashboard, business_id, run_id, options) for business_id in business_ids]
+    else:
+        shards = []
+        with ProcessPoolExecutor(
+            max_workers=processes, initializer=init_worker, initargs=(constants.APP_ID, constants.APP_SECRET, test_creds.LL_ACCESS_TOKEN)
+        ) as pool:
+            futures = [
+                pool.submit(run_shard, dashboard, business_id, run_id, options) for business_id in business_ids
+            ]
+            for future in as_completed(futures):
+                business_id, rows, seconds, error = future.result()
+                print_and_log(run_id, f"Business {business_id} finished in {seconds:.2f}s with {len(rows)} rows")
+                shards.append((business_id, rows, seconds, error))
+        order = {business_id: i for i, business_id in enumerate(business_ids)}
+        shards.sort(key=lambda shard: order[shard[0]])
+
+    rows = [row for _, shard_rows, _, _ in shards for row in shard_rows]
+    timings = {business_id: (seconds, error) for business_id, _, seconds, error in shards}
+    return rows, timings
+
+def log_timings(run_id, timings):
+    """Logs the time taken by every shard, slowest first, and a summary."""
+    for business_id, (seconds, error) in sorted(timings.items(), key=lambda item: -item[1][0]):
+        status = f"failed: {error}" if error else "ok"
+        print_and_log(run_id, f"Shard {business_id}: {seconds:.2f}s ({status})")
+    if timings:
+        durations = [seconds for seconds, _ in timings.values()]
+        print_and_log(
+            run_id,
+            f"{len(durations)} shards: min {min(durations):.2f}s, median {statistics.median(durations):.2f}s, "
+            f"max {max(durations):.2f}s, total {sum(durations):.2f}s",
+        )
+
+def main(dashboard, business_ids=None, processes=None, output_format="parquet", run_id=None, **options):
+    RUN_ID = run_id or str(abs(hash(time.time())))[:8]
+    print_and_log(RUN_ID, f"Multi-business {dashboard} run beginning.")
+
+    apply_graph_url_override()
+    FacebookAdsApi.init(constants.APP_ID, constants.APP_SECRET, test_creds.LL_ACCESS_TOKEN)
+    enable_throttling()
+    enable_instrumentation_from_env(RUN_ID)
+    if not business_ids:
+        business_ids = discover_business_ids()
+    print_and_log(RUN_ID, f"Running {dashboard} for {len(business_ids)} businesses")
+
+    start = time.perf_counter()
+    rows, timings = run_businesses(dashboard, business_ids, RUN_ID, processes, **options)
+    log_timings(RUN_ID, timings)
+
+    _, schema = DASHBOARDS[dashboard]
+    path = write_table(
+        rows, [("business_id", "string")] + schema, output_path(f"multi_business_{dashboard}", output_format),
+        output_format,
+    )
+    print_and_log(RUN_ID, f"Wrote {len(rows)} rows to {path} in {time.perf_counter() - start:.2f}s")
+    print_and_log(RUN_ID, f"Multi-business {dashboard} run complete")
+    return path
+
+if __name__ == "__main__":
+    args = parse_arguments()
+    options = {"refresh": args.refresh}
+    if args.dashboard == "signals_health":
+        options["days"] = args.days
+    with profiled(args.profile, output_dir=args.profile_dir) as profile:
+        main(args.dashboard, args.business_ids, args.processes, args.format, run_id=profile.run_id, **options)
@@ -0,0 +1,185 @@
+"""
+Columnar aggregation of reels insights broken down by placement.
+
+Insights rows are loaded once into NumPy column arrays, one entry per
+(account, ad, publisher_platform, platform_position) row:
+
+    columns = concat_columns(insights_columns(rows, ad_account_id) for ...)
+    aggregates = aggregate_reels_breakdowns(columns)
+    print(format_reels_summary(aggregates))
+
+String columns are stored as CategoricalColumns, integer codes into their
+distinct values, assigned while the rows are read. Group-bys are then np.bincount
+over the codes, so aggregating millions of rows costs a few passes over integer
+arrays instead of a dict update per row. A placement counts as reels when its
+platform_position contains "reels", e.g. instagram "reels" and facebook
+"facebook_reels".
+"""
+
+import numpy as np
+
+KEY_COLUMNS = ("account_id", "ad_id", "publisher_platform", "platform_position")
+COLUMNS = KEY_COLUMNS + ("impressions",)
+
+REELS_POSITION_MARKER = "reels"
+
+
+class CategoricalColumn:
+    """A string column stored as int64 codes into an array of its distinct values."""
+
+    def __init__(self, codes, categories):
+        self.codes = np.asarray(codes, dtype=np.int64)
+        self.categories = np.asarray(categories, dtype=str)
+
+    def __len__(self):
+        return len(self.codes)
+
+    @classmethod
+    def from_values(cls, values):
+        index = {}
+        codes = [index.setdefault(value, len(index)) for value in values]
+        return cls(codes, list(index))
+
+    def values(self):
+        return self.categories[self.codes]
+
+
+def insights_columns(rows, ad_account_id=None):
+    """
+    Loads insights rows into {column: CategoricalColumn}, with impressions as an int64 array
+
+    ad_account_id, when given, is the account_id of every row, so rows read from one
+    account group together whether or not they carry the field. Missing values are ''.
+    """
+    values = {column: [] for column in COLUMNS}
+    for row in rows:
+        for column in KEY_COLUMNS:
+            values[column].append(row.get(column) or "")
+        values["impressions"].append(int(row.get("impressions") or 0))
+    columns = {column: CategoricalColumn.from_values(values[column]) for column in KEY_COLUMNS}
+    if ad_account_id is not None:
+        columns["account_id"] = CategoricalColumn(np.zeros(len(values["impressions"])), [ad_account_id])
+    columns["impressions"] = np.array(values["impressions"], dtype=np.int64)
+    return columns
+
+
+def concat_columns(frames):
+    """Concatenates column dicts from insights_columns, e.g. one per ad account."""
+    frames = list(frames)
+    columns = {column: _concat_categorical([frame[column] for frame in frames]) for column in KEY_COLUMNS}
+    columns["impressions"] = np.concatenate([np.array([], dtype=np.int64)] + [frame["impressions"] for frame in frames])
+    return columns
+
+
+def _concat_categorical(parts):
+    """Merges the categories of every part and remaps each part's codes onto them."""
+    all_categories = np.concatenate([np.array([], dtype=str)] + [part.categories for part in parts])
+    categories, inverse = np.unique(all_categories, return_inverse=True)
+    inverse = inverse.ravel()
+    codes, offset = [np.array([], dtype=np.int64)], 0
+    for part in parts:
+        codes.append(inverse[offset:offset + len(part.categories)][part.codes])
+        offset += len(part.categories)
+    return CategoricalColumn(np.concatenate(codes), categories)
+
+
+def group_codes(*keys):
+    """
+    Groups rows by one or more CategoricalColumns
+
+    Returns (group keys, codes): group keys holds one array of values per key column with
+    an entry per distinct combination, and codes maps every row to its group.
+    """
+    if len(keys) == 1:
+        (key,) = keys
+        return [key.categories], key.codes
+    shape = tuple(max(len(key.categories), 1) for key in keys)
+    # One integer per combination of key codes, so several columns group with a single unique
+    combined = np.ravel_multi_index([key.codes for key in keys], shape)
+    group_ids, codes = np.unique(combined, return_inverse=True)
+    indices = np.unravel_index(group_ids, shape)
+    return [key.categories[index] for key, index in zip(keys, indices)], codes.ravel()
+
+
+def group_sum(values, *keys):
+    """Sums int values by the distinct combinations of keys; returns (group keys, int64 sums)."""
+    group_keys, codes = group_codes(*keys)
+    sums = np.bincount(codes, weights=values, minlength=len(group_keys[0]))
+    return group_keys, np.rint(sums).astype(np.int64)
+
+
+def reels_mask(platform_positions):
+    """True for rows whose platform_position is a reels placement."""
+    # The substring test runs once per distinct position rather than once per row
+    is_reels = np.char.find(platform_positions.categories, REELS_POSITION_MARKER) >= 0
+    return is_reels[platform_positions.codes]
+
+
+def _share(part, total):
+    return np.divide(part, total, out=np.zeros(len(part), dtype=np.float64), where=total > 0)
+
+
+def _by_key(columns, key, reels_impressions):
+    (ids,), impressions = group_sum(columns["impressions"], columns[key])
+    _, reels = group_sum(reels_impressions, columns[key])
+    return {
+        key: ids,
+        "impressions": impressions,
+        "reels_impressions": reels,
+        "reels_share": _share(reels, impressions),
+    }
+
+
+def aggregate_reels_breakdowns(columns):
+    """
+    Impressions by placement, account and ad, with the share of reels impressions
+
+    Returns {'by_placement', 'by_account', 'by_ad'} tables as dicts of aligned arrays, plus
+    the portfolio's 'impressions', 'reels_impressions' and 'reels_share'.
+    """
+    impressions = columns["impressions"]
+    reels_impressions = np.where(reels_mask(columns["platform_position"]), impressions, 0)
+    total, reels = int(impressions.sum()), int(reels_impressions.sum())
+
+    (platforms, positions), placement_impressions = group_sum(
+        impressions, columns["publisher_platform"], columns["platform_position"]
+    )
+    return {
+        "by_placement": {
+            "publisher_platform": platforms,
+            "platform_position": positions,
+            "impressions": placement_impressions,
+            "share": _share(placement_impressions, np.full(len(platforms), total)),
+        },
+        "by_account": _by_key(columns, "account_id", reels_impressions),
+        "by_ad": _by_key(columns, "ad_id", reels_impressions),
+        "impressions": total,
+        "reels_impressions": reels,
+        "reels_share": reels / total if total else 0.0,
+    }
+
+
+def top_rows(table, limit, sort_by="impressions"):
+    """Rows of an aggregate table as dicts, largest sort_by first."""
+    order = np.argsort(-table[sort_by], kind="stable")[:limit]
+    return [{name: values[i].item() for name, values in table.items()} for i in order]
+
+
+def format_reels_summary(aggregates, limit=10):
+    lines = [
+        f"Reels impressions: {aggregates['reels_impressions']} of {aggregates['impressions']} "
+        f"({100 * aggregates['reels_share']:.1f}%)",
+        "Impressions by placement:",
+    ]
+    lines += [
+        f"\t{row['publisher_platform']}/{row['platform_position']}: {row['impressions']} ({100 * row['share']:.1f}%)"
+        for row in top_rows(aggregates["by_placement"], limit)
+    ]
+    for table, key, label in (("by_account", "account_id", "ad accounts"), ("by_ad", "ad_id", "ads")):
+        lines.append(f"Top {label} by impressions:")
+        lines += [
+            f"\t{row[key]}: {row['impressions']} impressions, {row['reels_impressions']} on reels "
+            f"({100 * row['reels_share']:.1f}%)"
+            for row in top_rows(aggregates[table], limit)
+        ]
+    return "\n".join(lines)
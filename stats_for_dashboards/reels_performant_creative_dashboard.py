@@ -2,6 +2,7 @@
 This script retrieves reels performant details for a given business portfolio.
 """
 
+import argparse
 import sys
 import time
 
@@ -19,66 +20,265 @@ from facebook_business.api import FacebookAdsApi
 from facebook_business.adobjects.adaccount import AdAccount
 from facebook_business.adobjects.adcreative import AdCreative
 from facebook_business.adobjects.ad import Ad
+from facebook_business.exceptions import FacebookRequestError
+from stats_for_dashboards.async_reports import is_completed, stream_report_results, submit_report_runs, wait_for_report_runs
+from stats_for_dashboards.executor import DEFAULT_MAX_WORKERS, fan_out
 from stats_for_dashboards.helpers import get_ad_accounts_for_business_id
-from utils.constants import (
-    AD_ACCOUNT_ID as ad_account_id,
-    APP_ID as app_id,
-    APP_SECRET as app_secret,
-    BUSINESS_ID as business_id,
+from stats_for_dashboards.reels_breakdowns import (
+    aggregate_reels_breakdowns,
+    concat_columns,
+    format_reels_summary,
+    insights_columns,
 )
+from utils import constants, test_creds
+from utils.constants import apply_graph_url_override
 from utils.demo_utils import print_and_log
-from utils.test_creds import LL_ACCESS_TOKEN as access_token
+from utils.graph_batch import MAX_BATCH_SIZE, GraphBatch
+from utils.instrumentation import enable_instrumentation_from_env
+from utils.profiling import add_profile_arguments, profiled
+from utils.throttle import enable_throttling
 
-def main():
-    FacebookAdsApi.init(app_id, app_secret, access_token)
-    RUN_ID = str(abs(hash(time.time())))[:8]
+# Impressions per ad, broken down by placement; every placement is read so reels can be compared to the rest
+REELS_INSIGHTS_PARAMS = {
+    'level': 'ad',
+    'fields': ['impressions', 'ad_id'],
+    'breakdowns': ['publisher_platform', 'platform_position'],
+}
+
+REELS_AD_NAME = 'Reels Ad'
+REELS_CREATIVE_NAME = 'Reels Ad Creative'
+# A creative and an ad per account, so one batch request covers this many accounts
+ACCOUNTS_PER_BATCH = MAX_BATCH_SIZE // 2
+
+def parse_arguments():
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(description="Build the reels performant creative dashboard.")
+    parser.add_argument(
+        "--refresh", action="store_true",
+        help="Ignore cached business listings and fetch them again"
+    )
+    parser.add_argument(
+        "--async-reports", action="store_true",
+        help="Run insights as async report jobs for all ad accounts at once"
+    )
+    add_profile_arguments(parser)
+    return parser.parse_args()
+
+def get_reels_insights(ad_account):
+    """Reads the placement insights rows of one ad account into reels_breakdowns columns."""
+    return insights_columns(ad_account.get_insights(params=REELS_INSIGHTS_PARAMS), ad_account["id"])
+
+def collect_reels_insights(ad_accounts, run_id, async_reports=False, max_workers=DEFAULT_MAX_WORKERS):
+    """
+    Reads placement insights for every ad account concurrently
+
+    Returns {ad_account_id: insights columns}; accounts whose read failed are left out.
+    """
+    def read_failed(ad_account_id, error):
+        print_and_log(run_id, f"Ad Account ID: {ad_account_id}\n\tFailed to read insights: {error.api_error_message()}")
+
+    if async_reports:
+        # Submit a report run for every account at once and read the completed ones together
+        completed = []
+        for ad_account_id, report_run in wait_for_report_runs(submit_report_runs(ad_accounts, REELS_INSIGHTS_PARAMS)):
+            if is_completed(report_run):
+                completed.append((ad_account_id, report_run))
+            else:
+                print_and_log(run_id, f"Ad Account ID: {ad_account_id}\n\tInsights report {report_run['async_status']}")
+
+        def read(item):
+            ad_account_id, report_run = item
+            try:
+                return insights_columns(stream_report_results(report_run), ad_account_id)
+            except FacebookRequestError as e:
+                read_failed(ad_account_id, e)
+                return None
+
+        ad_account_ids = [ad_account_id for ad_account_id, _ in completed]
+        results = fan_out(read, completed, max_workers)
+    else:
+        def read(ad_account):
+            try:
+                return get_reels_insights(ad_account)
+            except FacebookRequestError as e:
+                read_failed(ad_account["id"], e)
+                return None
+
+        ad_account_ids = [ad_account["id"] for ad_account in ad_accounts]
+        results = fan_out(read, ad_accounts, max_workers)
+    return {
+        ad_account_id: columns for ad_account_id, columns in zip(ad_account_ids, results) if columns is not None
+    }
+
+def _execute_batch(batch, run_id, ad_account_ids, action):
+    """
+    Executes a batch, logging a failure of the batch request itself instead of raising
+
+    Operations that did not run because of it are left unexecuted, so callers treat them as failed.
+    """
+    try:
+        batch.execute()
+    except FacebookRequestError as e:
+        print_and_log(
+            run_id, f"Batch request to {action} for {len(ad_account_ids)} ad accounts failed: {e.api_error_message()}"
+        )
+
+def _find_by_name(ad_account_ids, edge, name, run_id):
+    """
+    Looks up an object named name on an edge of every ad account, one batch request per 50 accounts
+
+    Returns {ad_account_id: id of the first match, None if there is none, or False if the lookup failed}.
+    """
+    batch = GraphBatch()
+    results = [
+        batch.add('GET', f"{ad_account_id}/{edge}", {
+            'fields': 'id',
+            'filtering': [{'field': 'name', 'operator': 'EQUAL', 'value': name}],
+            'limit': 1,
+        })
+        for ad_account_id in ad_account_ids
+    ]
+    _execute_batch(batch, run_id, ad_account_ids, f"look up {edge}")
+    found = {}
+    for ad_account_id, result in zip(ad_account_ids, results):
+        if not result.is_success():
+            found[ad_account_id] = False
+        else:
+            matches = result.json().get('data') or [{}]
+            found[ad_account_id] = matches[0].get('id')
+    return found
+
+def get_accounts_with_reels_ad(ad_account_ids, run_id):
+    """
+    Returns the ids of the ad accounts that already have a REELS_AD_NAME ad
+
+    Accounts that can't be checked are included, so a rerun never risks a duplicate ad.
+    """
+    accounts_with_reels_ad = set()
+    for ad_account_id, ad_id in _find_by_name(ad_account_ids, 'ads', REELS_AD_NAME, run_id).items():
+        if ad_id is False:
+            print_and_log(run_id, f"Ad Account ID: {ad_account_id}\n\tSkipped, could not check for an existing reels ad")
+        if ad_id is not None:
+            accounts_with_reels_ad.add(ad_account_id)
+    return accounts_with_reels_ad
+
+def get_reels_creative_ids(ad_account_ids, run_id):
+    """
+    Returns {ad_account_id: creative id} for the accounts that already have a REELS_CREATIVE_NAME creative
+
+    A creative is left behind when its ad failed, and a rerun reuses it instead of creating another.
+    Accounts whose lookup failed are left out and get a new creative.
+    """
+    return {
+        ad_account_id: creative_id
+        for ad_account_id, creative_id in _find_by_name(ad_account_ids, 'adcreatives', REELS_CREATIVE_NAME, run_id).items()
+        if creative_id
+    }
+
+def choose_reels_targets(insights_by_account, accounts_with_reels_ad):
+    """Ad accounts to create a reels ad in: those whose insights were read and that don't have one yet."""
+    return [ad_account_id for ad_account_id in insights_by_account if ad_account_id not in accounts_with_reels_ad]
+
+def queue_reels_ad(batch, ad_account_id, creative_id=None):
+    """
+    Queues a reels ad in the ad account, and the Advantage+ Creative it uses unless creative_id is given
+
+    The ad references a new creative's id within the batch. Returns (creative, ad) BatchResults;
+    creative is None when an existing creative is reused.
+    """
+    creative = None
+    if creative_id is None:
+        creative = batch.add('POST', f"{ad_account_id}/adcreatives", {
+            AdCreative.Field.name: REELS_CREATIVE_NAME,
+            # Apply Advantage+ Creative features
+            AdCreative.Field.degrees_of_freedom_spec: {
+                'creative_features_spec': {
+                    'video_auto_crop': {
+                        'enroll_status': 'OPT_IN'
+                    },
+                    'adapt_to_placement': {
+                        'enroll_status': 'OPT_IN'
+                    },
+                }
+            },
+            AdCreative.Field.asset_feed_spec: {
+                'audios': [{'url': 'audio_url'}]  # Replace 'audio_url' with actual audio asset URL
+            },
+        })
+        creative_id = batch.ref(creative)
+    # Create ads from reels
+    ad = batch.add('POST', f"{ad_account_id}/ads", {
+        Ad.Field.name: REELS_AD_NAME,
+        Ad.Field.creative: {'creative_id': creative_id},
+    })
+    return creative, ad
+
+def _create_reels_ads_for_group(ad_account_ids, creative_ids, run_id):
+    batch = GraphBatch()
+    queued = [
+        queue_reels_ad(batch, ad_account_id, creative_ids.get(ad_account_id)) for ad_account_id in ad_account_ids
+    ]
+    _execute_batch(batch, run_id, ad_account_ids, "create reels ads")
+    return queued
+
+def _failure_message(result):
+    if not result.executed:
+        return "the request was not run"
+    return result.error().api_error_message()
+
+def create_reels_ads(ad_account_ids, run_id, max_workers=DEFAULT_MAX_WORKERS, creative_ids=None):
+    """
+    Creates the reels ad of every ad account, one batch request per ACCOUNTS_PER_BATCH accounts
+
+    Accounts in creative_ids reuse that creative; the others get a new one. Returns
+    {ad_account_id: ad id or None if creation failed}. A failed batch request only fails its own accounts.
+    """
+    creative_ids = creative_ids or {}
+    groups = [ad_account_ids[i:i + ACCOUNTS_PER_BATCH] for i in range(0, len(ad_account_ids), ACCOUNTS_PER_BATCH)]
+    created = {}
+    results = fan_out(lambda group: _create_reels_ads_for_group(group, creative_ids, run_id), groups, max_workers)
+    for group, queued in zip(groups, results):
+        for ad_account_id, (creative, ad) in zip(group, queued):
+            if ad.is_success():
+                created[ad_account_id] = ad.get_id()
+                print_and_log(run_id, f"Ad Account ID: {ad_account_id}\n\tCreated reels ad {ad.get_id()}")
+            else:
+                created[ad_account_id] = None
+                failed, what = (creative, "creative") if creative is not None and not creative.is_success() else (ad, "ad")
+                print_and_log(
+                    run_id,
+                    f"Ad Account ID: {ad_account_id}\n\tFailed to create reels {what}: {_failure_message(failed)}",
+                )
+    return created
+
+def main(refresh=False, async_reports=False, run_id=None):
+    apply_graph_url_override()
+    FacebookAdsApi.init(constants.APP_ID, constants.APP_SECRET, test_creds.LL_ACCESS_TOKEN)
+    enable_throttling()
+    RUN_ID = run_id or str(abs(hash(time.time())))[:8]
+    enable_instrumentation_from_env(RUN_ID)
     print_and_log(RUN_ID, "Reels Performant Creative dashboard beginning.")
 
     # Extract the ad account IDs for a given business portfolio
-    ad_accounts = get_ad_accounts_for_business_id(business_id, RUN_ID)
-
-    for ad_account in ad_accounts:
-        ad_account_id = ad_account["id"]
-        ad_account_obj = AdAccount(f'act_{ad_account_id}')
-
-        # Extract reels insights
-        insights = ad_account_obj.get_insights(
-            params={
-                'level': 'ad',
-                'fields': ['impressions', 'ad_id'],
-                'breakdowns': ['publisher_platform', 'platform_position'],
-                'filtering': [
-                    {"field": "publisher_platform", "operator": "ANY", "value": ["instagram"]},
-                    {"field": "platform_position", "operator": "ANY", "value": ["reels"]}
-                ]
-            }
-        )
-        print_and_log(RUN_ID, f"Ad Account ID: {ad_account_id}\n\tInsights: {insights}")
-
-        # Apply Advantage+ Creative features
-        creative = AdCreative(parent_id=ad_account_id)
-        creative[AdCreative.Field.degrees_of_freedom_spec] = {
-            'creative_features_spec': {
-                'video_auto_crop': {
-                    'enroll_status': 'OPT_IN'
-                },
-                'adapt_to_placement': {
-                    'enroll_status': 'OPT_IN'
-                },
-            }
-        }
-        creative[AdCreative.Field.asset_feed_spec] = {
-            'audios': [{'url': 'audio_url'}]  # Replace 'audio_url' with actual audio asset URL
-        }
-        creative.remote_create()
-
-        # Create ads from reels
-        ad = Ad(parent_id=ad_account_id)
-        ad[Ad.Field.name] = 'Reels Ad'
-        ad[Ad.Field.creative] = {'creative_id': creative['id']}
-        ad.remote_create()
+    ad_accounts = get_ad_accounts_for_business_id(constants.BUSINESS_ID, RUN_ID, refresh=refresh)
+
+    # Read path: reels insights of every account, then the accounts to create a reels ad in
+    insights_by_account = collect_reels_insights(ad_accounts, RUN_ID, async_reports=async_reports)
+    aggregates = aggregate_reels_breakdowns(concat_columns(insights_by_account.values()))
+    print_and_log(RUN_ID, format_reels_summary(aggregates))
+    accounts_with_reels_ad = get_accounts_with_reels_ad(list(insights_by_account), RUN_ID)
+    targets = choose_reels_targets(insights_by_account, accounts_with_reels_ad)
+    print_and_log(
+        RUN_ID,
+        f"Creating reels ads in {len(targets)} ad accounts, {len(accounts_with_reels_ad)} already have one",
+    )
+
+    # Write path: creatives and ads in batch requests, reusing creatives left by an earlier failed ad
+    create_reels_ads(targets, RUN_ID, creative_ids=get_reels_creative_ids(targets, RUN_ID))
 
     print_and_log(RUN_ID, "Reels Performant Creative dashboard complete")
 
 if __name__ == "__main__":
-    main()
+    args = parse_arguments()
+    with profiled(args.profile, output_dir=args.profile_dir) as profile:
+        main(refresh=args.refresh, async_reports=args.async_reports, run_id=profile.run_id)
@@ -0,0 +1,156 @@
+"""
+On-disk SQLite cache for slow-changing Graph API listings used by the dashboards.
+
+Entries are keyed by endpoint, request params and a hash of the access token, so
+two tokens never read each other's listings. Every endpoint has its own TTL and
+the cache is kept under a total size by evicting the least recently used
+entries.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from facebook_business.api import FacebookAdsApi
+from utils.prefetch import PrefetchingCursor
+
+DEFAULT_CACHE_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".dashboard_cache.sqlite"
+)
+DEFAULT_TTL_SECONDS = 60 * 60
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+# Business level listings rarely change, so they are kept for a day
+ENDPOINT_TTL_SECONDS = {
+    "owned_product_catalogs": 24 * 60 * 60,
+    "client_product_catalogs": 24 * 60 * 60,
+    "owned_ad_accounts": 24 * 60 * 60,
+    "client_ad_accounts": 24 * 60 * 60,
+    "adspixels": 24 * 60 * 60,
+}
+
+
+class ResponseCache:
+    """SQLite backed cache with per-endpoint TTLs and size-bounded LRU eviction."""
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_bytes=DEFAULT_MAX_BYTES, ttls=None):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttls = dict(ENDPOINT_TTL_SECONDS, **(ttls or {}))
+        self._connection = None
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        # Opened on first use so that importing or constructing the cache never touches disk
+        if self._connection is None:
+            self._connection = sqlite3.connect(self.path, check_same_thread=False)
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, endpoint TEXT, payload TEXT, size INTEGER, "
+                "created_at REAL, last_used_at REAL)"
+            )
+        return self._connection
+
+    def ttl_for(self, endpoint):
+        """Returns the TTL in seconds for an endpoint, matched on its last path segment."""
+        return self.ttls.get(endpoint.rsplit("/", 1)[-1], DEFAULT_TTL_SECONDS)
+
+    @staticmethod
+    def make_key(endpoint, params, token_scope):
+        raw = json.dumps([endpoint, params or {}, token_scope], sort_keys=True, default=str)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get(self, endpoint, params, token_scope):
+        """Returns the cached payload, or None if it is missing or older than the endpoint's TTL."""
+        key = self.make_key(endpoint, params, token_scope)
+        now = time.time()
+        with self._lock:
+            connection = self._connect()
+            row = connection.execute(
+                "SELECT payload, created_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            payload, created_at = row
+            if now - created_at > self.ttl_for(endpoint):
+                connection.execute("DELETE FROM responses WHERE key = ?", (key,))
+                connection.commit()
+                return None
+            connection.execute("UPDATE responses SET last_used_at = ? WHERE key = ?", (now, key))
+            connection.commit()
+        return json.loads(payload)
+
+    def set(self, endpoint, params, token_scope, value):
+        """Stores a JSON serializable payload and evicts least recently used entries over max_bytes."""
+        key = self.make_key(endpoint, params, token_scope)
+        payload = json.dumps(value)
+        now = time.time()
+        with self._lock:
+            connection = self._connect()
+            connection.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?)",
+                (key, endpoint, payload, len(payload), now, now),
+            )
+            self._evict(connection)
+            connection.commit()
+
+    def _evict(self, connection):
+        total = 0
+        stale = []
+        for key, size in connection.execute(
+            "SELECT key, size FROM responses ORDER BY last_used_at DESC"
+        ):
+            total += size
+            if total > self.max_bytes:
+                stale.append((key,))
+        connection.executemany("DELETE FROM responses WHERE key = ?", stale)
+
+    def clear(self):
+        with self._lock:
+            connection = self._connect()
+            connection.execute("DELETE FROM responses")
+            connection.commit()
+
+
+_default_cache = None
+
+
+def get_default_cache():
+    """Returns the process wide cache stored next to demo_out.log."""
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = ResponseCache()
+    return _default_cache
+
+
+def get_token_scope(api=None):
+    """Returns a short hash of the access token used by the API session."""
+    api = api or FacebookAdsApi.get_default_api()
+    access_token = getattr(getattr(api, "_session", None), "access_token", None) or ""
+    return hashlib.sha256(access_token.encode("utf-8")).hexdigest()[:16]
+
+
+def cached_listing(endpoint, fetch, object_class, params=None, refresh=False, cache=None):
+    """
+    Returns the objects listed by fetch(), served from the cache while fresh
+
+    endpoint identifies the listing (e.g. '<business_id>/owned_ad_accounts'). With
+    refresh set the cached entry is ignored and replaced by a fresh listing.
+    """
+    cache = cache or get_default_cache()
+    token_scope = get_token_scope()
+
+    rows = None if refresh else cache.get(endpoint, params, token_scope)
+    if rows is None:
+        rows = [obj.export_all_data() for obj in PrefetchingCursor(fetch())]
+        cache.set(endpoint, params, token_scope, rows)
+
+    objects = []
+    for row in rows:
+        obj = object_class(fbid=row.get("id"))
+        obj._set_data(row)
+        objects.append(obj)
+    return objects
@@ -2,17 +2,29 @@
 This script retrieves signals health details for a given business portfolio.
 """
 
+import argparse
 import sys
 import time
 from collections import defaultdict
 from datetime import datetime, timedelta
 from facebook_business.api import FacebookAdsApi
-from utils.constants import (
-    APP_ID as app_id,
-    APP_SECRET as app_secret,
-    BUSINESS_ID as business_id,
+from utils import constants, test_creds
+from utils.constants import apply_graph_url_override
+from utils.instrumentation import enable_instrumentation_from_env
+from utils.profiling import add_profile_arguments, profiled
+from utils.throttle import enable_throttling
+from stats_for_dashboards.export import (
+    DASHBOARD_FORMATS,
+    INTEGRATION_QUALITY_SCHEMA,
+    LEGACY_CSV_FORMAT,
+    SIGNALS_HEALTH_SCHEMA,
+    flatten_integration_quality,
+    flatten_signals_health,
+    output_path,
+    write_table,
 )
-from utils.test_creds import LL_ACCESS_TOKEN as access_token
+from stats_for_dashboards.adset_index import AdSetPixelIndex
+from stats_for_dashboards.spend_store import SpendStore
 from stats_for_dashboards.helpers import get_integration_quality_for_datasets, get_pixels_for_business_id, get_spend_for_pixels, get_stats_and_settings_for_pixels, plot_moving_average, calculate_moving_average, print_and_log
 
 sys.path.append(
@@ -23,29 +35,103 @@ sys.path.append(
 )  # same as above
 sys.path.append("..")  # Add parent directory to path for imports
 
-def main():
-    RUN_ID = str(abs(hash(time.time())))[:8]
+# Configuration
+DEFAULT_LOOKBACK_DAYS = 7  # Default days of spend to report
+
+def parse_arguments():
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(description="Build the signals health dashboard.")
+    parser.add_argument(
+        "--refresh", action="store_true",
+        help="Ignore cached business listings and fetch them again"
+    )
+    parser.add_argument(
+        "-d", "--days", type=int, default=DEFAULT_LOOKBACK_DAYS,
+        help=f"Number of days of spend to report (default: {DEFAULT_LOOKBACK_DAYS})"
+    )
+    parser.add_argument(
+        "--format", choices=DASHBOARD_FORMATS, default="csv",
+        help="Output format, written with typed, flattened columns (default: csv); "
+             "csv-legacy writes the old layout with stringified stats and checks"
+    )
+    add_profile_arguments(parser)
+    return parser.parse_args()
+
+def get_report_window(days=DEFAULT_LOOKBACK_DAYS):
+    """Returns (since, until) dates covering the last `days` days."""
+    today = datetime.now().date()
+    return (today - timedelta(days=days)).strftime('%Y-%m-%d'), today.strftime('%Y-%m-%d')
+
+def collect_signals_health_rows(business_id, run_id, refresh=False, days=DEFAULT_LOOKBACK_DAYS):
+    """
+    Returns the flattened SIGNALS_HEALTH_SCHEMA rows for one business portfolio
+    """
+    since, until = get_report_window(days)
+    pixels = get_pixels_for_business_id(business_id, run_id, refresh=refresh)
+    spend = get_spend_for_pixels(
+        pixels, business_id, since, until, run_id, spend_store=SpendStore(), adset_index=AdSetPixelIndex()
+    )
+    stats = get_stats_and_settings_for_pixels(pixels, run_id)
+    return [flatten_signals_health(pixel["id"], until, spend[pixel["id"]], stats[pixel["id"]]) for pixel in pixels]
+
+def write_legacy_signals_csv(path, pixels, until, spend, stats):
+    """
+    Writes the original signals health layout, with stats, event stats and checks as stringified dicts
+    """
+    with open(path, "w") as f:
+        f.write("pixel_id,date,spend,stats,match_rate,event_stats,automatic_matching_fields,checks\n")
+        for pixel in pixels:
+            pixel_id = pixel["id"]
+            f.write(f"{pixel_id},{until},{spend[pixel_id]},{stats[pixel_id]['stats']},{stats[pixel_id]['match_rate']},{stats[pixel_id]['event_stats']},{stats[pixel_id]['automatic_matching_fields']},{stats[pixel_id]['checks']}\n")
+    return path
+
+def main(refresh=False, days=DEFAULT_LOOKBACK_DAYS, output_format="csv", run_id=None):
+    RUN_ID = run_id or str(abs(hash(time.time())))[:8]
     print_and_log(RUN_ID, "Signals health dashboard beginning.")
     
-    FacebookAdsApi.init(app_id, app_secret, access_token)
-    today = datetime.now().date()
-    since = (today - timedelta(days=7)).strftime('%Y-%m-%d')
-    until = today.strftime('%Y-%m-%d')
-    pixels = get_pixels_for_business_id(business_id, RUN_ID, True)
-    spend = get_spend_for_pixels(pixels, business_id, since, until, RUN_ID, True)
+    apply_graph_url_override()
+    FacebookAdsApi.init(constants.APP_ID, constants.APP_SECRET, test_creds.LL_ACCESS_TOKEN)
+    enable_throttling()
+    enable_instrumentation_from_env(RUN_ID)
+    since, until = get_report_window(days)
+    pixels = get_pixels_for_business_id(constants.BUSINESS_ID, RUN_ID, True, refresh=refresh)
+    # Only days missing from the local spend store, or not yet settled, are fetched,
+    # and only ad sets changed since the last run are re-indexed
+    spend = get_spend_for_pixels(
+        pixels, constants.BUSINESS_ID, since, until, RUN_ID, True, spend_store=SpendStore(), adset_index=AdSetPixelIndex()
+    )
     stats = get_stats_and_settings_for_pixels(pixels, RUN_ID, True)
     
-    # TODO: Integration Quality API
-    # integration_quality = get_integration_quality_for_datasets(pixels, RUN_ID, True)
+    # Pixels are datasets, so their integration quality comes in batches of 50
+    integration_quality = get_integration_quality_for_datasets(pixels, RUN_ID, True)
+    quality_rows = [
+        row for dataset_id, records in integration_quality.items()
+        for row in flatten_integration_quality(dataset_id, records)
+    ]
     
     # Save pixels, spend, and stats
-    with open("signals_health_dashboard.csv", "w") as f:
-        f.write("pixel_id,date,spend,stats,match_rate,event_stats,automatic_matching_fields,checks\n")
-        for pixel in pixels:
-            pixel_id = pixel["id"]
-            f.write(f"{pixel_id},{until},{spend[pixel_id]},{stats[pixel_id]['stats']},{stats[pixel_id]['match_rate']},{stats[pixel_id]['event_stats']},{stats[pixel_id]['automatic_matching_fields']},{stats[pixel_id]['checks']}\n")
+    path = output_path("signals_health_dashboard", output_format)
+    if output_format == LEGACY_CSV_FORMAT:
+        write_legacy_signals_csv(path, pixels, until, spend, stats)
+    else:
+        rows = [
+            flatten_signals_health(pixel["id"], until, spend[pixel["id"]], stats[pixel["id"]])
+            for pixel in pixels
+        ]
+        write_table(rows, SIGNALS_HEALTH_SCHEMA, path, output_format)
+    print_and_log(RUN_ID, f"Wrote {len(pixels)} pixels to {path}")
+
+    # Integration quality never had a legacy layout
+    quality_format = "csv" if output_format == LEGACY_CSV_FORMAT else output_format
+    path = write_table(
+        quality_rows, INTEGRATION_QUALITY_SCHEMA, output_path("signals_integration_quality", quality_format),
+        quality_format,
+    )
+    print_and_log(RUN_ID, f"Wrote integration quality for {len(quality_rows)} events to {path}")
     
     print_and_log(RUN_ID, "Signals health dashboard complete")
 
 if __name__ == "__main__":
-    main()
+    args = parse_arguments()
+    with profiled(args.profile, output_dir=args.profile_dir) as profile:
+        main(refresh=args.refresh, days=args.days, output_format=args.format, run_id=profile.run_id)
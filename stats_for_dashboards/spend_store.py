@@ -0,0 +1,119 @@
+"""
+Local day-partitioned store of ad set spend for the signals health dashboard.
+
+Spend is kept per ad account, ad set and day. A day is only fetched again while
+it is still unsettled, i.e. it was last synced less than UNSETTLED_DAYS after
+it ended, so widening the dashboard window costs a few extra days of insights
+instead of a full re-pull.
+"""
+
+import os
+import sqlite3
+import threading
+from datetime import date, datetime, timedelta
+
+DEFAULT_SPEND_STORE_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".dashboard_spend.sqlite"
+)
+
+# Spend for the last 48 hours can still change, so those days are re-fetched on every run
+UNSETTLED_DAYS = 2
+
+
+def _to_date(value):
+    if isinstance(value, date):
+        return value
+    return datetime.strptime(value, "%Y-%m-%d").date()
+
+
+def days_between(since, until):
+    """Returns every day from since to until, inclusive, as YYYY-MM-DD strings."""
+    start, end = _to_date(since), _to_date(until)
+    return [(start + timedelta(days=offset)).strftime("%Y-%m-%d") for offset in range((end - start).days + 1)]
+
+
+def contiguous_ranges(days):
+    """Groups sorted YYYY-MM-DD days into (since, until) ranges of consecutive days."""
+    ranges = []
+    for day in sorted(days):
+        if ranges and _to_date(day) - _to_date(ranges[-1][1]) == timedelta(days=1):
+            ranges[-1][1] = day
+        else:
+            ranges.append([day, day])
+    return [tuple(day_range) for day_range in ranges]
+
+
+class SpendStore:
+    """SQLite backed store of daily ad set spend."""
+
+    def __init__(self, path=DEFAULT_SPEND_STORE_PATH, unsettled_days=UNSETTLED_DAYS):
+        self.path = path
+        self.unsettled_days = unsettled_days
+        self._connection = None
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        # Opened on first use so that constructing the store never touches disk
+        if self._connection is None:
+            self._connection = sqlite3.connect(self.path, check_same_thread=False)
+            self._connection.executescript(
+                "CREATE TABLE IF NOT EXISTS adset_spend ("
+                "ad_account_id TEXT, adset_id TEXT, day TEXT, spend REAL, "
+                "PRIMARY KEY (ad_account_id, adset_id, day));"
+                "CREATE TABLE IF NOT EXISTS synced_days ("
+                "ad_account_id TEXT, day TEXT, synced_on TEXT, "
+                "PRIMARY KEY (ad_account_id, day));"
+            )
+        return self._connection
+
+    def days_to_fetch(self, ad_account_id, since, until, today=None):
+        """Returns the days in the window that were never synced or were synced before they settled."""
+        today = _to_date(today or date.today())
+        with self._lock:
+            synced = dict(self._connect().execute(
+                "SELECT day, synced_on FROM synced_days WHERE ad_account_id = ? AND day BETWEEN ? AND ?",
+                (ad_account_id, since, until),
+            ).fetchall())
+
+        days = []
+        for day in days_between(since, until):
+            if _to_date(day) > today:
+                continue
+            synced_on = synced.get(day)
+            settled_on = _to_date(day) + timedelta(days=self.unsettled_days)
+            if synced_on is None or _to_date(synced_on) < settled_on:
+                days.append(day)
+        return days
+
+    def save_days(self, ad_account_id, days, rows, today=None):
+        """
+        Replaces the spend of an ad account for the given days
+
+        rows is an iterable of (adset_id, day, spend). Days without rows are recorded
+        as synced with no spend.
+        """
+        synced_on = _to_date(today or date.today()).strftime("%Y-%m-%d")
+        with self._lock:
+            connection = self._connect()
+            connection.executemany(
+                "DELETE FROM adset_spend WHERE ad_account_id = ? AND day = ?",
+                [(ad_account_id, day) for day in days],
+            )
+            connection.executemany(
+                "INSERT OR REPLACE INTO adset_spend VALUES (?, ?, ?, ?)",
+                [(ad_account_id, adset_id, day, spend) for adset_id, day, spend in rows],
+            )
+            connection.executemany(
+                "INSERT OR REPLACE INTO synced_days VALUES (?, ?, ?)",
+                [(ad_account_id, day, synced_on) for day in days],
+            )
+            connection.commit()
+
+    def get_adset_spend(self, ad_account_id, since, until):
+        """Returns (adset_id, day, spend) rows of an ad account for the window."""
+        with self._lock:
+            return self._connect().execute(
+                "SELECT adset_id, day, spend FROM adset_spend "
+                "WHERE ad_account_id = ? AND day BETWEEN ? AND ? ORDER BY day",
+                (ad_account_id, since, until),
+            ).fetchall()
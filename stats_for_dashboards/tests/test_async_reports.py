@@ -0,0 +1,33 @@
+from unittest.mock import patch
+from stats_for_dashboards.async_reports import is_completed, wait_for_report_runs
+
+class FakeReportRun(dict):
+    """Report run that finishes after a fixed number of status polls"""
+
+    def __init__(self, polls_until_done, final_status="Job Completed"):
+        super().__init__(async_status="Job Running")
+        self.polls_until_done = polls_until_done
+        self.final_status = final_status
+        self.polls = 0
+
+    def api_get(self, fields=None):
+        self.polls += 1
+        if self.polls >= self.polls_until_done:
+            self["async_status"] = self.final_status
+        return self
+
+def test_wait_for_report_runs_yields_in_completion_order():
+    runs = [
+        ('act_1', FakeReportRun(3)),
+        ('act_2', FakeReportRun(1)),
+        ('act_3', FakeReportRun(2, final_status="Job Failed")),
+    ]
+
+    with patch('stats_for_dashboards.async_reports.time.sleep') as mock_sleep:
+        finished = list(wait_for_report_runs(runs))
+
+    assert [key for key, _ in finished] == ['act_2', 'act_3', 'act_1']
+    assert [is_completed(run) for _, run in finished] == [True, False, True]
+
+    # All runs share one poll schedule
+    assert mock_sleep.call_count == 2
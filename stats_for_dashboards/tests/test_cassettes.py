@@ -0,0 +1,109 @@
+import json
+import time
+
+import pytest
+from facebook_business.adobjects.adaccount import AdAccount
+from facebook_business.adobjects.business import Business
+from facebook_business.api import FacebookAdsApi, FacebookResponse
+from facebook_business.exceptions import FacebookRequestError
+from stats_for_dashboards.helpers import get_adset_spend_for_ad_account, get_stats_for_catalogs
+from utils.api_hooks import register_hook, unregister_hook
+from utils.cassettes import SECRET_PLACEHOLDER, CassetteMissError, load_cassette, recording, replaying
+from utils.fake_graph_api import FakeGraphAPI, FakeGraphData
+from utils.throttle import disable_throttling
+
+@pytest.fixture
+def api():
+    disable_throttling()
+    previous_api = FacebookAdsApi.get_default_api()
+    yield FacebookAdsApi.init("1", "secret", "token")
+    FacebookAdsApi.set_default_api(previous_api)
+
+def run_flow(business_id):
+    business = Business(business_id)
+    catalogs = list(business.get_owned_product_catalogs())
+    stats = get_stats_for_catalogs(catalogs, 'run', max_workers=1)
+    ad_account = business.get_owned_ad_accounts()[0]
+    spend = get_adset_spend_for_ad_account(ad_account, '2024-05-01', '2024-05-03')
+    try:
+        AdAccount('act_missing').api_get(fields=['name'])
+        error_code = None
+    except FacebookRequestError as e:
+        error_code = e.api_error_code()
+    return {catalog_id: value['product_count'] for catalog_id, value in stats.items()}, spend, error_code
+
+def test_replay_matches_recording_without_network(api, tmp_path):
+    cassette = str(tmp_path / 'flow.jsonl')
+    with FakeGraphAPI(FakeGraphData.seeded(seed=5), latency={'insights': 0.05}) as server:
+        business_id = server.data.business_ids[0]
+        with recording(cassette) as recorder:
+            recorded = run_flow(business_id)
+    assert recorder.recorded == len(load_cassette(cassette)) > 0
+    assert recorded[2] == 100
+    assert 'token' not in open(cassette).read()
+
+    # The server is gone, so every response has to come from the cassette
+    with replaying(cassette, latency_scale=0) as replayer:
+        start = time.perf_counter()
+        assert run_flow(business_id) == recorded
+        fast = time.perf_counter() - start
+    assert replayer.replayed == recorder.recorded
+    assert not replayer.misses
+
+    with replaying(cassette, latency_scale=1):
+        start = time.perf_counter()
+        run_flow(business_id)
+        assert time.perf_counter() - start >= 0.05 > fast
+
+def test_replay_raises_for_unrecorded_requests(api, tmp_path):
+    cassette = tmp_path / 'empty.jsonl'
+    cassette.write_text('')
+    with replaying(str(cassette)) as replayer:
+        with pytest.raises(CassetteMissError):
+            Business('1').api_get(fields=['name'])
+    assert len(replayer.misses) == 1
+
+def test_repeated_requests_replay_in_order(api, tmp_path):
+    cassette = str(tmp_path / 'repeat.jsonl')
+    with FakeGraphAPI(FakeGraphData.seeded()) as server:
+        business = Business(server.data.business_ids[0])
+        with recording(cassette):
+            first = business.api_get(fields=['name'])['name']
+            business.api_update(params={'name': 'Renamed'})
+            second = business.api_get(fields=['name'])['name']
+    assert (first, second) == ('Business 1', 'Renamed')
+
+    with replaying(cassette, latency_scale=0):
+        assert business.api_get(fields=['name'])['name'] == 'Business 1'
+        business.api_update(params={'name': 'Renamed'})
+        assert business.api_get(fields=['name'])['name'] == 'Renamed'
+        assert business.api_get(fields=['name'])['name'] == 'Renamed'
+
+class TokenPageHook:
+    """Answers every request with a cursor page whose next link carries the token, like the real Graph API."""
+
+    next_url = 'https://graph.facebook.com/v26.0/1/adsets?access_token=EAAsecret&limit=25&after=abc'
+
+    def before_call(self, call):
+        body = {'data': [{'id': '2'}], 'paging': {'next': self.next_url}, 'access_token': 'EAAsecret'}
+        return FacebookResponse(
+            body=json.dumps(body), http_status=200, headers={'Location': self.next_url}, call=None
+        )
+
+def test_recorded_bodies_and_headers_have_no_tokens(api, tmp_path):
+    cassette = str(tmp_path / 'tokens.jsonl')
+    hook = register_hook(TokenPageHook())
+    try:
+        with recording(cassette):
+            Business('1').api_get(fields=['name'])
+    finally:
+        unregister_hook(hook)
+
+    assert 'EAAsecret' not in open(cassette).read()
+    (entry,) = load_cassette(cassette)
+    body = json.loads(entry['body'])
+    assert body['paging']['next'] == (
+        f'https://graph.facebook.com/v26.0/1/adsets?access_token={SECRET_PLACEHOLDER}&limit=25&after=abc'
+    )
+    assert body['access_token'] == SECRET_PLACEHOLDER
+    assert entry['headers']['Location'] == body['paging']['next']
@@ -19,39 +19,83 @@ def mock_dependencies():
 
         yield mock_facebook_api_init, mock_get_catalogs, mock_get_stats, mock_print_and_log
 
-def test_main(mock_dependencies):
+def test_main(mock_dependencies, tmp_path, monkeypatch):
     mock_facebook_api_init, mock_get_catalogs, mock_get_stats, mock_print_and_log = mock_dependencies
+    monkeypatch.chdir(tmp_path)
 
     # Run the main function
     catalog_health_dashboard.main()
 
     # Check if the Facebook API was initialized
     mock_facebook_api_init.assert_called_once_with(
-        catalog_health_dashboard.app_id,
-        catalog_health_dashboard.app_secret,
-        catalog_health_dashboard.access_token
+        catalog_health_dashboard.constants.APP_ID,
+        catalog_health_dashboard.constants.APP_SECRET,
+        catalog_health_dashboard.test_creds.LL_ACCESS_TOKEN
     )
 
     # Check if catalogs were retrieved
     mock_get_catalogs.assert_called_once_with(
-        catalog_health_dashboard.business_id,
+        catalog_health_dashboard.constants.BUSINESS_ID,
         ANY,  # RUN_ID is dynamically generated
-        True
+        True,
+        refresh=False
     )
 
     # Check if stats were retrieved
     mock_get_stats.assert_called_once_with(
         mock_get_catalogs.return_value,
         ANY,  # RUN_ID is dynamically generated
-        True
+        True,
+        snapshot_store=ANY,
+        refresh=False
     )
 
     # Check if print_and_log was called
     assert mock_print_and_log.called
 
-    # Check if the CSV file was written correctly
+    # The default CSV has the same flattened columns as every other format
     with open("catalog_health_dashboard.csv", "r") as f:
+        assert f.read().splitlines() == [
+            "catalog_id,product_count,stats_entries,diagnostic_groups,must_fix_diagnostics,opportunity_diagnostics,affected_items",
+            "123,10,1,0,0,0,0",
+            "456,20,1,0,0,0,0",
+        ]
+
+def test_main_legacy_csv(mock_dependencies, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+
+    catalog_health_dashboard.main(output_format="csv-legacy")
+
+    with open(tmp_path / "catalog_health_dashboard.csv", "r") as f:
         lines = f.readlines()
         assert lines[0] == "catalog_id,stats,diagnostics,product_count\n"
         assert "123,stat1,diag1,10\n" in lines
         assert "456,stat2,diag2,20\n" in lines
+
+def test_main_parquet(mock_dependencies, tmp_path, monkeypatch):
+    pq = pytest.importorskip("pyarrow.parquet")
+    monkeypatch.chdir(tmp_path)
+
+    catalog_health_dashboard.main(output_format="parquet")
+
+    # Each catalog becomes one typed row
+    table = pq.read_table(tmp_path / "catalog_health_dashboard.parquet")
+    assert table.column("catalog_id").to_pylist() == ['123', '456']
+    assert table.column("product_count").to_pylist() == [10, 20]
+
+def test_main_stream(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    with patch('stats_for_dashboards.catalog_health_dashboard.FacebookAdsApi.init'), \
+         patch('stats_for_dashboards.catalog_health_dashboard.iter_catalogs_for_business_id') as mock_iter_catalogs, \
+         patch('stats_for_dashboards.helpers.get_stats_for_catalog') as mock_get_stats, \
+         patch('stats_for_dashboards.catalog_health_dashboard.print_and_log'):
+        mock_iter_catalogs.return_value = iter([{'id': '123'}, {'id': '456'}])
+        mock_get_stats.side_effect = lambda catalog: {'product_count': int(catalog['id'])}
+
+        catalog_health_dashboard.main(stream=True, max_in_flight=1)
+
+    # Streaming writes flattened rows in catalog order
+    with open(tmp_path / "catalog_health_dashboard.csv") as f:
+        lines = f.read().splitlines()
+    assert lines[1].startswith('123,123,')
+    assert lines[2].startswith('456,456,')
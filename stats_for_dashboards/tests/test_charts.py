@@ -0,0 +1,35 @@
+import subprocess
+import sys
+import pytest
+from stats_for_dashboards import helpers
+from stats_for_dashboards.charts import Chart, render_charts
+
+def test_helpers_import_does_not_load_matplotlib():
+    result = subprocess.run(
+        [sys.executable, "-c", "import sys, stats_for_dashboards.helpers; print('matplotlib' in sys.modules)"],
+        capture_output=True, text=True, check=True,
+    )
+    assert result.stdout.strip().splitlines()[-1] == "False"
+
+def test_render_charts_in_parallel(tmp_path):
+    pytest.importorskip("matplotlib")
+    charts = [
+        Chart(str(tmp_path / f"chart_{i}.{'svg' if i % 2 else 'png'}"), [("Spend", [i, i + 1, i + 3])], title=f"Chart {i}")
+        for i in range(4)
+    ]
+
+    paths = render_charts(charts, max_workers=2)
+
+    assert paths == [chart.path for chart in charts]
+    assert (tmp_path / "chart_0.png").read_bytes().startswith(b"\x89PNG")
+    assert b"<svg" in (tmp_path / "chart_1.svg").read_bytes()
+
+def test_render_charts_rejects_unknown_format(tmp_path):
+    with pytest.raises(ValueError):
+        render_charts([Chart(str(tmp_path / "chart.gif"), [("Spend", [1])])])
+
+def test_plot_moving_average_to_file(tmp_path):
+    pytest.importorskip("matplotlib")
+    path = helpers.plot_moving_average([1, 2, 3, 4], 2, "Spend", "Day", "USD", output_path=str(tmp_path / "ma.png"))
+    assert (tmp_path / "ma.png").exists()
+    assert path == str(tmp_path / "ma.png")
@@ -0,0 +1,31 @@
+import threading
+import time
+
+from utils.demo_utils import _LogWriter
+
+def test_lines_are_written_in_order(tmp_path):
+    writer = _LogWriter(str(tmp_path / 'out.log'))
+    for i in range(1000):
+        writer.write(f"{i}\n")
+    assert writer.flush()
+    assert (tmp_path / 'out.log').read_text() == "".join(f"{i}\n" for i in range(1000))
+
+def test_failed_write_falls_back_to_stderr(tmp_path, capsys):
+    writer = _LogWriter(str(tmp_path / 'missing' / 'out.log'))
+    writer.write("first\n")
+    assert writer.flush(timeout=5)
+    writer.write("second\n")
+    assert writer.flush(timeout=5)
+    assert writer._thread.is_alive()
+    stderr = capsys.readouterr().err
+    assert "Could not write to" in stderr and "first\n" in stderr and "second\n" in stderr
+
+def test_flush_does_not_hang_on_a_dead_writer(tmp_path):
+    writer = _LogWriter(str(tmp_path / 'out.log'))
+    writer._thread = threading.Thread(target=lambda: None)
+    writer._thread.start()
+    writer._thread.join()
+    writer._queue.put("never written\n")
+    start = time.monotonic()
+    assert not writer.flush(timeout=5)
+    assert time.monotonic() - start < 1
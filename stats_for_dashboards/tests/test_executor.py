@@ -0,0 +1,70 @@
+import time
+import pytest
+from unittest.mock import patch
+from stats_for_dashboards.executor import fan_out, fan_out_iter
+from utils.throttle import Throttle
+
+def test_fan_out_keeps_input_order():
+    # Later items finish first, results must still follow the input order
+    def slow_square(value):
+        time.sleep(0.01 * (5 - value))
+        return value * value
+
+    assert fan_out(slow_square, range(5), max_workers=5) == [0, 1, 4, 9, 16]
+
+def test_fan_out_runs_concurrently():
+    start = time.monotonic()
+    fan_out(lambda _: time.sleep(0.2), range(4), max_workers=4)
+
+    # Closer to the slowest call than to the sum of all of them
+    assert time.monotonic() - start < 0.6
+
+def test_fan_out_serial_when_single_worker():
+    calls = []
+    assert fan_out(calls.append, ['a', 'b'], max_workers=1) == [None, None]
+    assert calls == ['a', 'b']
+
+def test_fan_out_propagates_errors():
+    def fail_on_two(value):
+        if value == 2:
+            raise ValueError("boom")
+        return value
+
+    with pytest.raises(ValueError):
+        fan_out(fail_on_two, range(4), max_workers=2)
+
+def test_fan_out_iter_bounds_items_in_flight():
+    consumed = []
+
+    def items():
+        for value in range(20):
+            # Never more than max_in_flight items ahead of the consumer
+            assert value - len(consumed) <= 3
+            yield value
+
+    for result in fan_out_iter(lambda value: value * 2, items(), max_workers=2, max_in_flight=3):
+        consumed.append(result)
+
+    assert consumed == [value * 2 for value in range(20)]
+
+def test_fan_out_follows_throttle_headroom():
+    throttle = Throttle(slowdown_usage=50, target_usage=90)
+    # Ad account at 70% of its limit: half of the headroom is left
+    throttle.observe('act_1', {'x-ad-account-usage': '{"acc_id_util_pct": 70}'})
+    assert throttle.recommended_concurrency(8) == 4
+    assert throttle.state()['1']['usage'] == 70
+
+    workers = set()
+    def record_thread(value):
+        import threading
+        workers.add(threading.get_ident())
+        time.sleep(0.01)
+        return value
+
+    with patch('stats_for_dashboards.executor.get_active_throttle', return_value=throttle):
+        assert fan_out(record_thread, range(16), max_workers=8) == list(range(16))
+    assert len(workers) <= 4
+
+    # Access blocked until reset: one worker at a time
+    throttle.observe('act_1', {'x-business-use-case-usage': '{"1": [{"call_count": 100, "estimated_time_to_regain_access": 1}]}'})
+    assert throttle.recommended_concurrency(8) == 1
@@ -0,0 +1,90 @@
+import pytest
+from stats_for_dashboards.export import (
+    CATALOG_HEALTH_SCHEMA,
+    SIGNALS_HEALTH_SCHEMA,
+    TableWriter,
+    flatten_integration_quality,
+    flatten_catalog_health,
+    flatten_signals_health,
+    write_table,
+)
+
+def test_flatten_catalog_health():
+    row = flatten_catalog_health('123', {
+        'stats': [{'attribute': 'a'}, {'attribute': 'b'}],
+        'diagnostics': {'data': [
+            {'severity': 'MUST_FIX', 'number_of_affected_items': 5},
+            {'severity': 'OPPORTUNITY', 'number_of_affected_items': '2'},
+        ]},
+        'product_count': '10',
+    })
+    assert row == {
+        'catalog_id': '123',
+        'product_count': 10,
+        'stats_entries': 2,
+        'diagnostic_groups': 2,
+        'must_fix_diagnostics': 1,
+        'opportunity_diagnostics': 1,
+        'affected_items': 7,
+    }
+
+def test_flatten_signals_health():
+    row = flatten_signals_health('789', '2024-01-07', 100, {
+        'stats': [{'data': [{'value': 'Purchase', 'count': 3}, {'value': 'PageView', 'count': 10}]}],
+        'match_rate': 90,
+        'event_stats': {'Purchase': 3},
+        'automatic_matching_fields': ['em', 'ph'],
+        'checks': [{'result': 'passed'}, {'result': 'failed'}, {'result': 'passed'}],
+    })
+    assert row['event_count'] == 13
+    assert row['distinct_events'] == 2
+    assert row['automatic_matching_fields'] == 'em,ph'
+    assert (row['checks_passed'], row['checks_failed']) == (2, 1)
+    assert row['event_stats'] == '{"Purchase": 3}'
+
+@pytest.mark.parametrize("output_format", ["parquet", "arrow"])
+def test_write_table_keeps_schema_types(tmp_path, output_format):
+    pa = pytest.importorskip("pyarrow")
+    rows = [flatten_signals_health('789', '2024-01-07', '12.5', {'match_rate': 80})]
+    path = write_table(rows, SIGNALS_HEALTH_SCHEMA, str(tmp_path / f"out.{output_format}"), output_format)
+
+    if output_format == "parquet":
+        import pyarrow.parquet as pq
+        table = pq.read_table(path)
+    else:
+        table = pa.ipc.open_file(pa.memory_map(path)).read_all()
+
+    assert table.schema.field('date').type == pa.date32()
+    assert table.schema.field('spend').type == pa.float64()
+    assert table.column('spend').to_pylist() == [12.5]
+
+def test_write_table_csv(tmp_path):
+    path = write_table([flatten_catalog_health('123', {'product_count': 4})], CATALOG_HEALTH_SCHEMA,
+                       str(tmp_path / "out.csv"), "csv")
+    with open(path) as f:
+        assert f.read().splitlines() == [
+            'catalog_id,product_count,stats_entries,diagnostic_groups,must_fix_diagnostics,opportunity_diagnostics,affected_items',
+            '123,4,0,0,0,0,0',
+        ]
+
+def test_table_writer_writes_in_batches(tmp_path):
+    pq = pytest.importorskip("pyarrow.parquet")
+    path = str(tmp_path / "out.parquet")
+    with TableWriter(path, CATALOG_HEALTH_SCHEMA, "parquet", batch_size=2) as writer:
+        for catalog_id in range(5):
+            writer.write_row(flatten_catalog_health(catalog_id, {'product_count': catalog_id}))
+
+    assert writer.rows_written == 5
+    parquet_file = pq.ParquetFile(path)
+    assert parquet_file.metadata.num_row_groups == 3
+    assert parquet_file.read().column('product_count').to_pylist() == [0, 1, 2, 3, 4]
+
+def test_flatten_integration_quality():
+    rows = flatten_integration_quality('789', {'data': [
+        {'event_name': 'Purchase', 'event_match_quality': {'composite_score': 7.2}, 'event_coverage': {'percentage': 55}},
+        {'event_name': 'Lead', 'event_match_quality': '4.1'},
+    ]})
+    assert rows == [
+        {'dataset_id': '789', 'event_name': 'Purchase', 'event_match_quality': 7.2, 'event_coverage': 55.0},
+        {'dataset_id': '789', 'event_name': 'Lead', 'event_match_quality': 4.1, 'event_coverage': 0.0},
+    ]
@@ -0,0 +1,165 @@
+import base64
+import hashlib
+import os
+from unittest.mock import patch
+
+import pytest
+from facebook_business.adobjects.adaccount import AdAccount
+from facebook_business.adobjects.advideo import AdVideo
+from facebook_business.adobjects.business import Business
+from facebook_business.api import FacebookAdsApi
+from facebook_business.exceptions import FacebookRequestError
+from facebook_business.session import FacebookSession
+from stats_for_dashboards.catalog_snapshots import CATALOG_FINGERPRINT_FIELDS
+from stats_for_dashboards.helpers import (
+    get_adset_spend_for_ad_account,
+    get_pixel_ids_for_ad_sets,
+    get_stats_for_catalogs,
+)
+from utils import constants
+from utils.constants import apply_graph_url_override, set_video_upload_url
+from utils.fake_graph_api import FakeGraphAPI, FakeGraphData, parse_fields
+from utils.graph_batch import GraphBatch
+from utils.throttle import disable_throttling
+
+@pytest.fixture
+def server():
+    # Dashboard mains enable throttling, which would wait out the fake rate limits instead of failing
+    disable_throttling()
+    previous_api = FacebookAdsApi.get_default_api()
+    with FakeGraphAPI(FakeGraphData.seeded(seed=3, ad_sets=30, catalogs=4), page_size=10) as server:
+        FacebookAdsApi.init("1", "secret", "token")
+        yield server
+    FacebookAdsApi.set_default_api(previous_api)
+
+def test_parse_fields():
+    assert parse_fields('product_count,product_feeds{latest_upload{end_time}},stats') == {
+        'product_count': None,
+        'product_feeds': {'latest_upload': {'end_time': None}},
+        'stats': None,
+    }
+    assert parse_fields('["spend", "adset_id"]') == {'spend': None, 'adset_id': None}
+
+def test_apply_graph_url_override():
+    previous = FacebookSession.GRAPH
+    try:
+        with patch.dict(os.environ, {'META_GRAPH_URL': 'http://127.0.0.1:9/'}):
+            assert apply_graph_url_override() == 'http://127.0.0.1:9/'
+        assert FacebookSession.GRAPH == 'http://127.0.0.1:9'
+    finally:
+        FacebookSession.GRAPH = previous
+        # The SDK's video uploader, which hardcodes its own host, was moved too
+        assert set_video_upload_url(None) == 'http://127.0.0.1:9'
+
+def test_edges_are_paged(server):
+    business = Business(server.data.business_ids[0])
+    ad_sets = list(AdAccount(business.get_owned_ad_accounts()[0]['id']).get_ad_sets(fields=['name']))
+    assert len(ad_sets) == 30
+    assert len({ad_set['id'] for ad_set in ad_sets}) == 30
+    assert server.request_counts['adsets'] == 3
+
+def test_expanded_edge_modifiers(server):
+    catalog_id = server.data.children(server.data.business_ids[0], 'owned_product_catalogs')[0]['id']
+    for _ in range(30):
+        server.data.add('product_feed', {'latest_upload': {'end_time': '2024-01-01T00:00:00+0000'}},
+                        [(catalog_id, 'product_feeds')])
+    feed_count = len(server.data.children(catalog_id, 'product_feeds'))
+    api = FacebookAdsApi.get_default_api()
+
+    def read(fields):
+        return api.call('GET', ('',), params={'ids': catalog_id, 'fields': fields}).json()[catalog_id]
+
+    # A plain expansion stops at the page size, the fingerprint fields read every feed and their count
+    assert len(read('product_feeds{latest_upload}')['product_feeds']['data']) == 10
+    feeds = read(CATALOG_FINGERPRINT_FIELDS)['product_feeds']
+    assert len(feeds['data']) == feed_count
+    assert feeds['summary'] == {'total_count': feed_count}
+
+def test_helpers_run_against_fake_server(server):
+    business = Business(server.data.business_ids[0])
+    catalogs = list(business.get_owned_product_catalogs())
+    stats = get_stats_for_catalogs(catalogs, 'run', max_workers=2)
+    assert len(stats) == 4
+    for catalog in catalogs:
+        assert stats[catalog['id']]['product_count'] == server.data.nodes[catalog['id']]['product_count']
+
+    ad_account = business.get_owned_ad_accounts()[0]
+    spend = get_adset_spend_for_ad_account(ad_account, '2024-05-01', '2024-05-07')
+    assert len(spend) == 30
+    assert all(value >= 0 for value in spend.values())
+    pixel_map = get_pixel_ids_for_ad_sets(ad_account)
+    assert set(pixel_map) <= set(spend)
+
+def test_insights_are_deterministic(server):
+    ad_account = Business(server.data.business_ids[0]).get_owned_ad_accounts()[0]
+    params = {'level': 'adset', 'time_range': {'since': '2024-05-01', 'until': '2024-05-02'}, 'time_increment': 1,
+              'fields': ['spend', 'adset_id']}
+    first = [dict(row) for row in AdAccount(ad_account['id']).get_insights(params=params)]
+    second = [dict(row) for row in AdAccount(ad_account['id']).get_insights(params=params)]
+    assert first == second
+    assert len(first) == 60
+    assert {row['date_start'] for row in first} == {'2024-05-01', '2024-05-02'}
+
+def test_injected_errors_and_rate_limits(server):
+    business = Business(server.data.business_ids[0])
+    server.fail_next('business', status=500, code=2)
+    with pytest.raises(FacebookRequestError) as error:
+        business.api_get(fields=['name'])
+    assert error.value.api_error_code() == 2
+    assert business.api_get(fields=['name'])['name'] == 'Business 1'
+
+    server.rate_limit = 3
+    with pytest.raises(FacebookRequestError) as error:
+        for _ in range(5):
+            business.api_get(fields=['name'])
+    assert error.value.api_error_code() == 4  # The app limit is reached first
+
+def test_batch_with_references(server):
+    ad_account_id = Business(server.data.business_ids[0]).get_owned_ad_accounts()[0]['id']
+    batch = GraphBatch()
+    campaign = batch.add('POST', f'{ad_account_id}/campaigns', {'name': 'New campaign'})
+    ad_set = batch.add('POST', f'{ad_account_id}/adsets', {'name': 'New ad set', 'campaign_id': batch.ref(campaign)})
+    batch.execute()
+    assert ad_set.is_success()
+    assert server.data.nodes[ad_set.get_id()]['campaign_id'] == campaign.get_id()
+    assert ad_set.get_id() in server.data.edges[(campaign.get_id(), 'adsets')]
+
+def first_ad_account_id(server):
+    return server.data.children(server.data.business_ids[0], 'owned_ad_accounts')[0]['id']
+
+def test_multipart_image_upload_recipe(server, tmp_path, monkeypatch):
+    from image_upload import upload_random_image
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(constants, 'AD_ACCOUNT_ID', first_ad_account_id(server))
+
+    image_hash = upload_random_image.upload_image_to_facebook()
+
+    # The hash comes from the uploaded file, as with the Graph API
+    assert image_hash and len(image_hash) == 32
+    images = server.data.children(constants.AD_ACCOUNT_ID, 'adimages')
+    assert [image['hash'] for image in images] == [image_hash]
+
+def test_base64_image_upload(server):
+    content = b'not really a png'
+    image = AdAccount(first_ad_account_id(server)).create_ad_image(
+        params={'bytes': base64.b64encode(content).decode(), 'name': 'pixel.png'}
+    )
+    assert image['hash'] == hashlib.md5(content).hexdigest()
+
+def test_chunked_video_upload_goes_to_the_fake_server(server, tmp_path):
+    video_path = tmp_path / 'clip.mp4'
+    video_path.write_bytes(os.urandom(4096))
+    video = AdVideo(parent_id=first_ad_account_id(server))
+    video[AdVideo.Field.filepath] = str(video_path)
+    video.remote_create()
+
+    # start, transfer and finish all reached the server instead of graph-video.facebook.com
+    assert server.request_counts['advideos'] == 3
+    uploaded = server.data.nodes[video.get_id()]
+    assert (uploaded['status'], uploaded['title'], uploaded['_received']) == ('ready', 'clip.mp4', 4096)
+
+def test_video_upload_host_is_restored(tmp_path):
+    assert set_video_upload_url(None) is None
+    with FakeGraphAPI(FakeGraphData.seeded()) as server:
+        assert set_video_upload_url(server.url) == server.url
+    assert set_video_upload_url(None) is None
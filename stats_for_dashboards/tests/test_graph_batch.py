@@ -0,0 +1,119 @@
+import json
+from urllib.parse import parse_qs
+import pytest
+from unittest.mock import MagicMock
+from facebook_business.exceptions import FacebookRequestError
+from utils.graph_batch import MAX_BATCH_SIZE, GraphBatch
+
+def fake_api(fail=(), raise_on_request=None):
+    """
+    An api whose batch calls succeed with an id per operation
+
+    Operations named in fail get a 400 response; raise_on_request is the index of a
+    batch request that fails as a whole.
+    """
+    api = MagicMock()
+    api.requests = []
+
+    def call(method, path, params):
+        api.requests.append(params['batch'])
+        if len(api.requests) - 1 == raise_on_request:
+            raise FacebookRequestError('error', {}, 500, {}, '{"error": {"message": "batch failed"}}')
+        return MagicMock(json=MagicMock(return_value=[
+            {'code': 400, 'body': '{"error": {"message": "invalid"}}'} if op['name'] in fail
+            else {'code': 200, 'body': json.dumps({'id': f"id_{op['name']}"})}
+            for op in params['batch']
+        ]))
+    api.call.side_effect = call
+    return api
+
+def body(op):
+    return {key: values[0] for key, values in parse_qs(op['body']).items()}
+
+def test_operations_are_split_at_max_batch_size():
+    api = fake_api()
+    batch = GraphBatch(api=api)
+    results = [batch.add('POST', 'act_1/campaigns', {'name': str(i)}) for i in range(MAX_BATCH_SIZE + 1)]
+
+    assert batch.execute() == results
+    assert [len(request) for request in api.requests] == [MAX_BATCH_SIZE, 1]
+    assert all(result.is_success() for result in results)
+    assert results[-1].get_id() == f'id_{results[-1].name}'
+    assert len(batch) == 0
+
+def test_reference_within_a_request_is_left_to_the_graph_api():
+    api = fake_api()
+    batch = GraphBatch(api=api)
+    campaign = batch.add('POST', 'act_1/campaigns', {'name': 'campaign'})
+    batch.add('POST', 'act_1/adsets', {'campaign_id': batch.ref(campaign)})
+    batch.execute()
+
+    ad_set_op = api.requests[0][1]
+    assert ad_set_op['depends_on'] == campaign.name
+    assert body(ad_set_op)['campaign_id'] == f'{{result={campaign.name}:$.id}}'
+
+def test_reference_to_an_earlier_request_is_resolved_to_its_id():
+    api = fake_api()
+    batch = GraphBatch(api=api, batch_size=1)
+    campaign = batch.add('POST', 'act_1/campaigns', {'name': 'campaign'})
+    ad_set = batch.add('POST', 'act_1/adsets', {'campaign_id': batch.ref(campaign)})
+    batch.execute()
+
+    ad_set_op = api.requests[1][0]
+    assert 'depends_on' not in ad_set_op
+    assert body(ad_set_op)['campaign_id'] == 'id_op0'
+    assert ad_set.is_success()
+
+def test_operation_whose_parent_failed_is_not_sent():
+    api = fake_api(fail={'op0'})
+    batch = GraphBatch(api=api, batch_size=1)
+    campaign = batch.add('POST', 'act_1/campaigns', {'name': 'campaign'})
+    ad_set = batch.add('POST', 'act_1/adsets', {'campaign_id': batch.ref(campaign)})
+    sibling = batch.add('POST', 'act_1/campaigns', {'name': 'sibling'})
+    batch.execute()
+
+    assert campaign.executed and not campaign.is_success()
+    assert not ad_set.executed and not ad_set.is_success()
+    assert ad_set.error().api_error_message() is None
+    assert sibling.is_success()
+    # The ad set's request had nothing else to send, so only two requests went out
+    assert [[op['name'] for op in request] for request in api.requests] == [['op0'], ['op2']]
+
+def test_unknown_reference_raises():
+    batch = GraphBatch(api=fake_api(), batch_size=1)
+    batch.add('POST', 'act_1/campaigns', {'name': 'campaign'})
+    batch.add('POST', 'act_1/adsets', {'campaign_id': '{result=missing:$.id}'})
+    with pytest.raises(ValueError):
+        batch.execute()
+
+def test_success_and_failure_callbacks():
+    api = fake_api(fail={'bad'})
+    succeeded, failed = [], []
+    batch = GraphBatch(api=api)
+    good = batch.add('POST', 'act_1/campaigns', name='good', success=succeeded.append, failure=failed.append)
+    bad = batch.add('POST', 'act_1/campaigns', name='bad', success=succeeded.append, failure=failed.append)
+    batch.execute()
+
+    assert succeeded == [good] and failed == [bad]
+    assert bad.error().api_error_message() == 'invalid'
+    with pytest.raises(FacebookRequestError):
+        bad.raise_for_error()
+
+def test_failed_second_request_keeps_the_first_requests_results():
+    api = fake_api(raise_on_request=1)
+    batch = GraphBatch(api=api, batch_size=2)
+    results = [batch.add('POST', 'act_1/campaigns', {'name': str(i)}) for i in range(4)]
+
+    with pytest.raises(FacebookRequestError):
+        batch.execute()
+
+    assert [result.get_id() for result in results[:2]] == ['id_op0', 'id_op1']
+    assert not any(result.executed for result in results[2:])
+
+def test_duplicate_names_and_bad_batch_size_are_rejected():
+    batch = GraphBatch(api=fake_api())
+    batch.add('GET', 'me', name='me')
+    with pytest.raises(ValueError):
+        batch.add('GET', 'me', name='me')
+    with pytest.raises(ValueError):
+        GraphBatch(batch_size=MAX_BATCH_SIZE + 1)
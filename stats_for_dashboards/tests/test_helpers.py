@@ -0,0 +1,240 @@
+import json
+import pytest
+from unittest.mock import MagicMock, patch
+from stats_for_dashboards import helpers
+from stats_for_dashboards.adset_index import AdSetPixelIndex
+from stats_for_dashboards.catalog_snapshots import CatalogSnapshotStore, catalog_fingerprint
+from stats_for_dashboards.spend_store import SpendStore
+
+@pytest.fixture
+def mock_pixels():
+    ad_account = MagicMock()
+    ad_account.__getitem__.side_effect = {'id': 'act_1'}.__getitem__
+    ad_account.get_ad_sets.return_value = [
+        {'id': 'as_1', 'promoted_object': {'pixel_id': '789'}},
+        {'id': 'as_2', 'promoted_object': {'pixel_id': '012'}},
+        {'id': 'as_3', 'promoted_object': {'page_id': '555'}},
+    ]
+    ad_account.get_insights.return_value = [
+        {'adset_id': 'as_1', 'spend': '10.5'},
+        {'adset_id': 'as_2', 'spend': '4'},
+        {'adset_id': 'as_3', 'spend': '100'},
+    ]
+
+    pixels = []
+    for pixel_id in ('789', '012'):
+        pixel = MagicMock()
+        pixel.__getitem__.side_effect = {'id': pixel_id}.__getitem__
+        pixel.get_ad_accounts.return_value = [ad_account]
+        pixels.append(pixel)
+
+    yield pixels, ad_account
+
+def test_get_spend_for_pixels_account_level(mock_pixels):
+    pixels, ad_account = mock_pixels
+
+    with patch('stats_for_dashboards.helpers.AdSet') as mock_ad_set:
+        spend = helpers.get_spend_for_pixels(pixels, '123', '2024-01-01', '2024-01-07', 'run')
+
+    # Spend is joined in memory, without per ad set requests
+    assert spend == {'789': 10.5, '012': 4.0}
+    assert not mock_ad_set.called
+
+    # The shared ad account is listed and queried once
+    ad_account.get_ad_sets.assert_called_once()
+    ad_account.get_insights.assert_called_once()
+    assert ad_account.get_insights.call_args.kwargs['params']['level'] == 'adset'
+
+def test_get_spend_for_pixels_from_spend_store(mock_pixels, tmp_path):
+    pixels, ad_account = mock_pixels
+    ad_account.get_insights.return_value = [
+        {'adset_id': 'as_1', 'date_start': '2024-01-01', 'spend': '1.5'},
+        {'adset_id': 'as_1', 'date_start': '2024-01-02', 'spend': '2'},
+        {'adset_id': 'as_2', 'date_start': '2024-01-02', 'spend': '4'},
+    ]
+    store = SpendStore(path=str(tmp_path / "spend.sqlite"))
+
+    spend = helpers.get_spend_for_pixels(
+        pixels, '123', '2024-01-01', '2024-01-02', 'run', spend_store=store
+    )
+    assert spend == {'789': 3.5, '012': 4.0}
+    assert ad_account.get_insights.call_args.kwargs['params']['time_increment'] == 1
+
+    # Settled days are read back from the store without another insights request
+    ad_account.get_insights.reset_mock()
+    assert helpers.get_spend_for_pixels(
+        pixels, '123', '2024-01-01', '2024-01-02', 'run', spend_store=store
+    ) == spend
+    assert not ad_account.get_insights.called
+
+def mock_catalog(catalog_id):
+    catalog = MagicMock()
+    catalog.__getitem__.side_effect = {'id': catalog_id}.__getitem__
+    catalog.api_get.return_value = {'product_count': 1}
+    return catalog
+
+def test_get_stats_for_catalogs_expands_fields_in_one_request():
+    catalogs = [mock_catalog('1'), mock_catalog('2')]
+    api = MagicMock()
+    api.call.return_value.json.return_value = {
+        '1': {'product_count': 10, 'stats': {'data': [{'n': 1}]}, 'diagnostics': {'data': []}},
+        # More diagnostics than fit in the expanded page
+        '2': {'product_count': 20, 'stats': {'data': []}, 'diagnostics': {'data': [{}], 'paging': {'next': 'url'}}},
+    }
+
+    with patch('stats_for_dashboards.helpers.FacebookAdsApi.get_default_api', return_value=api):
+        stats = helpers.get_stats_for_catalogs(catalogs, 'run')
+
+    api.call.assert_called_once()
+    assert api.call.call_args.kwargs['params']['ids'] == '1,2'
+    assert stats['1'] == {'stats': [{'n': 1}], 'diagnostics': [], 'product_count': 10}
+    assert stats['2']['product_count'] == 20
+    assert stats['2']['diagnostics'] is catalogs[1].get_diagnostics.return_value
+    assert not catalogs[0].api_get.called
+
+def test_get_stats_for_catalogs_falls_back_to_separate_requests():
+    from facebook_business.adobjects.productcatalog import ProductCatalog
+    from facebook_business.api import FacebookResponse
+    from facebook_business.exceptions import FacebookRequestError
+    api = MagicMock()
+    catalogs = [ProductCatalog('1', api=api)]
+    responses = {
+        ('1', ''): {'product_count': 1, 'id': '1'},
+        ('1', 'stats'): {'data': [{'n': 1}], 'paging': {'next': 'https://graph.facebook.com/1/stats?after=1'}},
+        'https://graph.facebook.com/1/stats?after=1': {'data': [{'n': 2}]},
+        ('1', 'diagnostics'): {'data': []},
+    }
+
+    def call(method, path, params=None, **kwargs):
+        if path == ('',):
+            raise FacebookRequestError('error', {}, 400, {}, '{}')
+        body = responses[path if isinstance(path, str) else tuple(path)]
+        return FacebookResponse(body=json.dumps(body), http_status=200, headers={}, call=None)
+
+    api.call.side_effect = call
+    with patch('stats_for_dashboards.helpers.FacebookAdsApi.get_default_api', return_value=api):
+        stats = helpers.get_stats_for_catalogs(catalogs, 'run')
+
+    # ProductCatalog has no get_stats, so stats come from an explicit edge request, every page of it
+    assert stats['1']['product_count'] == 1
+    assert stats['1']['stats'] == [{'n': 1}, {'n': 2}]
+    assert list(stats['1']['diagnostics']) == []
+
+def test_get_spend_for_pixels_with_adset_index(mock_pixels, tmp_path):
+    pixels, ad_account = mock_pixels
+    ad_account.get_ad_sets.return_value = [
+        {'id': 'as_1', 'promoted_object': {'pixel_id': '789'}, 'updated_time': '2024-01-01T10:00:00+0000'},
+        {'id': 'as_2', 'promoted_object': {'pixel_id': '012'}, 'updated_time': '2024-01-02T10:00:00+0000'},
+    ]
+    index = AdSetPixelIndex(path=str(tmp_path / "index.sqlite"))
+
+    spend = helpers.get_spend_for_pixels(pixels, '123', '2024-01-01', '2024-01-07', 'run', adset_index=index)
+    assert spend == {'789': 10.5, '012': 4.0}
+    assert 'filtering' not in ad_account.get_ad_sets.call_args.kwargs['params']
+
+    # The next run only lists ad sets updated since the newest indexed one
+    ad_account.get_ad_sets.return_value = [
+        {'id': 'as_1', 'promoted_object': {'pixel_id': '012'}, 'updated_time': '2024-01-03T10:00:00+0000'},
+    ]
+    spend = helpers.get_spend_for_pixels(pixels, '123', '2024-01-01', '2024-01-07', 'run', adset_index=index)
+    assert spend == {'012': 14.5}
+    assert ad_account.get_ad_sets.call_args.kwargs['params']['filtering'][0]['operator'] == 'GREATER_THAN'
+
+def test_get_spend_for_pixels_per_ad_set_keys_by_pixel_id(mock_pixels):
+    pixels, ad_account = mock_pixels
+
+    with patch('stats_for_dashboards.helpers.AdSet') as mock_ad_set:
+        mock_ad_set.return_value.get_insights.return_value = [{'spend': '2'}]
+        spend = helpers.get_spend_for_pixels(pixels, '123', '2024-01-01', '2024-01-07', 'run', account_level=False)
+
+    # Only ad sets promoting one of the pixels are queried, and spend is keyed by pixel id
+    assert spend == {'789': 2.0, '012': 2.0}
+    assert mock_ad_set.call_count == 2
+    assert not mock_ad_set.return_value.api_get.called
+
+def test_get_integration_quality_for_datasets_batches_requests():
+    datasets = [{'id': str(i)} for i in range(60)]
+    api = MagicMock()
+
+    def batch_response(method, path, params):
+        return MagicMock(json=MagicMock(return_value=[
+            {'code': 200, 'body': '{"data": [{"event_name": "Purchase"}]}'} if call['relative_url'].startswith('1/')
+            else {'code': 400, 'body': '{"error": {"message": "unsupported"}}'}
+            for call in params['batch']
+        ]))
+    api.call.side_effect = batch_response
+
+    quality = helpers.get_integration_quality_for_datasets(datasets, 'run', max_workers=1, api=api)
+
+    # 60 datasets fit in two batch requests, with every field requested
+    assert api.call.call_count == 2
+    first_call = api.call.call_args_list[0].kwargs['params']['batch'][0]
+    assert 'fields=event_name%2Cevent_match_quality%2Cevent_coverage' in first_call['relative_url']
+    assert quality['1'] == [{'event_name': 'Purchase'}]
+    assert quality['2'] == []
+    assert len(quality) == 60
+
+def test_failed_integration_quality_batch_only_empties_its_group():
+    from facebook_business.exceptions import FacebookRequestError
+    datasets = [{'id': str(i)} for i in range(60)]
+    api = MagicMock()
+
+    def batch_response(method, path, params):
+        if params['batch'][0]['relative_url'].startswith('0/'):
+            raise FacebookRequestError('error', {}, 500, {}, '{}')
+        return MagicMock(json=MagicMock(return_value=[
+            {'code': 200, 'body': '{"data": [{"event_name": "Purchase"}]}'} for _ in params['batch']
+        ]))
+    api.call.side_effect = batch_response
+
+    quality = helpers.get_integration_quality_for_datasets(datasets, 'run', max_workers=1, api=api)
+
+    # The first batch request failed, the second one still fills in its datasets
+    assert all(quality[str(i)] == [] for i in range(50))
+    assert all(quality[str(i)] == [{'event_name': 'Purchase'}] for i in range(50, 60))
+
+def test_get_stats_for_catalogs_serves_unchanged_catalogs_from_snapshot(tmp_path):
+    catalogs = [mock_catalog('1'), mock_catalog('2')]
+    store = CatalogSnapshotStore(path=str(tmp_path / "snapshots.sqlite"))
+    feeds = {'data': [{'latest_upload': {'end_time': '2024-01-01T00:00:00+0000'}}]}
+    fingerprints = {'1': {'product_count': 10, 'product_feeds': feeds}, '2': {'product_count': 20, 'product_feeds': feeds}}
+    full = {
+        '1': {'product_count': 10, 'stats': {'data': [{'n': 1}]}, 'diagnostics': {'data': []}},
+        '2': {'product_count': 20, 'stats': {'data': []}, 'diagnostics': {'data': []}},
+    }
+    api = MagicMock()
+    api.call.side_effect = lambda method, path, params: MagicMock(json=MagicMock(return_value={
+        catalog_id: (fingerprints if 'product_feeds' in params['fields'] else full)[catalog_id]
+        for catalog_id in params['ids'].split(',')
+    }))
+
+    with patch('stats_for_dashboards.helpers.FacebookAdsApi.get_default_api', return_value=api):
+        helpers.get_stats_for_catalogs(catalogs, 'run', snapshot_store=store)
+        assert api.call.call_count == 2
+
+        # Catalog 2 received a new product, catalog 1 is unchanged
+        fingerprints['2'] = {'product_count': 21, 'product_feeds': feeds}
+        full['2'] = {'product_count': 21, 'stats': {'data': []}, 'diagnostics': {'data': []}}
+        api.call.reset_mock()
+        stats = helpers.get_stats_for_catalogs(catalogs, 'run', snapshot_store=store)
+
+    assert stats['1'] == {'stats': [{'n': 1}], 'diagnostics': [], 'product_count': 10}
+    assert stats['2']['product_count'] == 21
+    assert api.call.call_args_list[-1].kwargs['params']['ids'] == '2'
+
+def test_catalog_fingerprint_counts_feeds_past_the_first_page():
+    feeds = {'data': [{'latest_upload': {'end_time': '2024-01-01T00:00:00+0000'}}], 'summary': {'total_count': 120}}
+    fingerprint = catalog_fingerprint({'product_count': 10, 'product_feeds': feeds})
+    feeds['summary']['total_count'] = 121
+    assert catalog_fingerprint({'product_count': 10, 'product_feeds': feeds}) != fingerprint
+
+def test_snapshots_older_than_max_age_are_refetched(tmp_path):
+    now = [1000.0]
+    path = str(tmp_path / "snapshots.sqlite")
+    store = CatalogSnapshotStore(path=path, max_age=60, clock=lambda: now[0])
+    store.save_many([('1', 'fingerprint', {'product_count': 10})])
+    assert store.get_many(['1']) == {'1': ('fingerprint', {'product_count': 10})}
+
+    now[0] += 61
+    assert store.get_many(['1']) == {}
+    assert '1' in CatalogSnapshotStore(path=path, max_age=None).get_many(['1'])
@@ -0,0 +1,38 @@
+import pytest
+from utils.import_budget import check_budgets, measure_import, parse_importtime
+
+def test_parse_importtime():
+    stderr = (
+        "import time: self [us] | cumulative | imported package\n"
+        "import time:       120 |        120 |   utils.demo_utils\n"
+        "WARNING: not a timing line\n"
+        "import time:       600 |       5000 | stats_for_dashboards.helpers\n"
+    )
+    assert parse_importtime(stderr) == {
+        'utils.demo_utils': (120, 120),
+        'stats_for_dashboards.helpers': (600, 5000),
+    }
+
+@pytest.mark.parametrize("module", [
+    "utils.constants",
+    "utils.test_creds",
+    "stats_for_dashboards.catalog_health_dashboard",
+    "stats_for_dashboards.reels_performant_creative_dashboard",
+    "stats_for_dashboards.signals_health_dashboard",
+    "scale_good_ads.scale_good_ads",
+    "ads_editing.ads_editing_sample",
+])
+def test_entry_points_import_without_side_effects(module, monkeypatch):
+    # Nothing is printed or logged, and no prompt is waiting for input, when an entry point is imported
+    monkeypatch.delenv("META_ACCESS_TOKEN", raising=False)
+    profile = measure_import(module)
+    assert profile["stdout"] == ""
+    assert profile["stderr"] == ""
+    assert profile["cumulative_ms"] > 0
+
+def test_writing_to_stderr_on_import_fails_the_budget(tmp_path, monkeypatch):
+    (tmp_path / "noisy_module.py").write_text("import logging\nlogging.getLogger(__name__).warning('resolved at import')\n")
+    monkeypatch.setenv("PYTHONPATH", str(tmp_path))
+    (result,) = check_budgets({"noisy_module": 500}, repeat=1)
+    assert "resolved at import" in result["stderr"]
+    assert not result["ok"]
@@ -0,0 +1,68 @@
+import json
+from unittest.mock import MagicMock
+
+import pytest
+from facebook_business.adobjects.business import Business
+from facebook_business.api import FacebookAdsApi
+from stats_for_dashboards.helpers import get_spend_for_pixels
+from utils.api_hooks import register_hook, unregister_hook
+from utils.fake_graph_api import FakeGraphAPI, FakeGraphData
+from utils.instrumentation import ApiMetrics, EndpointStats, endpoint_name
+from utils.throttle import disable_throttling
+
+@pytest.fixture
+def metrics():
+    disable_throttling()
+    previous_api = FacebookAdsApi.get_default_api()
+    metrics = register_hook(ApiMetrics('run1'))
+    with FakeGraphAPI(FakeGraphData.seeded(seed=2, ad_accounts=1, ad_sets=8), latency={'insights': 0.02}) as server:
+        FacebookAdsApi.init("1", "secret", "token")
+        metrics.server = server
+        yield metrics
+    unregister_hook(metrics)
+    FacebookAdsApi.set_default_api(previous_api)
+
+def test_endpoint_name():
+    call = MagicMock(method='GET', path_segments=['act_123', 'insights'])
+    assert endpoint_name(call) == 'GET act_{id}/insights'
+    call = MagicMock(method='POST', path_segments=[])
+    assert endpoint_name(call) == 'POST batch'
+    call = MagicMock(method='GET', path_segments=['123456', 'da_checks'])
+    assert endpoint_name(call) == 'GET {id}/da_checks'
+
+def test_histogram_quantiles():
+    stats = EndpointStats()
+    for seconds in [0.004] * 90 + [0.2] * 10:
+        stats.add(200, 10, 100, seconds)
+    assert stats.quantile(0.5) == 0.005
+    assert stats.quantile(0.95) == 0.2
+    assert stats.buckets[0] == 90
+    assert stats.errors == 0
+
+def test_metrics_by_caller_and_endpoint(metrics):
+    business = Business(metrics.server.data.business_ids[0])
+    pixels = list(business.get_ads_pixels())
+    get_spend_for_pixels(pixels, business['id'], '2024-05-01', '2024-05-02', 'run1', account_level=False)
+
+    data = metrics.server.data
+    (ad_account,) = data.children(business['id'], 'owned_ad_accounts')
+    promoting = sum(1 for ad_set in data.children(ad_account['id'], 'adsets') if ad_set['promoted_object'])
+    stats = {(caller, endpoint): value for (run_id, caller, endpoint), value in metrics.snapshot()}
+    adset_insights = stats[('helpers.get_spend_for_pixels', 'GET {id}/insights')]
+    assert adset_insights.count == promoting > 0
+    assert adset_insights.seconds >= promoting * 0.02
+    assert adset_insights.bytes_received > 0
+    assert stats[('test_instrumentation.test_metrics_by_caller_and_endpoint', 'GET {id}/adspixels')].count == 1
+
+    table = metrics.summary_table()
+    assert table.splitlines()[2].startswith('helpers.get_spend_for_pixels')
+
+    exported = {(row['caller'], row['endpoint']): row for row in metrics.to_json()}
+    assert exported[('helpers.get_spend_for_pixels', 'GET {id}/insights')]['statuses'] == {'200': promoting}
+
+    prometheus = metrics.to_prometheus()
+    assert ('graph_api_requests_total{run_id="run1",caller="helpers.get_spend_for_pixels",'
+            f'endpoint="GET {{id}}/insights",status="200"}} {promoting}') in prometheus
+    assert ('graph_api_request_duration_seconds_count{run_id="run1",caller="helpers.get_spend_for_pixels",'
+            f'endpoint="GET {{id}}/insights"}} {promoting}') in prometheus
+    assert f'le="+Inf"}} {promoting}' in prometheus
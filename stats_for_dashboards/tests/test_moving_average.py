@@ -0,0 +1,49 @@
+import random
+import pytest
+from stats_for_dashboards.helpers import calculate_moving_average
+from stats_for_dashboards.moving_average import (
+    StreamingExponentialMovingAverage,
+    StreamingMovingAverage,
+    exponential_moving_average,
+    moving_average,
+    weighted_moving_average,
+)
+
+def reference_moving_average(data, window_size):
+    # Previous O(n·w) implementation of calculate_moving_average
+    result = []
+    for i in range(len(data)):
+        if i < window_size:
+            result.append(sum(data[:i + 1]) / (i + 1))
+        else:
+            result.append(sum(data[i - window_size + 1 : i + 1]) / window_size)
+    return result
+
+@pytest.mark.parametrize("window_size", [1, 3, 7, 50])
+def test_moving_average_matches_reference(window_size):
+    data = [random.uniform(0, 100) for _ in range(200)]
+    expected = reference_moving_average(data, window_size)
+
+    assert calculate_moving_average(data, window_size) == pytest.approx(expected)
+    assert moving_average(data, window_size).tolist() == pytest.approx(expected)
+
+    stream = StreamingMovingAverage(window_size)
+    assert [stream.update(value) for value in data] == pytest.approx(expected)
+
+def test_moving_average_empty():
+    assert calculate_moving_average([], 3) == []
+
+def test_weighted_moving_average():
+    data = [1, 2, 3, 4]
+    # Warm-up uses weights 1..i+1, then 1..3 with the newest point weighted 3
+    assert weighted_moving_average(data, 3).tolist() == pytest.approx([
+        1, (1 + 2 * 2) / 3, (1 + 2 * 2 + 3 * 3) / 6, (2 + 3 * 2 + 4 * 3) / 6
+    ])
+
+def test_exponential_moving_average():
+    data = [10, 20, 30]
+    expected = [10, 15, 22.5]
+    assert exponential_moving_average(data, alpha=0.5).tolist() == pytest.approx(expected)
+
+    stream = StreamingExponentialMovingAverage(span=3)
+    assert [stream.update(value) for value in data] == pytest.approx(expected)
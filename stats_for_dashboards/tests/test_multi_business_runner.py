@@ -0,0 +1,65 @@
+import multiprocessing
+import os
+import pytest
+from unittest.mock import patch
+from facebook_business.adobjects.business import Business
+from stats_for_dashboards import multi_business_runner
+from utils.fake_graph_api import FakeGraphAPI, FakeGraphData
+from utils.throttle import get_active_throttle
+
+def collect_rows(business_id, run_id, refresh=False):
+    if business_id == 'bad':
+        raise RuntimeError('no access')
+    return [{'catalog_id': f'{business_id}-1', 'product_count': 1}]
+
+def collect_business_name(business_id, run_id, refresh=False):
+    # Runs in a worker, through the session and throttle that init_worker set up
+    business = Business(business_id).api_get(fields=['name'])
+    return [{'name': business['name'], 'pid': os.getpid(), 'throttled': get_active_throttle() is not None}]
+
+def test_run_businesses_merges_shards_in_order():
+    with patch.dict(multi_business_runner.DASHBOARDS,
+                    {'catalog_health': (collect_rows, multi_business_runner.CATALOG_HEALTH_SCHEMA)}):
+        rows, timings = multi_business_runner.run_businesses(
+            'catalog_health', ['1', 'bad', '2'], 'run', processes=1, refresh=True
+        )
+
+    assert [row['business_id'] for row in rows] == ['1', '2']
+    assert rows[0]['catalog_id'] == '1-1'
+    # A failing business is reported without stopping the others
+    assert timings['bad'][1] == 'RuntimeError: no access'
+    assert timings['1'][1] is None
+
+def test_main_writes_merged_dataset(tmp_path, monkeypatch):
+    pq = pytest.importorskip("pyarrow.parquet")
+    monkeypatch.chdir(tmp_path)
+    with patch('stats_for_dashboards.multi_business_runner.FacebookAdsApi.init'), \
+         patch('stats_for_dashboards.multi_business_runner.discover_business_ids', return_value=['1', '2']), \
+         patch('stats_for_dashboards.multi_business_runner.print_and_log'), \
+         patch.dict(multi_business_runner.DASHBOARDS,
+                    {'catalog_health': (collect_rows, multi_business_runner.CATALOG_HEALTH_SCHEMA)}):
+        path = multi_business_runner.main('catalog_health', processes=1)
+
+    table = pq.read_table(tmp_path / path)
+    assert table.column('business_id').to_pylist() == ['1', '2']
+    assert table.column('catalog_id').to_pylist() == ['1-1', '2-1']
+
+@pytest.mark.skipif(multiprocessing.get_start_method() != 'fork',
+                    reason="workers only see the patched DASHBOARDS when forked")
+def test_run_businesses_across_worker_processes(monkeypatch):
+    with FakeGraphAPI(FakeGraphData.seeded(businesses=3, ad_accounts=1, catalogs=1)) as server:
+        monkeypatch.setenv('META_GRAPH_URL', server.url)
+        business_ids = server.data.business_ids + ['404']
+        with patch.dict(multi_business_runner.DASHBOARDS,
+                        {'catalog_health': (collect_business_name, multi_business_runner.CATALOG_HEALTH_SCHEMA)}), \
+             patch('stats_for_dashboards.multi_business_runner.print_and_log'):
+            rows, timings = multi_business_runner.run_businesses('catalog_health', business_ids, 'run', processes=2)
+
+        assert server.request_counts['business'] == 3
+
+    assert [row['name'] for row in rows] == [server.data.nodes[business_id]['name'] for business_id in business_ids[:3]]
+    assert [row['business_id'] for row in rows] == business_ids[:3]
+    assert all(row['pid'] != os.getpid() and row['throttled'] for row in rows)
+    # The unknown business fails in its worker and comes back as an error
+    assert timings['404'][1].startswith('FacebookRequestError')
+    assert all(timings[business_id][1] is None for business_id in business_ids[:3])
@@ -0,0 +1,76 @@
+import gc
+import threading
+import time
+
+import pytest
+from utils.prefetch import PrefetchingCursor
+
+class FakeCursor:
+    """Mimics facebook_business Cursor paging: _queue holds the current page."""
+
+    def __init__(self, pages, fail_at=None, delay=0):
+        self._pages = [list(page) for page in pages]
+        self._queue = self._pages.pop(0)
+        self._finished_iteration = not self._pages
+        self.fail_at = fail_at
+        self.delay = delay
+        self.loaded = 1
+
+    def load_next_page(self):
+        time.sleep(self.delay)
+        if self.loaded == self.fail_at:
+            raise RuntimeError("page failed")
+        if not self._pages:
+            self._finished_iteration = True
+            return False
+        self._queue = self._pages.pop(0)
+        self.loaded += 1
+        return True
+
+def pages(count, size=3):
+    return [[page * size + i for i in range(size)] for page in range(count)]
+
+def prefetch_threads():
+    return [thread for thread in threading.enumerate() if thread.name == "cursor-prefetch"]
+
+def wait_for_no_prefetch_threads(timeout=2):
+    deadline = time.monotonic() + timeout
+    while prefetch_threads() and time.monotonic() < deadline:
+        time.sleep(0.02)
+    return prefetch_threads()
+
+def test_objects_keep_cursor_order():
+    assert list(PrefetchingCursor(FakeCursor(pages(10)), read_ahead=2)) == list(range(30))
+    assert list(PrefetchingCursor(FakeCursor(pages(1)))) == [0, 1, 2]
+    assert list(PrefetchingCursor([1, 2])) == [1, 2]
+    assert not wait_for_no_prefetch_threads()
+
+def test_abandoned_cursor_stops_its_thread():
+    for _ in range(5):
+        cursor = PrefetchingCursor(FakeCursor(pages(100)), read_ahead=1)
+        for value in cursor:
+            if value == 4:
+                break
+        del cursor
+    gc.collect()
+    assert not wait_for_no_prefetch_threads()
+
+def test_with_block_closes_on_early_return():
+    def first_over(limit):
+        with PrefetchingCursor(FakeCursor(pages(100)), read_ahead=1) as cursor:
+            for value in cursor:
+                if value > limit:
+                    return value
+
+    assert first_over(5) == 6
+    assert not wait_for_no_prefetch_threads()
+
+def test_loader_error_reaches_the_consumer():
+    cursor = PrefetchingCursor(FakeCursor(pages(5), fail_at=3))
+    seen = []
+    with pytest.raises(RuntimeError, match="page failed"):
+        for value in cursor:
+            seen.append(value)
+    # Pages loaded before the failure are still delivered, in order
+    assert seen == list(range(9))
+    assert not wait_for_no_prefetch_threads()
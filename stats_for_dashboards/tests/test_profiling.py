@@ -0,0 +1,75 @@
+import argparse
+import os
+import pstats
+from unittest.mock import patch
+
+import pytest
+from facebook_business.adobjects.business import Business
+from facebook_business.api import FacebookAdsApi
+from utils.fake_graph_api import FakeGraphAPI, FakeGraphData
+from utils.profiling import CPU, NETWORK, WAITING, add_profile_arguments, classify_stack, profiled
+from utils.throttle import disable_throttling
+
+@pytest.fixture
+def server():
+    disable_throttling()
+    previous_api = FacebookAdsApi.get_default_api()
+    with FakeGraphAPI(FakeGraphData.seeded(), latency={'default': 0.05}) as server:
+        FacebookAdsApi.init("1", "secret", "token")
+        yield server
+    FacebookAdsApi.set_default_api(previous_api)
+
+def fetch_catalogs(server):
+    for _ in range(4):
+        list(Business(server.data.business_ids[0]).get_owned_product_catalogs())
+
+def test_add_profile_arguments():
+    parser = add_profile_arguments(argparse.ArgumentParser())
+    args = parser.parse_args(['--profile', 'wall', '--profile-dir', 'out'])
+    assert (args.profile, args.profile_dir) == ('wall', 'out')
+    assert parser.parse_args([]).profile is None
+
+def test_classify_stack():
+    assert classify_stack([('socket.py', 'readinto'), ('client.py', 'begin')]) == NETWORK
+    assert classify_stack([('threading.py', 'wait'), ('executor.py', 'fan_out')]) == WAITING
+    assert classify_stack([('throttle.py', 'acquire')]) == WAITING
+    assert classify_stack([('helpers.py', 'get_spend_for_pixels')]) == CPU
+
+@patch('utils.profiling.print_and_log')
+def test_unprofiled_run_writes_nothing(mock_log, tmp_path):
+    with profiled(None, output_dir=str(tmp_path)) as profile:
+        pass
+    assert profile.run_id and not profile.paths
+    assert os.listdir(tmp_path) == []
+    mock_log.assert_not_called()
+
+@patch('utils.profiling.print_and_log')
+def test_wall_profile_separates_network_wait(mock_log, tmp_path, server):
+    with profiled('wall', 'run1', str(tmp_path), sample_interval=0.002) as profile:
+        fetch_catalogs(server)
+    assert profile.paths == [str(tmp_path / 'run1.wall.collapsed')]
+    collapsed = (tmp_path / 'run1.wall.collapsed').read_text()
+    assert '[network]' in collapsed
+    assert 'test_profiling:fetch_catalogs' in collapsed
+    summary = mock_log.call_args[0][1]
+    assert mock_log.call_args[0][0] == 'run1'
+    network_line = next(line for line in summary.splitlines() if 'waiting on the network' in line)
+    assert float(network_line.split()[-3]) > 0
+
+@patch('utils.profiling.print_and_log')
+def test_cpu_profile_writes_pstats_and_cpu_stacks(mock_log, tmp_path, server):
+    with profiled('cpu', 'run2', str(tmp_path), sample_interval=0.002):
+        fetch_catalogs(server)
+        sum(i * i for i in range(200000))
+    stats = pstats.Stats(str(tmp_path / 'run2.cpu.pstats'))
+    assert any(name == 'fetch_catalogs' for _, _, name in stats.stats)
+    assert '[network]' not in (tmp_path / 'run2.cpu.collapsed').read_text()
+    assert 'fetch_catalogs' in mock_log.call_args[0][1]
+
+@patch('utils.profiling.print_and_log')
+def test_memory_profile(mock_log, tmp_path):
+    with profiled('memory', 'run3', str(tmp_path)):
+        blocks = [bytearray(1024) for _ in range(1000)]
+    assert len(blocks) == 1000
+    assert 'peak' in (tmp_path / 'run3.memory.txt').read_text()
+    assert 'test_profiling.py' in (tmp_path / 'run3.memory.collapsed').read_text()
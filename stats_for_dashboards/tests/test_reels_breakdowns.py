@@ -0,0 +1,104 @@
+import random
+from collections import defaultdict
+
+import pytest
+from stats_for_dashboards.reels_breakdowns import (
+    CategoricalColumn,
+    aggregate_reels_breakdowns,
+    concat_columns,
+    format_reels_summary,
+    insights_columns,
+    top_rows,
+)
+
+PLACEMENTS = [
+    ('facebook', 'feed'),
+    ('facebook', 'facebook_reels'),
+    ('instagram', 'feed'),
+    ('instagram', 'reels'),
+    ('audience_network', 'classic'),
+]
+
+def random_rows(count, ads=20):
+    rows = []
+    for _ in range(count):
+        platform, position = random.choice(PLACEMENTS)
+        rows.append({
+            'ad_id': str(random.randrange(ads)),
+            'publisher_platform': platform,
+            'platform_position': position,
+            'impressions': str(random.randrange(10000)),
+        })
+    return rows
+
+def reference_aggregates(rows_by_account):
+    # Row-by-row dict aggregation the columnar version replaces
+    by_placement, by_account, by_ad = defaultdict(int), defaultdict(lambda: [0, 0]), defaultdict(lambda: [0, 0])
+    for account_id, rows in rows_by_account.items():
+        for row in rows:
+            impressions = int(row['impressions'])
+            reels = impressions if 'reels' in row['platform_position'] else 0
+            by_placement[(row['publisher_platform'], row['platform_position'])] += impressions
+            for totals in (by_account[account_id], by_ad[row['ad_id']]):
+                totals[0] += impressions
+                totals[1] += reels
+    return by_placement, by_account, by_ad
+
+def as_dict(table, *keys):
+    return {
+        tuple(table[key][i].item() for key in keys) if len(keys) > 1 else table[keys[0]][i].item():
+            [table['impressions'][i].item(), table['reels_impressions'][i].item()] if 'reels_impressions' in table
+            else table['impressions'][i].item()
+        for i in range(len(table['impressions']))
+    }
+
+def test_aggregates_match_row_by_row_reference():
+    rows_by_account = {f'act_{i}': random_rows(random.randrange(1, 300)) for i in range(5)}
+    columns = concat_columns(insights_columns(rows, account_id) for account_id, rows in rows_by_account.items())
+    aggregates = aggregate_reels_breakdowns(columns)
+
+    by_placement, by_account, by_ad = reference_aggregates(rows_by_account)
+    assert as_dict(aggregates['by_placement'], 'publisher_platform', 'platform_position') == by_placement
+    assert as_dict(aggregates['by_account'], 'account_id') == dict(by_account)
+    assert as_dict(aggregates['by_ad'], 'ad_id') == dict(by_ad)
+
+    total = sum(by_placement.values())
+    reels = sum(reels for _, reels in by_account.values())
+    assert (aggregates['impressions'], aggregates['reels_impressions']) == (total, reels)
+    assert aggregates['reels_share'] == pytest.approx(reels / total)
+    assert aggregates['by_placement']['share'].sum() == pytest.approx(1)
+
+def test_account_id_comes_from_the_account_read():
+    rows = [{'account_id': '123', 'ad_id': '1', 'platform_position': 'reels', 'impressions': '5'}]
+    columns = insights_columns(rows, 'act_123')
+    assert columns['account_id'].values().tolist() == ['act_123']
+    assert insights_columns(rows)['account_id'].values().tolist() == ['123']
+
+def test_concat_remaps_categories():
+    first = CategoricalColumn.from_values(['b', 'a', 'b'])
+    second = CategoricalColumn.from_values(['c', 'a'])
+    columns = concat_columns([
+        {'account_id': first, 'ad_id': first, 'publisher_platform': first, 'platform_position': first,
+         'impressions': insights_columns([{}] * 3)['impressions']},
+        {'account_id': second, 'ad_id': second, 'publisher_platform': second, 'platform_position': second,
+         'impressions': insights_columns([{}] * 2)['impressions']},
+    ])
+    assert columns['ad_id'].values().tolist() == ['b', 'a', 'b', 'c', 'a']
+    assert columns['ad_id'].categories.tolist() == ['a', 'b', 'c']
+
+def test_empty_portfolio():
+    aggregates = aggregate_reels_breakdowns(concat_columns([]))
+    assert aggregates['impressions'] == aggregates['reels_share'] == 0
+    assert len(aggregates['by_ad']['ad_id']) == 0
+    assert 'Reels impressions: 0 of 0' in format_reels_summary(aggregates)
+
+def test_summary_lists_the_largest_groups_first():
+    rows = [
+        {'ad_id': '1', 'publisher_platform': 'instagram', 'platform_position': 'reels', 'impressions': '30'},
+        {'ad_id': '2', 'publisher_platform': 'facebook', 'platform_position': 'feed', 'impressions': '70'},
+    ]
+    aggregates = aggregate_reels_breakdowns(concat_columns([insights_columns(rows, 'act_1')]))
+    assert [row['ad_id'] for row in top_rows(aggregates['by_ad'], 10)] == ['2', '1']
+    summary = format_reels_summary(aggregates)
+    assert 'Reels impressions: 30 of 100 (30.0%)' in summary
+    assert '\t1: 30 impressions, 30 on reels (100.0%)' in summary
@@ -1,49 +1,188 @@
 import pytest
 from unittest.mock import patch, ANY
+from facebook_business.adobjects.adaccount import AdAccount
+from facebook_business.api import FacebookAdsApi
 from stats_for_dashboards import reels_performant_creative_dashboard
+from utils.fake_graph_api import FakeGraphAPI, FakeGraphData
+from utils.throttle import disable_throttling
 
 @pytest.fixture
 def mock_dependencies():
     with patch('stats_for_dashboards.reels_performant_creative_dashboard.FacebookAdsApi.init') as mock_facebook_api_init, \
          patch('stats_for_dashboards.reels_performant_creative_dashboard.get_ad_accounts_for_business_id') as mock_get_ad_accounts, \
          patch('stats_for_dashboards.reels_performant_creative_dashboard.AdAccount.get_insights') as mock_get_insights, \
-         patch('stats_for_dashboards.reels_performant_creative_dashboard.AdCreative.remote_create') as mock_creative_create, \
-         patch('stats_for_dashboards.reels_performant_creative_dashboard.Ad.remote_create') as mock_ad_create, \
+         patch('stats_for_dashboards.reels_performant_creative_dashboard.get_accounts_with_reels_ad') as mock_existing, \
+         patch('stats_for_dashboards.reels_performant_creative_dashboard.get_reels_creative_ids', return_value={}), \
+         patch('stats_for_dashboards.reels_performant_creative_dashboard.create_reels_ads') as mock_create, \
          patch('stats_for_dashboards.reels_performant_creative_dashboard.print_and_log') as mock_print_and_log:
 
         # Mock the return values
-        mock_get_ad_accounts.return_value = [{'id': '123'}, {'id': '456'}]
+        mock_get_ad_accounts.return_value = [AdAccount('act_123'), AdAccount('act_456')]
         mock_get_insights.return_value = [{'impressions': 1000, 'ad_id': 'ad_123'}]
+        mock_existing.return_value = set()
 
-        yield mock_facebook_api_init, mock_get_ad_accounts, mock_get_insights, mock_creative_create, mock_ad_create, mock_print_and_log
+        yield mock_facebook_api_init, mock_get_ad_accounts, mock_get_insights, mock_existing, mock_create, mock_print_and_log
 
 def test_main(mock_dependencies):
-    mock_facebook_api_init, mock_get_ad_accounts, mock_get_insights, mock_creative_create, mock_ad_create, mock_print_and_log = mock_dependencies
+    mock_facebook_api_init, mock_get_ad_accounts, mock_get_insights, mock_existing, mock_create, mock_print_and_log = mock_dependencies
 
     # Run the main function
     reels_performant_creative_dashboard.main()
 
     # Check if the Facebook API was initialized
     mock_facebook_api_init.assert_called_once_with(
-        reels_performant_creative_dashboard.app_id,
-        reels_performant_creative_dashboard.app_secret,
-        reels_performant_creative_dashboard.access_token
+        reels_performant_creative_dashboard.constants.APP_ID,
+        reels_performant_creative_dashboard.constants.APP_SECRET,
+        reels_performant_creative_dashboard.test_creds.LL_ACCESS_TOKEN
     )
 
     # Check if ad accounts were retrieved
     mock_get_ad_accounts.assert_called_once_with(
-        reels_performant_creative_dashboard.business_id,
-        ANY  # RUN_ID is dynamically generated
+        reels_performant_creative_dashboard.constants.BUSINESS_ID,
+        ANY,  # RUN_ID is dynamically generated
+        refresh=False
     )
 
     # Check if insights were retrieved for each ad account
     assert mock_get_insights.call_count == len(mock_get_ad_accounts.return_value)
 
-    # Check if creatives were created
-    assert mock_creative_create.call_count == len(mock_get_ad_accounts.return_value)
-
-    # Check if ads were created
-    assert mock_ad_create.call_count == len(mock_get_ad_accounts.return_value)
+    # Every account is checked for an existing reels ad, then gets one created, without a double act_ prefix
+    mock_existing.assert_called_once_with(['act_123', 'act_456'], ANY)
+    mock_create.assert_called_once_with(['act_123', 'act_456'], ANY, creative_ids={})
 
     # Check if print_and_log was called
     assert mock_print_and_log.called
+
+def test_main_skips_accounts_with_reels_ad(mock_dependencies):
+    _, _, _, mock_existing, mock_create, _ = mock_dependencies
+    mock_existing.return_value = {'act_123'}
+
+    reels_performant_creative_dashboard.main()
+
+    mock_create.assert_called_once_with(['act_456'], ANY, creative_ids={})
+
+def test_main_async_reports(mock_dependencies):
+    _, mock_get_ad_accounts, mock_get_insights, _, mock_create, _ = mock_dependencies
+
+    with patch('stats_for_dashboards.reels_performant_creative_dashboard.wait_for_report_runs') as mock_wait, \
+         patch('stats_for_dashboards.reels_performant_creative_dashboard.stream_report_results') as mock_stream:
+        mock_wait.side_effect = lambda report_runs: iter(
+            (key, {'async_status': 'Job Completed'}) for key, _ in report_runs
+        )
+        mock_stream.return_value = [{'impressions': 1000, 'ad_id': 'ad_123'}]
+
+        reels_performant_creative_dashboard.main(async_reports=True)
+
+    # One async report run is submitted per ad account
+    assert mock_get_insights.call_count == len(mock_get_ad_accounts.return_value)
+    assert all(call.kwargs['is_async'] for call in mock_get_insights.call_args_list)
+    assert mock_stream.call_count == len(mock_get_ad_accounts.return_value)
+
+    # Creatives and ads are still created for every account
+    mock_create.assert_called_once_with(['act_123', 'act_456'], ANY, creative_ids={})
+
+def test_failed_async_report_read_skips_only_that_account(mock_dependencies):
+    from facebook_business.exceptions import FacebookRequestError
+    _, _, _, _, mock_create, _ = mock_dependencies
+
+    def stream(report_run):
+        if report_run['account'] == 'act_123':
+            raise FacebookRequestError('error', {}, 500, {}, '{}')
+        return [{'impressions': 1000, 'ad_id': 'ad_456'}]
+
+    with patch('stats_for_dashboards.reels_performant_creative_dashboard.wait_for_report_runs') as mock_wait, \
+         patch('stats_for_dashboards.reels_performant_creative_dashboard.stream_report_results', side_effect=stream):
+        mock_wait.side_effect = lambda report_runs: iter(
+            (key, {'async_status': 'Job Completed', 'account': key}) for key, _ in report_runs
+        )
+        reels_performant_creative_dashboard.main(async_reports=True)
+
+    mock_create.assert_called_once_with(['act_456'], ANY, creative_ids={})
+
+@pytest.fixture
+def server():
+    disable_throttling()
+    previous_api = FacebookAdsApi.get_default_api()
+    data = FakeGraphData.seeded(businesses=1, ad_accounts=30)
+    with FakeGraphAPI(data) as server:
+        FacebookAdsApi.init("1", "secret", "token")
+        yield server
+    FacebookAdsApi.set_default_api(previous_api)
+
+def named(data, name):
+    return [node for node in data.nodes.values() if node.get('name') == name]
+
+def reels_ads(data):
+    return named(data, reels_performant_creative_dashboard.REELS_AD_NAME)
+
+def owned_account_ids(server):
+    return [account['id'] for account in server.data.children(server.data.business_ids[0], 'owned_ad_accounts')]
+
+@patch('stats_for_dashboards.reels_performant_creative_dashboard.print_and_log')
+def test_reels_ads_are_batched_and_idempotent(mock_log, server):
+    account_ids = [account['id'] for account in server.data.children(server.data.business_ids[0], 'owned_ad_accounts')]
+    created = reels_performant_creative_dashboard.create_reels_ads(account_ids, 'run1', max_workers=1)
+
+    # A creative and an ad per account, ACCOUNTS_PER_BATCH accounts per batch request
+    assert server.request_counts['batch'] == 2
+    assert all(created.values()) and len(created) == len(account_ids)
+    ads = reels_ads(server.data)
+    assert len(ads) == len(account_ids)
+    creative_ids = {ad['creative']['creative_id'] for ad in ads}
+    assert all(server.data.nodes[creative_id]['_type'] == 'creative' for creative_id in creative_ids)
+
+    # A rerun finds the existing ads and creates nothing
+    existing = reels_performant_creative_dashboard.get_accounts_with_reels_ad(account_ids, 'run1')
+    assert existing == set(account_ids)
+    insights = {account_id: [] for account_id in account_ids}
+    assert reels_performant_creative_dashboard.choose_reels_targets(insights, existing) == []
+
+@patch('stats_for_dashboards.reels_performant_creative_dashboard.print_and_log')
+def test_failed_creative_skips_its_ad(mock_log, server):
+    account_ids = [account['id'] for account in server.data.children(server.data.business_ids[0], 'owned_ad_accounts')][:2]
+    server.fail_next('adcreatives', count=1)
+
+    created = reels_performant_creative_dashboard.create_reels_ads(account_ids, 'run1')
+
+    assert created[account_ids[0]] is None and created[account_ids[1]]
+    assert len(reels_ads(server.data)) == 1
+
+@patch('stats_for_dashboards.reels_performant_creative_dashboard.print_and_log')
+def test_failed_batch_request_only_fails_its_group(mock_log, server):
+    account_ids = owned_account_ids(server)
+    server.fail_next('batch', count=1)
+
+    created = reels_performant_creative_dashboard.create_reels_ads(account_ids, 'run1', max_workers=1)
+
+    group_size = reels_performant_creative_dashboard.ACCOUNTS_PER_BATCH
+    assert [created[account_id] for account_id in account_ids[:group_size]] == [None] * group_size
+    assert all(created[account_id] for account_id in account_ids[group_size:])
+    assert len(reels_ads(server.data)) == len(account_ids) - group_size
+
+@patch('stats_for_dashboards.reels_performant_creative_dashboard.print_and_log')
+def test_failed_lookup_batch_skips_the_accounts(mock_log, server):
+    account_ids = owned_account_ids(server)[:3]
+    server.fail_next('batch', count=1)
+    assert reels_performant_creative_dashboard.get_accounts_with_reels_ad(account_ids, 'run1') == set(account_ids)
+
+@patch('stats_for_dashboards.reels_performant_creative_dashboard.print_and_log')
+def test_rerun_reuses_the_creative_of_a_failed_ad(mock_log, server):
+    dashboard = reels_performant_creative_dashboard
+    account_ids = owned_account_ids(server)[:2]
+    server.fail_next('ads', count=1)
+    created = dashboard.create_reels_ads(account_ids, 'run1')
+    assert created[account_ids[0]] is None and created[account_ids[1]]
+
+    targets = dashboard.choose_reels_targets(
+        {account_id: None for account_id in account_ids}, dashboard.get_accounts_with_reels_ad(account_ids, 'run1')
+    )
+    assert targets == account_ids[:1]
+    creative_ids = dashboard.get_reels_creative_ids(targets, 'run1')
+    assert list(creative_ids) == targets
+    assert dashboard.create_reels_ads(targets, 'run1', creative_ids=creative_ids)[targets[0]]
+
+    # One creative per account, and the new ad uses the one left by the failed ad
+    assert len(named(server.data, dashboard.REELS_CREATIVE_NAME)) == 2
+    ads = {ad['account_id']: ad for ad in reels_ads(server.data)}
+    assert len(ads) == 2
+    assert creative_ids[targets[0]] in {ad['creative']['creative_id'] for ad in ads.values()}
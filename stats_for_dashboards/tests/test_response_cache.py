@@ -0,0 +1,49 @@
+import pytest
+from unittest.mock import patch
+from facebook_business.adobjects.adaccount import AdAccount
+from stats_for_dashboards.response_cache import ResponseCache, cached_listing
+
+@pytest.fixture
+def cache(tmp_path):
+    yield ResponseCache(path=str(tmp_path / "cache.sqlite"))
+
+def test_get_returns_fresh_entries_only(cache):
+    cache.set("123/owned_ad_accounts", None, "scope", [{"id": "act_1"}])
+    assert cache.get("123/owned_ad_accounts", None, "scope") == [{"id": "act_1"}]
+
+    # A different token scope never reads the entry
+    assert cache.get("123/owned_ad_accounts", None, "other") is None
+
+    # Entries older than the endpoint TTL are dropped
+    with patch("stats_for_dashboards.response_cache.time.time", return_value=10 ** 12):
+        assert cache.get("123/owned_ad_accounts", None, "scope") is None
+
+def test_least_recently_used_entries_are_evicted(cache):
+    cache.max_bytes = 60
+    cache.set("a", None, "scope", ["x" * 20])
+    cache.set("b", None, "scope", ["y" * 20])
+    cache.get("a", None, "scope")
+    cache.set("c", None, "scope", ["z" * 20])
+
+    assert cache.get("b", None, "scope") is None
+    assert cache.get("a", None, "scope") is not None
+    assert cache.get("c", None, "scope") is not None
+
+def test_cached_listing_only_fetches_when_cold_or_refreshed(cache):
+    fetch_count = []
+
+    def fetch():
+        fetch_count.append(1)
+        account = AdAccount("act_1")
+        account["name"] = "Account"
+        return [account]
+
+    with patch("stats_for_dashboards.response_cache.get_token_scope", return_value="scope"):
+        first = cached_listing("123/owned_ad_accounts", fetch, AdAccount, cache=cache)
+        second = cached_listing("123/owned_ad_accounts", fetch, AdAccount, cache=cache)
+        cached_listing("123/owned_ad_accounts", fetch, AdAccount, refresh=True, cache=cache)
+
+    assert len(fetch_count) == 2
+    assert isinstance(second[0], AdAccount)
+    assert second[0]["id"] == first[0]["id"] == "act_1"
+    assert second[0]["name"] == "Account"
@@ -9,6 +9,7 @@ def mock_dependencies():
          patch('stats_for_dashboards.signals_health_dashboard.get_pixels_for_business_id') as mock_get_pixels, \
          patch('stats_for_dashboards.signals_health_dashboard.get_spend_for_pixels') as mock_get_spend, \
          patch('stats_for_dashboards.signals_health_dashboard.get_stats_and_settings_for_pixels') as mock_get_stats, \
+         patch('stats_for_dashboards.signals_health_dashboard.get_integration_quality_for_datasets') as mock_get_quality, \
          patch('stats_for_dashboards.signals_health_dashboard.print_and_log') as mock_print_and_log:
 
         # Mock the return values
@@ -18,11 +19,16 @@ def mock_dependencies():
             '789': {'stats': 'stat3', 'match_rate': 0.9, 'event_stats': 'event3', 'automatic_matching_fields': 'fields3', 'checks': 'check3'},
             '012': {'stats': 'stat4', 'match_rate': 0.8, 'event_stats': 'event4', 'automatic_matching_fields': 'fields4', 'checks': 'check4'}
         }
+        mock_get_quality.return_value = {
+            '789': [{'event_name': 'Purchase', 'event_match_quality': {'composite_score': 6.5}, 'event_coverage': 80}],
+            '012': [],
+        }
 
         yield mock_facebook_api_init, mock_get_pixels, mock_get_spend, mock_get_stats, mock_print_and_log
 
-def test_main(mock_dependencies):
+def test_main(mock_dependencies, tmp_path, monkeypatch):
     mock_facebook_api_init, mock_get_pixels, mock_get_spend, mock_get_stats, mock_print_and_log = mock_dependencies
+    monkeypatch.chdir(tmp_path)
     today = datetime.now().date().strftime('%Y-%m-%d')
 
     # Run the main function
@@ -30,26 +36,29 @@ def test_main(mock_dependencies):
 
     # Check if the Facebook API was initialized
     mock_facebook_api_init.assert_called_once_with(
-        signals_health_dashboard.app_id,
-        signals_health_dashboard.app_secret,
-        signals_health_dashboard.access_token
+        signals_health_dashboard.constants.APP_ID,
+        signals_health_dashboard.constants.APP_SECRET,
+        signals_health_dashboard.test_creds.LL_ACCESS_TOKEN
     )
 
     # Check if pixels were retrieved
     mock_get_pixels.assert_called_once_with(
-        signals_health_dashboard.business_id,
+        signals_health_dashboard.constants.BUSINESS_ID,
         ANY,  # RUN_ID is dynamically generated
-        True
+        True,
+        refresh=False
     )
 
     # Check if spend was retrieved
     mock_get_spend.assert_called_once_with(
         mock_get_pixels.return_value,
-        signals_health_dashboard.business_id,
+        signals_health_dashboard.constants.BUSINESS_ID,
         ANY,  # since date
         today,  # until date
         ANY,  # RUN_ID is dynamically generated
-        True
+        True,
+        spend_store=ANY,
+        adset_index=ANY
     )
 
     # Check if stats were retrieved
@@ -62,9 +71,31 @@ def test_main(mock_dependencies):
     # Check if print_and_log was called
     assert mock_print_and_log.called
 
-    # Check if the CSV file was written correctly
+    # The default CSV has the same flattened columns as every other format
     with open("signals_health_dashboard.csv", "r") as f:
+        assert f.read().splitlines() == [
+            "pixel_id,date,spend,match_rate,event_count,distinct_events,automatic_matching_fields,checks_passed,checks_failed,event_stats",
+            f"789,{today},100.0,0.9,0,0,fields3,0,0,event3",
+            f"012,{today},200.0,0.8,0,0,fields4,0,0,event4",
+        ]
+
+    # Integration quality is written as a compact per-event table
+    with open("signals_integration_quality.csv", "r") as f:
+        assert f.read().splitlines() == [
+            "dataset_id,event_name,event_match_quality,event_coverage",
+            "789,Purchase,6.5,80.0",
+        ]
+
+def test_main_legacy_csv(mock_dependencies, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    today = datetime.now().date().strftime('%Y-%m-%d')
+
+    signals_health_dashboard.main(output_format="csv-legacy")
+
+    with open(tmp_path / "signals_health_dashboard.csv", "r") as f:
         lines = f.readlines()
         assert lines[0] == "pixel_id,date,spend,stats,match_rate,event_stats,automatic_matching_fields,checks\n"
         assert f"789,{today},100,stat3,0.9,event3,fields3,check3\n" in lines
         assert f"012,{today},200,stat4,0.8,event4,fields4,check4\n" in lines
+    # Integration quality has no legacy layout and is written as a flattened CSV
+    assert (tmp_path / "signals_integration_quality.csv").exists()
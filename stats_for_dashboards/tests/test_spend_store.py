@@ -0,0 +1,33 @@
+import pytest
+from stats_for_dashboards.spend_store import SpendStore, contiguous_ranges, days_between
+
+@pytest.fixture
+def store(tmp_path):
+    yield SpendStore(path=str(tmp_path / "spend.sqlite"))
+
+def test_contiguous_ranges():
+    days = ['2024-01-05', '2024-01-01', '2024-01-02', '2024-01-03']
+    assert contiguous_ranges(days) == [('2024-01-01', '2024-01-03'), ('2024-01-05', '2024-01-05')]
+
+def test_only_missing_and_unsettled_days_are_fetched(store):
+    today = '2024-01-10'
+    window = days_between('2024-01-04', today)
+    assert store.days_to_fetch('act_1', '2024-01-04', today, today=today) == window
+
+    store.save_days('act_1', window, [('as_1', '2024-01-05', 3.5), ('as_1', today, 1.0)], today=today)
+
+    # The last 48 hours stay unsettled, everything older is served locally
+    assert store.days_to_fetch('act_1', '2024-01-04', today, today=today) == ['2024-01-09', '2024-01-10']
+
+    # Widening the window only adds the new days
+    assert store.days_to_fetch('act_1', '2024-01-01', today, today=today) == [
+        '2024-01-01', '2024-01-02', '2024-01-03', '2024-01-09', '2024-01-10'
+    ]
+
+    # Once synced after settling, a day is final
+    store.save_days('act_1', ['2024-01-09'], [('as_1', '2024-01-09', 2.0)], today='2024-01-11')
+    assert '2024-01-09' not in store.days_to_fetch('act_1', '2024-01-04', '2024-01-11', today='2024-01-11')
+
+    assert store.get_adset_spend('act_1', '2024-01-04', today) == [
+        ('as_1', '2024-01-05', 3.5), ('as_1', '2024-01-09', 2.0), ('as_1', '2024-01-10', 1.0)
+    ]
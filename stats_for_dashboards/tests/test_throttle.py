@@ -0,0 +1,157 @@
+import json
+import pytest
+from facebook_business.adobjects.adaccount import AdAccount
+from facebook_business.adobjects.business import Business
+from facebook_business.api import FacebookAdsApi
+from utils.fake_graph_api import FakeGraphAPI, FakeGraphData
+from utils.throttle import (
+    APP_KEY,
+    Throttle,
+    TokenBucket,
+    account_key,
+    disable_throttling,
+    enable_throttling,
+    get_active_throttle,
+    parse_usage_headers,
+)
+
+class FakeClock:
+    """A clock that only moves when something sleeps on it."""
+
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+def make_throttle(clock, **kwargs):
+    return Throttle(clock=clock, sleep=clock.sleep, **kwargs)
+
+def business_usage(account_id, call_count, regain_minutes=0):
+    return json.dumps({account_id: [{
+        'type': 'ads_management', 'call_count': call_count, 'total_cputime': 0, 'total_time': 0,
+        'estimated_time_to_regain_access': regain_minutes,
+    }]})
+
+def test_token_bucket_refills_at_its_rate():
+    bucket = TokenBucket(rate=2, capacity=2, now=0)
+    bucket.take()
+    bucket.take()
+    assert bucket.wait_time(0) == 0.5
+    assert bucket.wait_time(0.25) == 0.25
+    assert bucket.wait_time(10) == 0 and bucket.tokens == 2
+
+def test_acquire_blocks_when_the_bucket_is_empty(clock):
+    throttle = make_throttle(clock, rate=2, burst=2)
+    throttle.acquire('act_1')
+    throttle.acquire('act_1')
+    assert clock.sleeps == []
+
+    throttle.acquire('act_1')
+    assert clock.sleeps == [0.5]
+
+def test_usage_lowers_the_rate(clock):
+    throttle = make_throttle(clock, rate=20, burst=1, slowdown_usage=50, target_usage=90)
+    throttle.observe('act_1', {'x-ad-account-usage': '{"acc_id_util_pct": 70}'})
+    assert throttle.state()['1']['rate'] == 10
+
+    throttle.acquire('act_1')
+    throttle.acquire('act_1')
+    # The app bucket is still at the base rate, the account bucket waits 1/10s
+    assert clock.sleeps == [pytest.approx(0.1)]
+
+def test_acquire_waits_out_the_time_to_regain_access(clock):
+    throttle = make_throttle(clock)
+    throttle.observe('act_1', {'x-business-use-case-usage': business_usage('1', 100, regain_minutes=2)})
+    assert throttle.state()['1']['regain_in'] == 120
+
+    # Other accounts are not held back
+    throttle.acquire('act_2')
+    assert clock.sleeps == []
+
+    throttle.acquire('act_1')
+    assert clock.sleeps == [120]
+
+    # A response without a regain time lifts the block
+    throttle.observe('act_1', {'x-business-use-case-usage': business_usage('1', 10)})
+    assert throttle.state()['1']['regain_in'] == 0
+
+def test_ad_account_usage_reset_time_is_in_seconds(clock):
+    throttle = make_throttle(clock)
+    throttle.observe('act_1', {'x-ad-account-usage': '{"acc_id_util_pct": 100, "reset_time_duration": 30}'})
+    throttle.acquire('act_1')
+    assert clock.sleeps == [30]
+
+@pytest.mark.parametrize('headers', [
+    {},
+    {'x-app-usage': ''},
+    {'x-app-usage': 'not json'},
+    {'x-app-usage': '[1, 2]'},
+    {'x-business-use-case-usage': '{"1": ["not an entry"]}'},
+    {'x-business-use-case-usage': '"1"'},
+])
+def test_bad_or_missing_usage_headers_are_ignored(clock, headers):
+    assert parse_usage_headers(headers, 'act_1') == {}
+    throttle = make_throttle(clock)
+    throttle.observe('act_1', headers)
+    assert throttle.state() == {}
+
+def test_non_numeric_usage_counts_as_zero():
+    headers = {
+        'x-app-usage': '{"call_count": "n/a", "total_cputime": null, "total_time": 12}',
+        'x-ad-account-usage': '{"acc_id_util_pct": "?", "reset_time_duration": "soon"}',
+    }
+    assert parse_usage_headers(headers, 'act_1') == {APP_KEY: (12.0, 0.0), '1': (0.0, 0.0)}
+
+def test_ad_account_usage_is_keyed_on_the_account_it_belongs_to():
+    header = {'x-ad-account-usage': '{"acc_id_util_pct": 40}'}
+    # On an ad account the account comes from the path
+    assert parse_usage_headers(header, 'act_7') == {'7': (40.0, 0.0)}
+    # On an ad set it comes from the business use case header, not the ad set id
+    usage = parse_usage_headers({**header, 'x-business-use-case-usage': business_usage('7', 10)}, '6001')
+    assert usage == {'7': (40.0, 0.0)}
+    # Without a single owning account it is counted against the app
+    assert parse_usage_headers(header, None) == {APP_KEY: (40.0, 0.0)}
+    assert parse_usage_headers(header, '6001') == {APP_KEY: (40.0, 0.0)}
+
+@pytest.fixture
+def server():
+    disable_throttling()
+    previous_api = FacebookAdsApi.get_default_api()
+    with FakeGraphAPI(FakeGraphData.seeded(businesses=1, ad_accounts=1)) as server:
+        FacebookAdsApi.init('1', 'secret', 'token')
+        yield server
+    FacebookAdsApi.set_default_api(previous_api)
+    disable_throttling()
+
+def test_enabled_throttle_sees_every_sdk_request(server, clock):
+    throttle = enable_throttling(make_throttle(clock, rate=1, burst=1))
+    assert get_active_throttle() is throttle
+    assert enable_throttling() is throttle
+
+    server.rate_limit = 10
+    business_id = server.data.business_ids[0]
+    ad_account_id = server.data.children(business_id, 'owned_ad_accounts')[0]['id']
+    Business(business_id).api_get(fields=['name'])
+    AdAccount(ad_account_id).api_get(fields=['name'])
+
+    # The second request waited for the app bucket, and both responses were observed
+    assert clock.sleeps == [1]
+    state = throttle.state()
+    assert state[APP_KEY]['usage'] == 20
+    assert state[business_id]['usage'] == 10
+    assert state[account_key(ad_account_id)]['usage'] == 10
+
+    disable_throttling()
+    assert get_active_throttle() is None
+    Business(business_id).api_get(fields=['name'])
+    assert clock.sleeps == [1]
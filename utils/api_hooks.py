@@ -0,0 +1,152 @@
+"""
+Hooks around every Graph API request.
+
+Every request made through the facebook_business SDK, including cursors,
+api_get, edge creation and GraphBatch, ends up in FacebookAdsApi.call.
+install() wraps that single method so registered hooks see each request:
+
+    class LogHook:
+        def before_call(self, call):
+            print("->", call.method, call.node_id)
+
+        def after_call(self, call):
+            print("<-", call.status, f"{call.elapsed:.2f}s")
+
+    register_hook(LogHook())
+
+A hook may implement either method. If before_call returns a FacebookResponse,
+the request is not sent and that response is used instead; a failed response
+raises its error just like a real one. after_call runs for failed requests
+too, with call.error set, before the error is raised.
+"""
+
+import threading
+import time
+from urllib.parse import urlparse
+
+from facebook_business.api import FacebookAdsApi
+
+_hooks = []
+_hooks_lock = threading.Lock()
+_original_call = None
+
+
+class ApiCall:
+    """One Graph API request as seen by the hooks."""
+
+    def __init__(self, api, method, path, params=None, headers=None, files=None, url_override=None,
+                 api_version=None):
+        self.api = api
+        self.method = method
+        self.path = path
+        self.params = params
+        self.headers = headers
+        self.files = files
+        self.url_override = url_override
+        self.api_version = api_version or getattr(api, "_api_version", None)
+        self.started_at = time.monotonic()
+        self.elapsed = None
+        self.response = None
+        self.error = None
+
+    @property
+    def path_segments(self):
+        """Path below the API version, e.g. ['act_123', 'insights'], for tuple paths and full URLs alike."""
+        if isinstance(self.path, str):
+            segments = [segment for segment in urlparse(self.path).path.split("/") if segment]
+            if segments and segments[0].startswith("v") and segments[0][1:2].isdigit():
+                segments = segments[1:]
+            return segments
+        return [str(segment) for segment in self.path if str(segment)]
+
+    @property
+    def node_id(self):
+        """The node the request is made on, or None for requests on the Graph root such as batches."""
+        segments = self.path_segments
+        return segments[0] if segments else None
+
+    @property
+    def status(self):
+        if self.response is not None:
+            return self.response.status()
+        if self.error is not None:
+            return self.error.http_status()
+        return None
+
+    @property
+    def response_headers(self):
+        """Response headers with lower-case names, also for failed requests."""
+        if self.response is not None:
+            headers = self.response.headers()
+        elif self.error is not None and hasattr(self.error, "http_headers"):
+            headers = self.error.http_headers()
+        else:
+            headers = None
+        return {str(name).lower(): value for name, value in (headers or {}).items()}
+
+
+def register_hook(hook):
+    """Adds a hook, installing the FacebookAdsApi.call wrapper if needed, and returns it."""
+    install()
+    with _hooks_lock:
+        if hook not in _hooks:
+            _hooks.append(hook)
+    return hook
+
+
+def unregister_hook(hook):
+    with _hooks_lock:
+        if hook in _hooks:
+            _hooks.remove(hook)
+
+
+def get_hooks():
+    with _hooks_lock:
+        return list(_hooks)
+
+
+def install():
+    """Wraps FacebookAdsApi.call once; calling it again has no effect."""
+    global _original_call
+    with _hooks_lock:
+        if _original_call is None:
+            _original_call = FacebookAdsApi.call
+            FacebookAdsApi.call = _hooked_call
+
+
+def uninstall():
+    """Restores the original FacebookAdsApi.call and drops every hook."""
+    global _original_call
+    with _hooks_lock:
+        if _original_call is not None:
+            FacebookAdsApi.call = _original_call
+            _original_call = None
+        _hooks.clear()
+
+
+def _hooked_call(self, method, path, params=None, headers=None, files=None, url_override=None, api_version=None):
+    call = ApiCall(self, method, path, params, headers, files, url_override, api_version)
+    hooks = get_hooks()
+
+    response = None
+    for hook in hooks:
+        before_call = getattr(hook, "before_call", None)
+        if before_call is not None and response is None:
+            response = before_call(call)
+
+    try:
+        if response is None:
+            response = _original_call(self, method, path, params, headers, files, url_override, api_version)
+        elif response.is_failure():
+            raise response.error()  # As FacebookAdsApi.call does for a failed response
+        call.response = response
+    except Exception as e:
+        call.error = e
+        raise
+    finally:
+        call.elapsed = time.monotonic() - call.started_at
+        for hook in hooks:
+            after_call = getattr(hook, "after_call", None)
+            if after_call is not None:
+                after_call(call)
+    return response
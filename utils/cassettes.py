@@ -0,0 +1,266 @@
+"""
+Record and replay Graph API traffic as JSONL cassettes.
+
+A cassette holds one JSON object per line for every request a run made: the
+method, path and parameters, plus the status, headers, body and latency of the
+response. Recording and replaying are api_hooks hooks, so they cover every
+request made through the SDK, including cursors and GraphBatch:
+
+    with recording("scale_good_ads.jsonl"):
+        scale_good_ads.main(...)
+
+    with replaying("scale_good_ads.jsonl", latency_scale=0.5):
+        scale_good_ads.main(...)  # No network; each response waits half its recorded latency
+
+Any script can be recorded or replayed from the repository root:
+
+    python -m utils.cassettes record cassettes/reels.jsonl stats_for_dashboards/reels_performant_creative_dashboard.py
+    python -m utils.cassettes replay cassettes/reels.jsonl --latency-scale 0 stats_for_dashboards/reels_performant_creative_dashboard.py
+
+Credentials are never written: SECRET_PARAMS are dropped from the recorded
+parameters and masked wherever else they appear, such as the access_token in
+the paging.next URLs of cursor pages.
+
+Requests are matched on method, path and parameters. Repeated requests, such
+as polls of an async report, get their recorded responses in order, and the
+last one again once they run out. A request whose parameters differ, e.g. a
+date range computed from today, falls back to the next response recorded for
+the same method and path.
+"""
+
+import argparse
+import json
+import os
+import re
+import runpy
+import sys
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+
+from facebook_business.api import FacebookResponse
+
+from utils.api_hooks import register_hook, unregister_hook
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Parameters that carry credentials and are never written to a cassette
+SECRET_PARAMS = ("access_token", "appsecret_proof", "client_secret")
+SECRET_PLACEHOLDER = "REDACTED"
+
+_SECRET_QUERY_PATTERN = re.compile(r"\b(%s)=[^&\"'\s\\#]+" % "|".join(SECRET_PARAMS))
+_SECRET_FIELD_PATTERN = re.compile(r'"(%s)"(\s*:\s*)"[^"]*"' % "|".join(SECRET_PARAMS))
+
+
+class CassetteMissError(LookupError):
+    """Raised on replay for a request the cassette has no response for."""
+
+
+def _encode(value):
+    # Same encoding as the SDK uses on the wire, with sorted keys so equal values compare equal
+    return value if isinstance(value, str) else json.dumps(value, sort_keys=True, separators=(",", ":"))
+
+
+def scrub_secrets(text):
+    """Masks SECRET_PARAMS in the query strings and JSON fields found in text, e.g. a response body."""
+    if not isinstance(text, str):
+        return text
+    text = _SECRET_QUERY_PATTERN.sub(lambda match: f"{match.group(1)}={SECRET_PLACEHOLDER}", text)
+    return _SECRET_FIELD_PATTERN.sub(
+        lambda match: f'"{match.group(1)}"{match.group(2)}"{SECRET_PLACEHOLDER}"', text
+    )
+
+
+def request_key(call):
+    """Returns (method, path, params) identifying a request independently of credentials."""
+    params = {
+        str(key): _encode(value) for key, value in (call.params or {}).items() if key not in SECRET_PARAMS
+    }
+    return call.method.upper(), "/".join(call.path_segments), json.dumps(params, sort_keys=True)
+
+
+class CassetteRecorder:
+    """Hook appending every request and its response or error to a JSONL cassette."""
+
+    def __init__(self, path):
+        self.path = path
+        self.recorded = 0
+        self._lock = threading.Lock()
+        self._file = None
+
+    def open(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._file = open(self.path, "w")
+        return self
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def after_call(self, call):
+        if call.response is not None:
+            status, headers, body = call.response.status(), call.response.headers(), call.response.body()
+        elif hasattr(call.error, "http_status"):
+            status, headers, body = call.error.http_status(), call.error.http_headers(), call.error.body()
+        else:
+            return  # Network errors have no response to replay
+        method, path, params = request_key(call)
+        entry = {
+            "method": method,
+            "path": path,
+            "params": json.loads(params),
+            "status": status,
+            "headers": {name: scrub_secrets(value) for name, value in (headers or {}).items()},
+            "body": scrub_secrets(body if isinstance(body, str) or body is None else json.dumps(body)),
+            "elapsed": round(call.elapsed, 6),
+        }
+        with self._lock:
+            self._file.write(json.dumps(entry) + "\n")
+            self._file.flush()
+            self.recorded += 1
+
+
+def load_cassette(path):
+    """Returns the entries of a cassette in recorded order."""
+    with open(path) as file:
+        return [json.loads(line) for line in file if line.strip()]
+
+
+class CassetteReplayer:
+    """
+    Hook answering requests from a cassette instead of the network
+
+    Each response waits its recorded latency times latency_scale. Unmatched
+    requests raise CassetteMissError, or go to the network with allow_network.
+    """
+
+    def __init__(self, entries, latency_scale=1.0, allow_network=False):
+        self.latency_scale = latency_scale
+        self.allow_network = allow_network
+        self.replayed = 0
+        self.misses = []
+        self._lock = threading.Lock()
+        self._entries = list(entries)
+        self._used = [False] * len(self._entries)
+        self._exact = defaultdict(deque)
+        self._by_path = defaultdict(deque)
+        self._last = {}
+        for index, entry in enumerate(self._entries):
+            key = (entry["method"], entry["path"], json.dumps(entry["params"], sort_keys=True))
+            self._exact[key].append(index)
+            self._by_path[key[:2]].append(index)
+
+    @classmethod
+    def from_file(cls, path, latency_scale=1.0, allow_network=False):
+        return cls(load_cassette(path), latency_scale, allow_network)
+
+    def _take(self, queue):
+        while queue and self._used[queue[0]]:
+            queue.popleft()
+        if queue:
+            index = queue.popleft()
+            self._used[index] = True
+            return self._entries[index]
+        return None
+
+    def _next_entry(self, key):
+        with self._lock:
+            entry = self._take(self._exact[key]) or self._take(self._by_path[key[:2]])
+            if entry is not None:
+                self._last[key] = self._last[key[:2]] = entry
+                return entry
+            return self._last.get(key) or self._last.get(key[:2])
+
+    def before_call(self, call):
+        key = request_key(call)
+        entry = self._next_entry(key)
+        if entry is None:
+            with self._lock:
+                self.misses.append(key)
+            if self.allow_network:
+                return None
+            raise CassetteMissError(f"No recorded response for {key[0]} {key[1]} {key[2]}")
+
+        if self.latency_scale:
+            time.sleep(entry["elapsed"] * self.latency_scale)
+        with self._lock:
+            self.replayed += 1
+        return FacebookResponse(
+            body=entry["body"],
+            http_status=entry["status"],
+            headers=entry["headers"],
+            call={"method": call.method, "path": key[1], "params": call.params},
+        )
+
+
+@contextmanager
+def recording(path):
+    """Records every Graph API request made inside the block to the cassette at path."""
+    recorder = register_hook(CassetteRecorder(path).open())
+    try:
+        yield recorder
+    finally:
+        unregister_hook(recorder)
+        recorder.close()
+
+
+@contextmanager
+def replaying(path, latency_scale=1.0, allow_network=False):
+    """Answers every Graph API request made inside the block from the cassette at path."""
+    replayer = register_hook(CassetteReplayer.from_file(path, latency_scale, allow_network))
+    try:
+        yield replayer
+    finally:
+        unregister_hook(replayer)
+
+
+def run_script(script, args=()):
+    """Runs a recipe as __main__ with the import paths the recipes expect."""
+    script = os.path.abspath(script)
+    # Recipes import from the repository root, and some import utils modules without the package prefix
+    for path in (os.path.join(ROOT_DIR, "utils"), ROOT_DIR, os.path.dirname(script)):
+        if path not in sys.path:
+            sys.path.insert(0, path)
+    argv = sys.argv
+    sys.argv = [script] + list(args)
+    try:
+        runpy.run_path(script, run_name="__main__")
+    finally:
+        sys.argv = argv
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Record or replay the Graph API traffic of a recipe.")
+    parser.add_argument("mode", choices=["record", "replay"])
+    parser.add_argument("cassette", help="JSONL cassette to write or read")
+    parser.add_argument("script", help="Recipe to run, e.g. scale_good_ads/scale_good_ads.py")
+    parser.add_argument("script_args", nargs=argparse.REMAINDER, help="Arguments passed to the recipe")
+    parser.add_argument(
+        "--latency-scale", type=float, default=1.0,
+        help="Replay: multiplier for the recorded latency, 0 for none (default: 1.0)"
+    )
+    parser.add_argument(
+        "--allow-network", action="store_true",
+        help="Replay: send requests missing from the cassette to the Graph API"
+    )
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    if args.mode == "record":
+        with recording(args.cassette) as recorder:
+            run_script(args.script, args.script_args)
+        summary = f"Recorded {recorder.recorded} requests to {args.cassette}"
+    else:
+        with replaying(args.cassette, args.latency_scale, args.allow_network) as replayer:
+            run_script(args.script, args.script_args)
+        summary = f"Replayed {replayer.replayed} requests ({len(replayer.misses)} misses) from {args.cassette}"
+    print(f"{summary} in {time.perf_counter() - start:.2f}s", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
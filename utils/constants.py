@@ -1,5 +1,8 @@
+import logging
 import os
 
+logger = logging.getLogger(__name__)
+
 def get_env_var(name, default=None, is_required=True):
     """
     Get an environment variable value, with logging and fallback.
@@ -15,23 +18,77 @@ def get_env_var(name, default=None, is_required=True):
     value = os.environ.get(name)
     
     if value is not None:
-        print(f"Using {name}={value} from environment")
+        logger.debug("Using %s from environment", name)
         return value
     
     if default is not None:
-        print(f"Using default value for {name}: {default}")
+        logger.info("Using default value for %s: %s", name, default)
         return default
     
     if is_required:
-        print(f"ERROR: {name} environment variable not set")
-        print(f"Please set it using: export {name}=your_value")
+        logger.error("%s environment variable not set. Please set it using: export %s=your_value", name, name)
     
     return None
 
-# Meta API credentials
-APP_ID = int(get_env_var("META_APP_ID", 123, is_required=True) or 0)
-APP_SECRET = get_env_var("META_APP_SECRET", "123", is_required=True)
-AD_ACCOUNT_ID = get_env_var("META_AD_ACCOUNT_ID", "act_123", is_required=True)
-PAGE_ID = int(get_env_var("META_PAGE_ID", 123, is_required=True) or 0)
-CATALOG_ID = int(get_env_var("META_CATALOG_ID", 123, is_required=True) or 0)
-BUSINESS_ID = get_env_var("META_BUSINESS_ID", "123", is_required=True)
\ No newline at end of file
+# Meta API credentials, resolved from the environment on first access (PEP 562)
+# so that importing this module has no side effects
+_SETTINGS = {
+    "APP_ID": lambda: int(get_env_var("META_APP_ID", 123, is_required=True) or 0),
+    "APP_SECRET": lambda: get_env_var("META_APP_SECRET", "123", is_required=True),
+    "AD_ACCOUNT_ID": lambda: get_env_var("META_AD_ACCOUNT_ID", "act_123", is_required=True),
+    "PAGE_ID": lambda: int(get_env_var("META_PAGE_ID", 123, is_required=True) or 0),
+    "CATALOG_ID": lambda: int(get_env_var("META_CATALOG_ID", 123, is_required=True) or 0),
+    "BUSINESS_ID": lambda: get_env_var("META_BUSINESS_ID", "123", is_required=True),
+}
+
+def __getattr__(name):
+    if name not in _SETTINGS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = _SETTINGS[name]()
+    globals()[name] = value  # Later lookups skip __getattr__
+    return value
+
+def __dir__():
+    return sorted(set(globals()) | set(_SETTINGS))
+
+def apply_graph_url_override(url=None):
+    """
+    Points the SDK at another Graph API host, e.g. utils/fake_graph_api.py
+
+    Uses url, or META_GRAPH_URL when url is not given; without either the SDK
+    keeps talking to graph.facebook.com. Call it before FacebookAdsApi.init.
+    """
+    url = url or get_env_var("META_GRAPH_URL", is_required=False)
+    if url:
+        from facebook_business.session import FacebookSession
+
+        FacebookSession.GRAPH = url.rstrip("/")
+        set_video_upload_url(url)
+        logger.info("Sending Graph API requests to %s", FacebookSession.GRAPH)
+    return url
+
+_video_upload_url = None
+
+def set_video_upload_url(url=None):
+    """
+    Sends the SDK's chunked video uploads to url, or to graph-video.facebook.com again when url is None
+
+    VideoUploadRequest hardcodes that host instead of using FacebookSession.GRAPH, so
+    apply_graph_url_override alone would leave video uploads going to production.
+    Returns the previous override.
+    """
+    from facebook_business.video_uploader import VideoUploadRequest
+
+    global _video_upload_url
+    if not getattr(VideoUploadRequest.send, "follows_video_upload_url", False):
+        original_send = VideoUploadRequest.send
+
+        def send(self, path):
+            if _video_upload_url is None:
+                return original_send(self, path)
+            return self._api.call("POST", path, params=self._params, files=self._files, url_override=_video_upload_url)
+
+        send.follows_video_upload_url = True
+        VideoUploadRequest.send = send
+    previous, _video_upload_url = _video_upload_url, url.rstrip("/") if url else None
+    return previous
@@ -1,13 +1,125 @@
+import atexit
 import os
+import queue
+import sys
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows has no fcntl, writes are still serialized within the process
+    fcntl = None
+
+# Get root directory path
+root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LOG_PATH = os.path.join(root_dir, "demo_out.log")
+
+LOG_QUEUE_SIZE = 10000  # Messages buffered before callers write directly
+LOG_BATCH_SIZE = 500  # Messages written per flush
+FLUSH_TIMEOUT = 10  # Seconds flush() waits for the writer, so a stuck disk can't hang exit
+
+
+class _LogWriter:
+    """
+    Appends log lines from a background thread in batches.
+
+    Callers never wait on disk: lines go onto a bounded queue, and only when it
+    is full does the caller write its own line. Every batch is written under an
+    exclusive file lock so lines from several processes never interleave. A batch
+    that can't be written goes to stderr instead, so the writer keeps draining.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._reset()
+
+    def _reset(self):
+        self._queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+        self._file_lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._thread = None
+
+    def write(self, line):
+        self._ensure_started()
+        try:
+            self._queue.put_nowait(line)
+        except queue.Full:
+            self._write_or_fall_back([line])
+
+    def flush(self, timeout=FLUSH_TIMEOUT):
+        """
+        Blocks until every queued line has been written
+
+        Returns False if the lines are still queued after timeout seconds or the writer thread has died.
+        """
+        if self._thread is None:
+            return True
+        deadline = time.monotonic() + timeout
+        with self._queue.all_tasks_done:
+            while self._queue.unfinished_tasks:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not self._thread.is_alive():
+                    return False
+                self._queue.all_tasks_done.wait(min(remaining, 0.1))
+        return True
+
+    def _ensure_started(self):
+        if self._thread is None:
+            with self._start_lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="demo-log-writer", daemon=True)
+                    self._thread.start()
+
+    def _run(self):
+        while True:
+            lines = [self._queue.get()]
+            while len(lines) < LOG_BATCH_SIZE:
+                try:
+                    lines.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self._write_or_fall_back(lines)
+            finally:
+                for _ in lines:
+                    self._queue.task_done()
+
+    def _write_or_fall_back(self, lines):
+        try:
+            self._write_lines(lines)
+        except Exception as e:  # e.g. a bad log path or a full disk
+            try:
+                sys.stderr.write(f"Could not write to {self.path}: {e}\n{''.join(lines)}")
+            except Exception:
+                pass
+
+    def _write_lines(self, lines):
+        with self._file_lock, open(self.path, "a") as log_file:
+            if fcntl is not None:
+                fcntl.flock(log_file, fcntl.LOCK_EX)
+            try:
+                log_file.write("".join(lines))
+                log_file.flush()
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(log_file, fcntl.LOCK_UN)
+
+
+_log_writer = _LogWriter(LOG_PATH)
+atexit.register(_log_writer.flush)
+if hasattr(os, "register_at_fork"):
+    # The writer thread does not survive fork, so children start their own
+    os.register_at_fork(after_in_child=_log_writer._reset)
+
+
+def flush_log():
+    """Waits until every message passed to print_and_log is in demo_out.log; False on timeout."""
+    return _log_writer.flush()
+
 
 def print_and_log(run_id: str, message: str):
     # Print the message to the console
     print(message)
 
-    # Get root directory path
-    root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-    log_path = os.path.join(root_dir, "demo_out.log")
-
     # Log the message to demo_out.log with run_id
-    with open(log_path, "a") as log_file:
-        log_file.write(f"{run_id}: {message}\n")
+    _log_writer.write(f"{run_id}: {message}\n")
@@ -0,0 +1,1004 @@
+"""
+Local fake Graph API server for running the recipes offline.
+
+The server is seeded with a deterministic business portfolio: businesses with
+ad accounts, campaigns, ad sets promoting pixels, ads, pixels and catalogs.
+It answers the same paths the SDK calls, so any recipe can run against it by
+pointing the SDK at its URL with META_GRAPH_URL:
+
+    python -m utils.fake_graph_api --port 8765 --latency insights=0.2
+    META_GRAPH_URL=http://127.0.0.1:8765 python stats_for_dashboards/catalog_health_dashboard.py
+
+or in-process, e.g. from a test or benchmark:
+
+    with FakeGraphAPI(FakeGraphData.seeded(seed=1), latency={"insights": 0.05}) as server:
+        business_id = server.data.business_ids[0]
+        ...
+
+Supported: node reads with field selection and nested edge expansion
+(fields=stats,product_feeds.limit(100).summary(true){latest_upload{end_time}}),
+edge listings paged with limit/after cursors, ?ids= multi-node reads,
+synthetic insights (level, time_range, time_increment, breakdowns and async
+report runs), creates, updates, deletes, ad copies, batch requests with
+{result=name:$.id} references, and image and video uploads: multipart files
+or base64 bytes on adimages, and single-request or chunked (upload_phase
+start, transfer, finish) uploads on advideos. The SDK sends chunked video
+uploads to a separate host, which entering FakeGraphAPI also points at the
+server.
+
+Every response carries X-App-Usage, X-Ad-Account-Usage and
+X-Business-Use-Case-Usage headers computed from the calls made in the last
+rate_window seconds; past 100% the request fails with the Graph API rate limit
+error. Latency and error rates are configured per endpoint, where an endpoint
+is the edge name ("insights", "adsets"), the node type for node reads
+("catalog", "adset"), "ids" for multi-node reads or "batch".
+"""
+
+import argparse
+import base64
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from collections import defaultdict, deque
+from datetime import date, datetime, timedelta, timezone
+from email.parser import BytesParser
+from email.policy import HTTP
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+DEFAULT_PAGE_SIZE = 25
+DEFAULT_RATE_LIMIT = 600  # Calls per rate_window, for the app and for each account or business
+DEFAULT_RATE_WINDOW = 60.0  # Seconds
+
+# Node types reachable from a node through each edge
+EDGE_TYPES = {
+    "businesses": "business",
+    "owned_ad_accounts": "ad_account",
+    "client_ad_accounts": "ad_account",
+    "adaccounts": "ad_account",
+    "adspixels": "pixel",
+    "owned_product_catalogs": "catalog",
+    "client_product_catalogs": "catalog",
+    "campaigns": "campaign",
+    "adsets": "adset",
+    "ads": "ad",
+    "adcreatives": "creative",
+    "adimages": "image",
+    "advideos": "video",
+    "product_sets": "product_set",
+    "product_feeds": "product_feed",
+}
+
+# Edges walked to find the ads, ad sets or campaigns below a node for insights
+_HIERARCHY_EDGES = ("campaigns", "adsets", "ads")
+_LEVEL_TYPES = {"account": "ad_account", "campaign": "campaign", "adset": "adset", "ad": "ad"}
+_PLACEMENTS = [
+    ("facebook", "feed", 0.40),
+    ("facebook", "facebook_reels", 0.10),
+    ("instagram", "feed", 0.25),
+    ("instagram", "reels", 0.20),
+    ("audience_network", "classic", 0.05),
+]
+_EVENTS = ["PageView", "ViewContent", "AddToCart", "Purchase"]
+_REFERENCE_PATTERN = re.compile(r"\{result=([\w\-]+):\$\.([\w\.]+)\}")
+_TIME_FORMAT = "%Y-%m-%dT%H:%M:%S+0000"
+
+
+class GraphError(Exception):
+    """An error response in the Graph API error format."""
+
+    def __init__(self, status, code, message, error_subcode=None, error_type="OAuthException"):
+        super().__init__(message)
+        self.status = status
+        self.body = {"error": {
+            "message": message,
+            "type": error_type,
+            "code": code,
+            "fbtrace_id": "FakeGraphAPI",
+        }}
+        if error_subcode is not None:
+            self.body["error"]["error_subcode"] = error_subcode
+
+
+class UploadedFile:
+    """A file part of a multipart request."""
+
+    def __init__(self, filename, content):
+        self.filename = filename
+        self.content = content
+
+    @property
+    def hash(self):
+        return hashlib.md5(self.content).hexdigest()
+
+
+def parse_multipart(content_type, body):
+    """Returns {name: value} for a multipart/form-data body, with file parts as UploadedFiles."""
+    boundary = BytesParser(policy=HTTP).parsebytes(f"Content-Type: {content_type}\r\n\r\n".encode()).get_boundary()
+    params = {}
+    # Parts are split by hand: the SDK labels video chunks multipart/form-data, which email would parse as nested parts
+    for part in body.split(b"--" + boundary.encode())[1:-1]:
+        # Each part is CRLF, headers, a blank line, content, CRLF; content may itself end in CR or LF bytes
+        head, _, content = part[2:-2].partition(b"\r\n\r\n")
+        headers = BytesParser(policy=HTTP).parsebytes(head + b"\r\n\r\n")
+        name = headers.get_param("name", header="content-disposition")
+        if name is None:
+            continue
+        filename = headers.get_filename()
+        params[name] = UploadedFile(filename, content) if filename is not None else content.decode()
+    return params
+
+
+def _not_found(path):
+    return GraphError(
+        400, 100, f"Unsupported request - object with ID '{path}' does not exist", 33, "GraphMethodException"
+    )
+
+
+def parse_fields(fields):
+    """
+    Parses a fields parameter into {name: subfields}
+
+    Accepts a JSON list or a comma separated string with nested braces, e.g.
+    'product_count,product_feeds{latest_upload{end_time}}'. subfields is None
+    for plain fields.
+    """
+    if not fields:
+        return {}
+    if fields.startswith("["):
+        fields = ",".join(json.loads(fields))
+    parsed = {}
+    depth, start, name = 0, 0, None
+    for i, char in enumerate(fields + ","):
+        if char == "{":
+            if depth == 0:
+                name = fields[start:i].strip()
+                start = i + 1
+            depth += 1
+        elif char == "}":
+            depth -= 1
+            if depth == 0:
+                parsed[name] = parse_fields(fields[start:i])
+                start, name = i + 1, None
+        elif char == "," and depth == 0:
+            field = fields[start:i].strip()
+            if field:
+                parsed[field] = None
+            start = i + 1
+    return parsed
+
+
+def split_field_modifiers(name):
+    """
+    Splits an expanded field into its name and modifiers
+
+    'product_feeds.limit(100).summary(true)' is ('product_feeds', {'limit': '100', 'summary': 'true'}).
+    """
+    base, _, rest = name.partition(".")
+    return base, dict(re.findall(r"(\w+)\(([^)]*)\)", rest))
+
+
+def _decode(value):
+    """Decodes parameter values the SDK JSON-encoded, leaving plain strings as they are."""
+    if isinstance(value, str) and value[:1] in ("[", "{"):
+        try:
+            return json.loads(value)
+        except ValueError:
+            pass
+    return value
+
+
+class FakeGraphData:
+    """In-memory Graph: nodes by id and the ids on each (node, edge)."""
+
+    def __init__(self, seed=0):
+        self.seed = seed
+        self.nodes = {}
+        self.edges = defaultdict(list)
+        self.business_ids = []
+        self._next_id = 100000000000000
+        self._lock = threading.RLock()
+        self.add("user", {"name": "Fake User"}, node_id="me")
+
+    def new_id(self):
+        with self._lock:
+            self._next_id += 1
+            return str(self._next_id)
+
+    def add(self, node_type, fields, parents=(), node_id=None):
+        """Adds a node below each (parent_id, edge) in parents and returns its id."""
+        with self._lock:
+            node_id = node_id or self.new_id()
+            self.nodes[node_id] = dict(fields, id=node_id, _type=node_type)
+            for parent_id, edge in parents:
+                self.edges[(parent_id, edge)].append(node_id)
+            return node_id
+
+    def link(self, parent_id, edge, node_id):
+        with self._lock:
+            if node_id not in self.edges[(parent_id, edge)]:
+                self.edges[(parent_id, edge)].append(node_id)
+
+    def remove(self, node_id):
+        with self._lock:
+            self.nodes.pop(node_id, None)
+            for children in self.edges.values():
+                if node_id in children:
+                    children.remove(node_id)
+
+    def children(self, node_id, edge):
+        with self._lock:
+            return [self.nodes[child] for child in self.edges.get((node_id, edge), []) if child in self.nodes]
+
+    @classmethod
+    def seeded(cls, seed=0, businesses=2, ad_accounts=2, campaigns=2, ad_sets=6, ads=2, pixels=2, catalogs=3):
+        """
+        Builds a portfolio from seed; counts are per business (ad accounts,
+        pixels, catalogs), per ad account (campaigns, ad sets) or per ad set (ads)
+        """
+        data = cls(seed)
+        rng = random.Random(seed)
+        now = datetime(2024, 6, 1, tzinfo=timezone.utc)
+
+        for b in range(businesses):
+            business_id = data.add("business", {"name": f"Business {b + 1}"}, [("me", "businesses")])
+            data.business_ids.append(business_id)
+
+            pixel_ids = []
+            for p in range(pixels):
+                pixel_id = data.add("pixel", {
+                    "name": f"Pixel {b + 1}.{p + 1}",
+                    "match_rate_approx": rng.randint(20, 90),
+                    "event_stats": ",".join(_EVENTS),
+                    "automatic_matching_fields": ["em", "ph", "fn"][:rng.randint(0, 3)],
+                    "last_fired_time": now.strftime(_TIME_FORMAT),
+                }, [(business_id, "adspixels")])
+                pixel_ids.append(pixel_id)
+
+            for a in range(ad_accounts):
+                account_number = data.new_id()
+                account_id = data.add("ad_account", {
+                    "account_id": account_number,
+                    "name": f"Ad Account {b + 1}.{a + 1}",
+                    "currency": "USD",
+                    "account_status": 1,
+                }, [(business_id, "owned_ad_accounts")], node_id=f"act_{account_number}")
+                for pixel_id in pixel_ids:
+                    data.link(pixel_id, "adaccounts", account_id)
+
+                campaign_ids = [
+                    data.add("campaign", {
+                        "name": f"Campaign {a + 1}.{c + 1}",
+                        "objective": "OUTCOME_SALES",
+                        "status": "ACTIVE",
+                        "account_id": account_number,
+                    }, [(account_id, "campaigns")])
+                    for c in range(campaigns)
+                ]
+                for s in range(ad_sets):
+                    campaign_id = campaign_ids[s % len(campaign_ids)]
+                    pixel_id = rng.choice(pixel_ids + [None]) if pixel_ids else None
+                    updated = now - timedelta(days=rng.randint(0, 90), seconds=rng.randint(0, 86399))
+                    adset_id = data.add("adset", {
+                        "name": f"Ad Set {a + 1}.{s + 1}",
+                        "status": "ACTIVE",
+                        "daily_budget": str(rng.randint(10, 200) * 100),
+                        "promoted_object": {"pixel_id": pixel_id, "custom_event_type": "PURCHASE"} if pixel_id else {},
+                        "updated_time": updated.strftime(_TIME_FORMAT),
+                        "account_id": account_number,
+                        "campaign_id": campaign_id,
+                    }, [(account_id, "adsets"), (campaign_id, "adsets")])
+                    for d in range(ads):
+                        creative_id = data.add("creative", {
+                            "name": f"Creative {s + 1}.{d + 1}", "account_id": account_number,
+                        }, [(account_id, "adcreatives")])
+                        data.add("ad", {
+                            "name": f"Ad {s + 1}.{d + 1}",
+                            "status": "ACTIVE",
+                            "creative": {"id": creative_id},
+                            "account_id": account_number,
+                            "campaign_id": campaign_id,
+                            "adset_id": adset_id,
+                        }, [(account_id, "ads"), (adset_id, "ads")])
+
+            for c in range(catalogs):
+                catalog_id = data.add("catalog", {
+                    "name": f"Catalog {b + 1}.{c + 1}",
+                    "product_count": rng.randint(0, 5000),
+                }, [(business_id, "owned_product_catalogs")])
+                for f in range(rng.randint(1, 2)):
+                    uploaded = now - timedelta(hours=rng.randint(1, 240))
+                    data.add("product_feed", {
+                        "name": f"Feed {c + 1}.{f + 1}",
+                        "latest_upload": {"id": data.new_id(), "end_time": uploaded.strftime(_TIME_FORMAT)},
+                    }, [(catalog_id, "product_feeds")])
+        return data
+
+
+class FakeGraphAPI:
+    """
+    Fake Graph API HTTP server over a FakeGraphData
+
+    latency and error_rate map endpoints to seconds and to a probability of a
+    transient error; the "default" key applies to endpoints not listed.
+    """
+
+    def __init__(self, data=None, host="127.0.0.1", port=0, latency=None, error_rate=None,
+                 rate_limit=DEFAULT_RATE_LIMIT, rate_window=DEFAULT_RATE_WINDOW, page_size=DEFAULT_PAGE_SIZE):
+        self.data = data if data is not None else FakeGraphData.seeded()
+        self.host = host
+        self.port = port
+        self.latency = dict(latency or {})
+        self.error_rate = dict(error_rate or {})
+        self.rate_limit = rate_limit
+        self.rate_window = rate_window
+        self.page_size = page_size
+        self.request_counts = defaultdict(int)
+        self._rng = random.Random(self.data.seed)
+        self._calls = defaultdict(deque)  # Usage key -> call times in the current window
+        self._injected = defaultdict(deque)  # Endpoint -> errors to return next
+        self._lock = threading.Lock()
+        self._server = None
+        self._thread = None
+        self._previous_graph_url = None
+        self._previous_video_upload_url = None
+
+    @property
+    def url(self):
+        return f"http://{self.host}:{self.port}"
+
+    def start(self):
+        """Starts serving on a background thread; port 0 picks a free port."""
+        self._server = ThreadingHTTPServer((self.host, self.port), _Handler)
+        self._server.daemon_threads = True
+        self._server.app = self
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self):
+        # Imported here so the server itself runs without the SDK installed
+        from facebook_business.session import FacebookSession
+
+        from utils.constants import set_video_upload_url
+
+        self.start()
+        self._previous_graph_url = FacebookSession.GRAPH
+        FacebookSession.GRAPH = self.url
+        self._previous_video_upload_url = set_video_upload_url(self.url)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        from facebook_business.session import FacebookSession
+        from utils.constants import set_video_upload_url
+
+        FacebookSession.GRAPH = self._previous_graph_url
+        set_video_upload_url(self._previous_video_upload_url)
+        self.stop()
+
+    def fail_next(self, endpoint, count=1, status=500, code=2, message="An unexpected error has occurred."):
+        """Makes the next count requests to endpoint fail with the given error."""
+        with self._lock:
+            for _ in range(count):
+                self._injected[endpoint].append((status, code, message))
+
+    # Request handling
+
+    def handle(self, method, path, params):
+        """Returns (status, headers, body) for one HTTP request."""
+        segments = [segment for segment in path.split("/") if segment]
+        if segments and re.fullmatch(r"v\d+\.\d+", segments[0]):
+            segments = segments[1:]
+        endpoint = self._endpoint(method, segments, params)
+        with self._lock:
+            self.request_counts[endpoint] += 1
+
+        delay = self.latency.get(endpoint, self.latency.get("default", 0))
+        if delay:
+            time.sleep(delay)
+
+        usage_keys = self._usage_keys(segments)
+        usage = self._record_usage(usage_keys)
+        headers = self._usage_headers(usage)
+        try:
+            self._check_rate_limit(usage)
+            self._maybe_fail(endpoint)
+            status, body = self.dispatch(method, segments, params)
+        except GraphError as e:
+            status, body = e.status, e.body
+        return status, headers, body
+
+    def _endpoint(self, method, segments, params):
+        if not segments:
+            return "batch" if method == "POST" else "ids"
+        if len(segments) > 1:
+            return segments[1]
+        node = self.data.nodes.get(segments[0])
+        return node["_type"] if node else "node"
+
+    def _maybe_fail(self, endpoint):
+        with self._lock:
+            if self._injected[endpoint]:
+                status, code, message = self._injected[endpoint].popleft()
+                raise GraphError(status, code, message, error_type="FacebookApiException")
+            rate = self.error_rate.get(endpoint, self.error_rate.get("default", 0))
+            if rate and self._rng.random() < rate:
+                raise GraphError(500, 2, "An unexpected error has occurred. Please retry your request later.",
+                                 error_type="FacebookApiException")
+
+    def _usage_keys(self, segments):
+        """The app, plus the ad account or business the request belongs to."""
+        keys = [("app", None)]
+        node = self.data.nodes.get(segments[0]) if segments else None
+        if node is None:
+            return keys
+        if node["_type"] == "business":
+            keys.append(("business", node["id"]))
+        elif node.get("account_id"):
+            keys.append(("ad_account", f"act_{node['account_id']}"))
+        return keys
+
+    def _record_usage(self, keys):
+        """Counts the call for every key and returns {key: usage percentage}."""
+        now = time.monotonic()
+        usage = {}
+        with self._lock:
+            for key in keys:
+                calls = self._calls[key]
+                while calls and calls[0] <= now - self.rate_window:
+                    calls.popleft()
+                calls.append(now)
+                usage[key] = 100 * len(calls) // self.rate_limit
+        return usage
+
+    def _regain_seconds(self, key):
+        with self._lock:
+            calls = self._calls[key]
+            return max(0.0, calls[0] + self.rate_window - time.monotonic()) if calls else 0.0
+
+    def _usage_headers(self, usage):
+        headers = {}
+        for (kind, key_id), percent in usage.items():
+            regain = self._regain_seconds((kind, key_id)) if percent >= 100 else 0
+            if kind == "app":
+                headers["X-App-Usage"] = json.dumps(
+                    {"call_count": percent, "total_cputime": percent // 2, "total_time": percent // 2}
+                )
+            elif kind == "ad_account":
+                headers["X-Ad-Account-Usage"] = json.dumps(
+                    {"acc_id_util_pct": percent, "reset_time_duration": int(regain)}
+                )
+            if kind in ("ad_account", "business"):
+                headers["X-Business-Use-Case-Usage"] = json.dumps({key_id.replace("act_", ""): [{
+                    "type": "ads_management",
+                    "call_count": percent,
+                    "total_cputime": percent // 2,
+                    "total_time": percent // 2,
+                    "estimated_time_to_regain_access": -(-int(regain) // 60),
+                }]})
+        return headers
+
+    def _check_rate_limit(self, usage):
+        for (kind, _), percent in usage.items():
+            if percent <= 100:
+                continue
+            if kind == "app":
+                raise GraphError(400, 4, "Application request limit reached")
+            if kind == "ad_account":
+                raise GraphError(400, 80004, "There have been too many calls to this ad-account.", 2446079)
+            raise GraphError(400, 17, "User request limit reached", 2446079)
+
+    def dispatch(self, method, segments, params):
+        """Serves a request without latency, usage or injected errors; returns (status, body)."""
+        if not segments:
+            if method == "POST" and "batch" in params:
+                return 200, self._batch(_decode(params["batch"]))
+            if "ids" in params:
+                return 200, self._read_ids(params)
+            raise GraphError(400, 100, "Unsupported request - missing ids", error_type="GraphMethodException")
+
+        node_id = segments[0]
+        node = self.data.nodes.get(node_id)
+        if node is None:
+            raise _not_found(node_id)
+        if len(segments) == 1:
+            if method == "GET":
+                return 200, self.render(node, parse_fields(params.get("fields")))
+            if method == "DELETE":
+                self.data.remove(node_id)
+                return 200, {"success": True}
+            node.update({key: _decode(value) for key, value in params.items() if key != "access_token"})
+            node["updated_time"] = datetime.now(timezone.utc).strftime(_TIME_FORMAT)
+            return 200, {"success": True}
+
+        edge = segments[1]
+        if edge == "insights":
+            if method == "POST":
+                return 200, self._create_report_run(node, params)
+            return 200, self._page(self._insights(node, params), params, f"{node_id}/{edge}")
+        if method == "GET":
+            return 200, self._page(self._edge_rows(node, edge, params), params, f"{node_id}/{edge}")
+        if method == "POST":
+            return 200, self._create(node, edge, params)
+        raise GraphError(400, 100, f"Unsupported {method} request", error_type="GraphMethodException")
+
+    def _read_ids(self, params):
+        fields = parse_fields(params.get("fields"))
+        result = {}
+        for node_id in params["ids"].split(","):
+            node = self.data.nodes.get(node_id.strip())
+            if node is None:
+                raise _not_found(node_id)
+            result[node["id"]] = self.render(node, fields)
+        return result
+
+    def render(self, node, fields):
+        """A node as JSON with the requested fields, expanding edges named in fields."""
+        fields = fields or {"id": None, **({"name": None} if "name" in node else {})}
+        rendered = {}
+        for name, subfields in fields.items():
+            name, modifiers = split_field_modifiers(name)
+            if name in node and not name.startswith("_"):
+                value = node[name]
+                if subfields and isinstance(value, dict):
+                    value = {key: value[key] for key in subfields if key in value}
+                rendered[name] = value
+            elif (node["id"], name) in self.data.edges or name in EDGE_TYPES or name in _COMPUTED_EDGES:
+                rows = self._edge_rows(node, name, {}, subfields)
+                page_params = {"limit": self.page_size, **modifiers}
+                if page_params.get("summary") == "false":
+                    del page_params["summary"]
+                rendered[name] = self._page(rows, page_params, f"{node['id']}/{name}")
+        rendered["id"] = node["id"]
+        return rendered
+
+    def _edge_rows(self, node, edge, params, fields=None):
+        if edge in _COMPUTED_EDGES:
+            rows = _COMPUTED_EDGES[edge](self, node)
+            return [{key: row[key] for key in fields if key in row} for row in rows] if fields else rows
+        children = self.data.children(node["id"], edge)
+        children = [child for child in children if _matches(child, params)]
+        fields = fields if fields is not None else parse_fields(params.get("fields"))
+        return [self.render(child, fields) for child in children]
+
+    def _page(self, rows, params, path):
+        """One page of rows with Graph API style cursors."""
+        limit = int(params.get("limit") or self.page_size)
+        start = int(params.get("after") or 0)
+        page = {"data": rows[start:start + limit]}
+        end = start + len(page["data"])
+        page["paging"] = {"cursors": {"before": str(start), "after": str(end)}}
+        if end < len(rows):
+            next_params = {key: value for key, value in params.items() if key != "access_token"}
+            next_params.update(limit=limit, after=end)
+            page["paging"]["next"] = f"{self.url}/{path}?{urlencode(next_params)}"
+        if params.get("summary"):
+            page["summary"] = {"total_count": len(rows)}
+        return page
+
+    def _create(self, parent, edge, params):
+        if edge == "adimages":
+            return self._create_images(parent, params)
+        if edge == "advideos":
+            return self._upload_video(parent, params)
+        fields = {key: _decode(value) for key, value in params.items() if key != "access_token"}
+        if edge == "copies":
+            return self._copy(parent, fields)
+        node_type = EDGE_TYPES.get(edge, edge.rstrip("s"))
+        if parent.get("account_id"):
+            fields.setdefault("account_id", parent["account_id"])
+        if node_type in ("campaign", "adset", "ad"):
+            fields.setdefault("status", "ACTIVE")
+        fields["updated_time"] = datetime.now(timezone.utc).strftime(_TIME_FORMAT)
+        parents = [(parent["id"], edge)]
+        for parent_field, parent_edge in (("campaign_id", "adsets"), ("adset_id", "ads")):
+            if fields.get(parent_field) in self.data.nodes and node_type == EDGE_TYPES[parent_edge]:
+                parents.append((fields[parent_field], parent_edge))
+        return {"id": self.data.add(node_type, fields, parents)}
+
+    def _create_images(self, account, params):
+        """Stores each uploaded file, or the base64 bytes parameter, as an image, answering like the Graph API."""
+        uploads = {name: value for name, value in params.items() if isinstance(value, UploadedFile)}
+        if params.get("bytes"):
+            uploads[params.get("name") or "bytes"] = UploadedFile(None, base64.b64decode(params["bytes"]))
+        if not uploads:
+            raise GraphError(400, 100, "Invalid parameter: an image file or bytes is required",
+                             error_type="GraphMethodException")
+        images = {}
+        for name, upload in uploads.items():
+            image = {"hash": upload.hash, "name": upload.filename or name, "url": f"{self.url}/images/{upload.hash}"}
+            # Images are identified by their content, and the SDK attaches the same file more than once
+            if not any(existing["hash"] == image["hash"] for existing in self.data.children(account["id"], "adimages")):
+                self.data.add("image", dict(image, account_id=account.get("account_id")), [(account["id"], "adimages")])
+            images[name] = {"hash": image["hash"], "url": image["url"]}
+        return {"images": images}
+
+    def _upload_video(self, account, params):
+        """A video uploaded with a source file in one request, or in the chunked start, transfer, finish phases."""
+        phase = params.get("upload_phase")
+        if phase is None:
+            source = params.get("source")
+            if not isinstance(source, UploadedFile):
+                raise GraphError(400, 100, "Invalid parameter: a source file is required",
+                                 error_type="GraphMethodException")
+            return {"id": self._add_video(account, params.get("name") or source.filename, len(source.content))}
+        if phase == "start":
+            size = int(params.get("file_size") or 0)
+            video_id = self._add_video(account, None, size, status="processing")
+            return {"video_id": video_id, "upload_session_id": video_id, "start_offset": "0", "end_offset": str(size)}
+
+        video = self.data.nodes.get(params.get("upload_session_id"))
+        if video is None or video["_type"] != "video":
+            raise GraphError(400, 100, "Invalid upload session", error_type="GraphMethodException")
+        if phase == "transfer":
+            chunk = params.get("video_file_chunk")
+            if not isinstance(chunk, UploadedFile) or int(params.get("start_offset") or 0) != video["_received"]:
+                raise GraphError(400, 100, "Invalid video chunk", error_type="GraphMethodException")
+            video["_received"] += len(chunk.content)
+            offset = str(video["_received"])
+            return {"start_offset": offset, "end_offset": offset}
+        if phase == "finish":
+            if video["_received"] != video["_size"]:
+                raise GraphError(400, 100, "Video upload is incomplete", error_type="GraphMethodException")
+            video.update(status="ready", title=params.get("title"))
+            return {"success": True}
+        raise GraphError(400, 100, f"Unsupported upload_phase {phase}", error_type="GraphMethodException")
+
+    def _add_video(self, account, title, size, status="ready"):
+        fields = {"title": title, "status": status, "account_id": account.get("account_id"), "_size": size,
+                  "_received": size if status == "ready" else 0}
+        return self.data.add("video", fields, [(account["id"], "advideos")])
+
+    def _copy(self, ad, params):
+        fields = {key: value for key, value in ad.items() if key not in ("id", "_type")}
+        fields["adset_id"] = params.get("adset_id") or ad.get("adset_id")
+        status_option = params.get("status_option", "PAUSED")
+        fields["status"] = ad.get("status") if status_option == "INHERITED_FROM_SOURCE" else status_option
+        account_id = f"act_{ad.get('account_id')}"
+        copy_id = self.data.add("ad", fields, [(account_id, "ads"), (fields["adset_id"], "ads")])
+        return {
+            "success": True,
+            "copied_ad_id": copy_id,
+            "copied_ad_ids": [copy_id],
+            "ad_object_ids": [{"ad_object_type": "ad", "source_id": ad["id"], "copied_id": copy_id}],
+        }
+
+    def _batch(self, operations):
+        results, names, failed = [], {}, set()
+        for operation in operations:
+            if operation.get("depends_on") in failed:
+                # As in the Graph API, an operation whose dependency failed is not run
+                failed.add(operation.get("name"))
+                results.append(None)
+                continue
+            split = urlsplit(operation["relative_url"])
+            params = dict(parse_qsl(split.query))
+            params.update(parse_qsl(operation.get("body") or ""))
+            params = {key: self._resolve(value, names) for key, value in params.items()}
+            method = operation.get("method", "GET").upper()
+            segments = [segment for segment in split.path.split("/") if segment]
+            try:
+                # Every operation counts towards the rate limits, as in the Graph API
+                self._check_rate_limit(self._record_usage(self._usage_keys(segments)))
+                self._maybe_fail(self._endpoint(method, segments, params))
+                status, body = self.dispatch(method, segments, params)
+            except GraphError as e:
+                status, body = e.status, e.body
+            if operation.get("name"):
+                names[operation["name"]] = body
+                if status >= 400:
+                    failed.add(operation["name"])
+            results.append({
+                "code": status,
+                "headers": [{"name": "Content-Type", "value": "application/json"}],
+                "body": json.dumps(body),
+            })
+        return results
+
+    @staticmethod
+    def _resolve(value, names):
+        def substitute(match):
+            resolved = names.get(match.group(1))
+            for key in match.group(2).split("."):
+                resolved = resolved.get(key) if isinstance(resolved, dict) else None
+            return str(resolved) if resolved is not None else match.group(0)
+
+        return _REFERENCE_PATTERN.sub(substitute, value)
+
+    # Insights
+
+    def _create_report_run(self, node, params):
+        params = {key: value for key, value in params.items() if key != "access_token"}
+        report_run_id = self.data.add("report_run", {
+            "async_status": "Job Completed",
+            "async_percent_completion": 100,
+            "account_id": node.get("account_id"),
+            "_object_id": node["id"],
+            "_params": params,
+        })
+        return {"report_run_id": report_run_id}
+
+    def _insights(self, node, params):
+        if node["_type"] == "report_run":
+            params = dict(node["_params"], **{key: value for key, value in params.items() if key in ("limit", "after")})
+            node = self.data.nodes[node["_object_id"]]
+        level = params.get("level") or {"ad_account": "account"}.get(node["_type"], node["_type"])
+        objects = self._descendants(node, _LEVEL_TYPES.get(level, "ad"))
+        days = _report_days(params)
+        increment = str(params.get("time_increment") or "all_days")
+        if increment.isdigit():
+            buckets = [days[i:i + int(increment)] for i in range(0, len(days), int(increment))]
+        else:
+            buckets = [days]  # all_days; monthly is not modelled
+        breakdowns = _decode(params.get("breakdowns")) or []
+        if isinstance(breakdowns, str):
+            breakdowns = breakdowns.split(",")
+        fields = parse_fields(params.get("fields")) or {"spend": None, "impressions": None}
+        filtering = _decode(params.get("filtering")) or []
+
+        rows = []
+        for obj in objects:
+            ads = self._descendants(obj, "ad")
+            for bucket in buckets:
+                totals = defaultdict(float)
+                for ad in ads:
+                    for day in bucket:
+                        for key, value in self._daily_metrics(ad["id"], day).items():
+                            totals[key] += value
+                for placement in _PLACEMENTS if breakdowns else [(None, None, 1.0)]:
+                    row = self._insights_row(obj, level, bucket, totals, placement, breakdowns)
+                    if all(_matches_filter(row, condition) for condition in filtering):
+                        rows.append({
+                            key: value for key, value in row.items()
+                            if key in fields or key in ("date_start", "date_stop") or key in breakdowns
+                        })
+        return rows
+
+    def _descendants(self, node, node_type):
+        if node["_type"] == node_type:
+            return [node]
+        found, seen, queue = [], set(), deque([node])
+        while queue:
+            current = queue.popleft()
+            for edge in _HIERARCHY_EDGES:
+                for child in self.data.children(current["id"], edge):
+                    if child["id"] in seen:
+                        continue
+                    seen.add(child["id"])
+                    if child["_type"] == node_type:
+                        found.append(child)
+                    else:
+                        queue.append(child)
+        return found
+
+    def _daily_metrics(self, ad_id, day):
+        rng = random.Random(f"{self.data.seed}:{ad_id}:{day}")
+        impressions = rng.randint(0, 5000)
+        clicks = int(impressions * rng.uniform(0, 0.03))
+        purchases = int(clicks * rng.uniform(0, 0.1))
+        return {
+            "impressions": impressions,
+            "clicks": clicks,
+            "spend": round(impressions * rng.uniform(0.002, 0.02), 2),
+            "purchases": purchases,
+            "purchase_value": round(purchases * rng.uniform(10, 120), 2),
+        }
+
+    def _insights_row(self, obj, level, bucket, totals, placement, breakdowns):
+        platform, position, share = placement
+        spend = round(totals["spend"] * share, 2)
+        purchase_value = round(totals["purchase_value"] * share, 2)
+        row = {
+            "account_id": obj.get("account_id") or obj["id"].replace("act_", ""),
+            "date_start": bucket[0].isoformat(),
+            "date_stop": bucket[-1].isoformat(),
+            "spend": f"{spend:.2f}",
+            "impressions": str(int(totals["impressions"] * share)),
+            "clicks": str(int(totals["clicks"] * share)),
+            "actions": [{"action_type": "purchase", "value": str(int(totals["purchases"] * share))}],
+            "action_values": [{"action_type": "purchase", "value": f"{purchase_value:.2f}"}],
+            "purchase_roas": [{"action_type": "omni_purchase", "value": f"{purchase_value / spend:.4f}" if spend else "0"}],
+        }
+        for ancestor in ("campaign", "adset", "ad"):
+            if level == ancestor:
+                row[f"{ancestor}_id"] = obj["id"]
+                row[f"{ancestor}_name"] = obj.get("name")
+                break
+            if obj.get(f"{ancestor}_id"):
+                row[f"{ancestor}_id"] = obj[f"{ancestor}_id"]
+        if "publisher_platform" in breakdowns:
+            row["publisher_platform"] = platform
+        if "platform_position" in breakdowns:
+            row["platform_position"] = position
+        return row
+
+
+def _report_days(params):
+    time_range = _decode(params.get("time_range"))
+    if isinstance(time_range, dict) and time_range.get("since"):
+        since = date.fromisoformat(time_range["since"])
+        until = date.fromisoformat(time_range.get("until") or time_range["since"])
+    else:
+        until = date.today() - timedelta(days=1)
+        since = until - timedelta(days=29)
+    return [since + timedelta(days=i) for i in range((until - since).days + 1)]
+
+
+def _matches(node, params):
+    """Applies the status and filtering parameters of an edge listing to a node."""
+    statuses = _decode(params.get("status") or params.get("effective_status"))
+    if statuses and node.get("status") not in statuses:
+        return False
+    return all(_matches_filter(node, condition) for condition in _decode(params.get("filtering")) or [])
+
+
+def _matches_filter(row, condition):
+    if condition["field"] not in row:
+        return True  # Filters on fields the fake does not model match everything
+    value, expected = row[condition["field"]], condition.get("value")
+    operator = condition.get("operator", "EQUAL")
+    if condition["field"].endswith("_time") and value is not None:
+        value = datetime.strptime(value, "%Y-%m-%dT%H:%M:%S%z").timestamp()
+        expected = float(expected)
+    if operator == "EQUAL":
+        return value == expected
+    if operator in ("IN", "ANY"):
+        return value in expected
+    if operator == "NOT_IN":
+        return value not in expected
+    if operator == "GREATER_THAN":
+        return value is not None and value > expected
+    if operator == "LESS_THAN":
+        return value is not None and value < expected
+    if operator == "CONTAIN":
+        return expected in str(value or "")
+    return True
+
+
+def _pixel_stats(server, pixel):
+    rng = random.Random(f"{server.data.seed}:{pixel['id']}:stats")
+    return [{
+        "start_time": (datetime(2024, 6, 1) - timedelta(hours=hour)).strftime(_TIME_FORMAT),
+        "aggregation": "event",
+        "data": [{"value": event, "count": rng.randint(0, 1000)} for event in _EVENTS],
+    } for hour in range(24)]
+
+
+def _pixel_checks(server, pixel):
+    rng = random.Random(f"{server.data.seed}:{pixel['id']}:checks")
+    return [
+        {"key": key, "title": key.replace("_", " ").capitalize(), "result": rng.choice(["passed", "passed", "failed"])}
+        for key in ("pixel_has_events", "server_events_deduplicated", "event_match_quality")
+    ]
+
+
+def _integration_quality(server, pixel):
+    rng = random.Random(f"{server.data.seed}:{pixel['id']}:quality")
+    return [{
+        "event_name": event,
+        "event_match_quality": {"composite_score": round(rng.uniform(3, 9.5), 1)},
+        "event_coverage": {"percentage": round(rng.uniform(20, 100), 1)},
+    } for event in _EVENTS]
+
+
+def _catalog_stats(server, catalog):
+    return [{"attribute": name, "value": str(catalog.get("product_count", 0))} for name in ("total", "approved")]
+
+
+def _catalog_diagnostics(server, catalog):
+    rng = random.Random(f"{server.data.seed}:{catalog['id']}:diagnostics")
+    return [{
+        "type": diagnostic,
+        "severity": rng.choice(["MUST_FIX", "OPPORTUNITY"]),
+        "number_of_affected_items": rng.randint(0, catalog.get("product_count", 0)),
+    } for diagnostic in ("missing_image", "invalid_price")[:rng.randint(0, 2)]]
+
+
+# Edges generated from the node instead of being stored
+_COMPUTED_EDGES = {
+    "stats": lambda server, node: (
+        _pixel_stats if node["_type"] == "pixel" else _catalog_stats
+    )(server, node),
+    "da_checks": _pixel_checks,
+    "integration_quality": _integration_quality,
+    "diagnostics": _catalog_diagnostics,
+}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def _respond(self, method):
+        split = urlsplit(self.path)
+        params = dict(parse_qsl(split.query, keep_blank_values=True))
+        length = int(self.headers.get("Content-Length") or 0)
+        if length:
+            body = self.rfile.read(length)
+            content_type = self.headers.get("Content-Type", "")
+            if content_type.startswith("application/x-www-form-urlencoded"):
+                params.update(parse_qsl(body.decode(), keep_blank_values=True))
+            elif content_type.startswith("multipart/form-data"):
+                params.update(parse_multipart(content_type, body))
+        status, headers, body = self.server.app.handle(method, split.path, params)
+
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):
+        self._respond("GET")
+
+    def do_POST(self):
+        self._respond("POST")
+
+    def do_DELETE(self):
+        self._respond("DELETE")
+
+    def log_message(self, format, *args):
+        pass  # Keep benchmark and test output clean
+
+
+def _parse_endpoint_values(values):
+    """Parses endpoint=value options; a bare value sets the default."""
+    parsed = {}
+    for value in values or []:
+        endpoint, _, number = value.rpartition("=")
+        parsed[endpoint or "default"] = float(number)
+    return parsed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve a seeded fake Graph API for offline runs.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--businesses", type=int, default=2)
+    parser.add_argument("--ad-accounts", type=int, default=2, help="Ad accounts per business")
+    parser.add_argument("--ad-sets", type=int, default=6, help="Ad sets per ad account")
+    parser.add_argument("--catalogs", type=int, default=3, help="Catalogs per business")
+    parser.add_argument(
+        "--latency", nargs="*", metavar="[ENDPOINT=]SECONDS",
+        help="Latency per endpoint, e.g. insights=0.2 0.02"
+    )
+    parser.add_argument(
+        "--error-rate", nargs="*", metavar="[ENDPOINT=]RATE",
+        help="Transient error probability per endpoint, e.g. batch=0.1"
+    )
+    parser.add_argument("--rate-limit", type=int, default=DEFAULT_RATE_LIMIT, help="Calls per rate window")
+    parser.add_argument("--rate-window", type=float, default=DEFAULT_RATE_WINDOW, help="Seconds")
+    args = parser.parse_args(argv)
+
+    data = FakeGraphData.seeded(
+        seed=args.seed, businesses=args.businesses, ad_accounts=args.ad_accounts, ad_sets=args.ad_sets,
+        catalogs=args.catalogs,
+    )
+    server = FakeGraphAPI(
+        data, args.host, args.port, _parse_endpoint_values(args.latency), _parse_endpoint_values(args.error_rate),
+        args.rate_limit, args.rate_window,
+    ).start()
+    print(f"Fake Graph API serving on {server.url}")
+    print(f"export META_GRAPH_URL={server.url}")
+    print(f"export META_BUSINESS_ID={data.business_ids[0]}")
+    try:
+        server._thread.join()
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,241 @@
+"""
+Graph API batch requests shared by the recipes.
+
+Operations are queued with GraphBatch.add() and sent up to MAX_BATCH_SIZE at a
+time as a single POST to the Graph root. Each add() returns a BatchResult that
+is filled in when the batch executes, so callers keep a handle on their own
+response.
+
+Operations can reference the result of an earlier operation with ref(), e.g. an
+ad set that needs the id of a campaign created in the same batch:
+
+    batch = GraphBatch()
+    campaign = batch.add("POST", f"{ad_account_id}/campaigns", campaign_params)
+    adset_params["campaign_id"] = batch.ref(campaign)
+    adset = batch.add("POST", f"{ad_account_id}/adsets", adset_params)
+    batch.execute()
+    print(campaign.get_id(), adset.get_id())
+
+References inside a single request are resolved by the Graph API. When a chain
+is split across requests, references to operations that already ran are
+replaced with their values before the next request is sent.
+"""
+
+import json
+import re
+from urllib.parse import urlencode
+
+from facebook_business.api import FacebookAdsApi
+from facebook_business.exceptions import FacebookRequestError
+
+# Maximum number of operations the Graph API accepts in one batch request
+MAX_BATCH_SIZE = 50
+
+_REFERENCE_PATTERN = re.compile(r"\{result=([\w\-]+):\$\.([\w\.]+)\}")
+
+
+class BatchResult:
+    """Response of a single operation in a GraphBatch."""
+
+    def __init__(self, name, request):
+        self.name = name
+        self.request = request
+        self.status = None
+        self.headers = {}
+        self.body = None
+
+    @property
+    def executed(self):
+        """Whether the Graph API returned a response for this operation."""
+        return self.status is not None
+
+    def is_success(self):
+        """Returns True if the operation ran and did not return an error."""
+        return self.executed and self.status < 400 and "error" not in self.json()
+
+    def json(self):
+        """Returns the response body decoded from JSON, or {} if there is none."""
+        if not self.body:
+            return {}
+        try:
+            return json.loads(self.body)
+        except ValueError:
+            return {}
+
+    def get_id(self):
+        """Returns the id of the created or fetched object, if any."""
+        return self.json().get("id")
+
+    def error(self):
+        """Returns a FacebookRequestError for a failed operation, otherwise None."""
+        if self.is_success():
+            return None
+        return FacebookRequestError(
+            "Batched call was not successful" if self.executed else "Batched call was not executed",
+            self.request,
+            self.status,
+            self.headers,
+            self.body,
+        )
+
+    def raise_for_error(self):
+        """Raises the FacebookRequestError of a failed operation."""
+        error = self.error()
+        if error is not None:
+            raise error
+
+
+class GraphBatch:
+    """Collects Graph API operations and submits them as batch requests."""
+
+    def __init__(self, api=None, batch_size=MAX_BATCH_SIZE):
+        if not 0 < batch_size <= MAX_BATCH_SIZE:
+            raise ValueError(f"batch_size must be between 1 and {MAX_BATCH_SIZE}")
+        self._api = api
+        self._batch_size = batch_size
+        self._pending = []
+        self._results_by_name = {}
+
+    def __len__(self):
+        return len(self._pending)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.execute()
+
+    def add(self, method, relative_url, params=None, name=None, success=None, failure=None):
+        """
+        Queues an operation and returns its BatchResult.
+
+        Args:
+            method: HTTP method name, e.g. 'GET' or 'POST'.
+            relative_url: Path relative to the Graph root, e.g. 'act_123/campaigns'.
+            params (optional): Request parameters. Values that are not strings are JSON-encoded.
+            name (optional): Name used by ref(). Generated when omitted.
+            success (optional): Called with the BatchResult if the operation succeeds.
+            failure (optional): Called with the BatchResult if the operation fails.
+        """
+        name = name or f"op{len(self._results_by_name)}"
+        if name in self._results_by_name:
+            raise ValueError(f"Duplicate batch operation name: {name}")
+
+        request = {
+            "method": method.upper(),
+            "relative_url": relative_url.lstrip("/"),
+            "params": _encode_params(params or {}),
+        }
+        result = BatchResult(name, request)
+        self._results_by_name[name] = result
+        self._pending.append((result, success, failure))
+        return result
+
+    @staticmethod
+    def ref(result, field="id"):
+        """Returns a placeholder for a field of an earlier operation's response."""
+        return f"{{result={result.name}:$.{field}}}"
+
+    def execute(self):
+        """
+        Sends every queued operation and returns their BatchResults in the order they were added.
+
+        Operations whose dependency failed or that the Graph API did not run are left
+        unexecuted and reported through their failure callback.
+        """
+        results = []
+        while self._pending:
+            chunk = self._pending[:self._batch_size]
+            self._pending = self._pending[self._batch_size:]
+            self._execute_chunk(chunk)
+            results.extend(result for result, _, _ in chunk)
+        return results
+
+    def _execute_chunk(self, chunk):
+        names_in_chunk = {result.name for result, _, _ in chunk}
+        batch = []
+        sent = []
+        for entry in chunk:
+            result = entry[0]
+            try:
+                params = {
+                    key: self._resolve_references(value, names_in_chunk)
+                    for key, value in result.request["params"].items()
+                }
+            except _UnresolvedReference:
+                # A dependency in an earlier request failed, so this one can't run
+                continue
+            call = {
+                "method": result.request["method"],
+                "relative_url": result.request["relative_url"],
+                "name": result.name,
+                "omit_response_on_success": False,
+            }
+            dependencies = [
+                dependency for dependency, _ in _REFERENCE_PATTERN.findall(" ".join(params.values()))
+                if dependency in names_in_chunk
+            ]
+            if dependencies:
+                call["depends_on"] = dependencies[0]
+            if params:
+                if call["method"] in ("GET", "DELETE"):
+                    call["relative_url"] += "?" + urlencode(params)
+                else:
+                    call["body"] = urlencode(params)
+            batch.append(call)
+            sent.append(entry)
+
+        responses = []
+        if batch:
+            api = self._api or FacebookAdsApi.get_default_api()
+            responses = api.call("POST", (), params={"batch": batch, "include_headers": False}).json()
+
+        for (result, _, _), response in zip(sent, responses):
+            if response:
+                result.status = response.get("code")
+                result.headers = {
+                    header["name"]: header["value"] for header in response.get("headers") or []
+                }
+                result.body = response.get("body")
+
+        for result, success, failure in chunk:
+            if result.is_success():
+                if success:
+                    success(result)
+            elif failure:
+                failure(result)
+
+    def _resolve_references(self, value, names_in_chunk):
+        """Substitutes references to operations that ran in an earlier request."""
+
+        def substitute(match):
+            name, path = match.groups()
+            if name in names_in_chunk:
+                return match.group(0)
+            result = self._results_by_name.get(name)
+            if result is None:
+                raise ValueError(f"Unknown batch operation referenced: {name}")
+            resolved = result.json() if result.is_success() else None
+            for key in path.split("."):
+                resolved = resolved.get(key) if isinstance(resolved, dict) else None
+            if resolved is None:
+                raise _UnresolvedReference(name)
+            return str(resolved)
+
+        return _REFERENCE_PATTERN.sub(substitute, value)
+
+
+class _UnresolvedReference(Exception):
+    """Raised when a referenced operation from an earlier request has no usable result."""
+
+
+def _encode_params(params):
+    """JSON-encodes non-string parameter values, matching how the SDK sends them."""
+    encoded = {}
+    for key, value in params.items():
+        if isinstance(value, str):
+            encoded[key] = value
+        else:
+            encoded[key] = json.dumps(value, sort_keys=True, separators=(",", ":"))
+    return encoded
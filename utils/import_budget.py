@@ -0,0 +1,148 @@
+"""
+Cold-start import budget for the entry points.
+
+Each entry point is imported in a fresh interpreter with `python -X importtime`.
+A module fails its budget when its cumulative import time is over the budget,
+or when importing it writes anything to stdout or stderr, which means it still
+does work such as initializing the API, resolving credentials or logging at
+import time.
+
+Run from the repository root:
+
+    python -m utils.import_budget
+    python -m utils.import_budget --repeat 5 stats_for_dashboards.catalog_health_dashboard
+
+The exit status is 1 when any module is over budget.
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Cumulative import time budget in milliseconds for each entry point
+ENTRY_POINT_BUDGETS_MS = {
+    "utils.constants": 50,
+    "utils.test_creds": 50,
+    "stats_for_dashboards.catalog_health_dashboard": 500,
+    "stats_for_dashboards.signals_health_dashboard": 500,
+    "stats_for_dashboards.reels_performant_creative_dashboard": 500,
+    "stats_for_dashboards.multi_business_runner": 500,
+    "scale_good_ads.scale_good_ads": 400,
+    "product_demos.product_sets": 400,
+    "ads_editing.ads_editing_sample": 400,
+}
+
+DEFAULT_REPEAT = 3  # Fresh interpreters per module; the fastest run is kept
+
+
+def parse_importtime(stderr):
+    """
+    Parses `-X importtime` output into {module: (self_us, cumulative_us)}
+
+    Lines that are not import timings, e.g. warnings, are ignored.
+    """
+    timings = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        fields = line[len("import time:"):].split("|")
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            continue  # Header line
+        timings[fields[2].strip()] = (int(fields[0]), int(fields[1]))
+    return timings
+
+
+def measure_import(module, python=sys.executable):
+    """
+    Imports module in a fresh interpreter and returns its profile
+
+    The profile has the cumulative import time in milliseconds, the stdout and stderr
+    written during the import (without the importtime lines) and the five slowest
+    imports by self time.
+    """
+    env = dict(os.environ)
+    # Some scripts import utils modules without the package prefix
+    env["PYTHONPATH"] = os.pathsep.join(
+        [ROOT_DIR, os.path.join(ROOT_DIR, "utils")] + ([env["PYTHONPATH"]] if env.get("PYTHONPATH") else [])
+    )
+    result = subprocess.run(
+        [python, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True, cwd=ROOT_DIR, env=env,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{result.stderr[-2000:]}")
+
+    timings = parse_importtime(result.stderr)
+    slowest = sorted(timings.items(), key=lambda item: -item[1][0])[:5]
+    return {
+        "module": module,
+        "cumulative_ms": timings.get(module, (0, 0))[1] / 1000,
+        "stdout": result.stdout,
+        "stderr": "".join(
+            line for line in result.stderr.splitlines(keepends=True) if not line.startswith("import time:")
+        ),
+        "slowest": [(name, self_us / 1000) for name, (self_us, _) in slowest],
+    }
+
+
+def check_budgets(budgets, repeat=DEFAULT_REPEAT, python=sys.executable):
+    """Measures every module repeat times and returns its fastest profile with budget_ms and ok set."""
+    results = []
+    for module, budget_ms in budgets.items():
+        profile = min(
+            (measure_import(module, python) for _ in range(max(1, repeat))),
+            key=lambda profile: profile["cumulative_ms"],
+        )
+        profile["budget_ms"] = budget_ms
+        profile["ok"] = (
+            profile["cumulative_ms"] <= budget_ms and not profile["stdout"].strip() and not profile["stderr"].strip()
+        )
+        results.append(profile)
+    return results
+
+
+def print_report(results):
+    width = max(len(result["module"]) for result in results)
+    for result in results:
+        status = "ok" if result["ok"] else "OVER BUDGET"
+        if result["stdout"].strip() or result["stderr"].strip():
+            status = "PRINTS ON IMPORT"
+        print(f"{result['module']:<{width}}  {result['cumulative_ms']:8.1f} ms / {result['budget_ms']:5d} ms  {status}")
+        for line in (result["stdout"] + result["stderr"]).strip().splitlines()[:5]:
+            print(f"{'':<{width}}    {line}")
+        if not result["ok"]:
+            for name, self_ms in result["slowest"]:
+                print(f"{'':<{width}}    {self_ms:8.1f} ms  {name}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check the cold-start import time of the entry points.")
+    parser.add_argument(
+        "modules", nargs="*",
+        help="Modules to check (default: every entry point in ENTRY_POINT_BUDGETS_MS)"
+    )
+    parser.add_argument(
+        "--budget-ms", type=int, default=None,
+        help="Budget for every checked module instead of the configured ones"
+    )
+    parser.add_argument(
+        "--repeat", type=int, default=DEFAULT_REPEAT,
+        help=f"Fresh interpreters per module, keeping the fastest (default: {DEFAULT_REPEAT})"
+    )
+    args = parser.parse_args(argv)
+
+    modules = args.modules or list(ENTRY_POINT_BUDGETS_MS)
+    budgets = {
+        module: args.budget_ms if args.budget_ms is not None else ENTRY_POINT_BUDGETS_MS.get(module, 500)
+        for module in modules
+    }
+    results = check_budgets(budgets, args.repeat)
+    print_report(results)
+    return 0 if all(result["ok"] for result in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,292 @@
+"""
+Per-endpoint call counts, bytes and latency of Graph API requests.
+
+ApiMetrics is an api_hooks hook. It aggregates every request by run_id, by the
+recipe function that made it (e.g. get_spend_for_pixels) and by endpoint. An
+endpoint is the method and path with ids replaced, e.g.
+"GET act_{id}/insights" or "GET {id}/insights". For each group it keeps the
+call count, statuses, bytes sent and received and a latency histogram:
+
+    metrics = enable_instrumentation(RUN_ID, export_path="metrics.prom")
+    ...  # Summary table logged and metrics.prom written at exit
+
+Exports are Prometheus text (.prom, .txt) or JSON (.json). Runs are
+instrumented without code changes by setting META_API_METRICS to "1" (summary
+only) or to an export path. The dashboards and scale_good_ads call
+enable_instrumentation_from_env(), and other scripts can be run under
+`python -m utils.instrumentation [--export PATH] script.py [args...]`.
+"""
+
+import argparse
+import atexit
+import json
+import os
+import re
+import sys
+import threading
+from urllib.parse import urlencode
+
+import facebook_business
+
+from utils.api_hooks import register_hook, unregister_hook
+from utils.demo_utils import print_and_log
+
+METRICS_ENV_VAR = "META_API_METRICS"
+
+# Upper bounds in seconds of the latency histogram buckets; the last bucket is +Inf
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_ID_SEGMENT = re.compile(r"(act_)?\d+")
+# Frames in these directories are plumbing, not the recipe code that made a request:
+# utils, the SDK and the standard library (which also holds site-packages on most installs)
+_PLUMBING_DIRS = tuple(
+    os.path.dirname(path) + os.sep for path in (__file__, facebook_business.__file__, threading.__file__)
+)
+
+_active_metrics = None
+
+
+def endpoint_name(call):
+    """Normalizes a request to its endpoint, e.g. 'GET act_{id}/insights', 'POST batch' or 'GET ids'."""
+    segments = call.path_segments
+    if not segments:
+        return f"{call.method} {'batch' if call.method == 'POST' else 'ids'}"
+    normalized = [
+        ("act_{id}" if segment.startswith("act_") else "{id}") if _ID_SEGMENT.fullmatch(segment) else segment
+        for segment in segments
+    ]
+    return f"{call.method} {'/'.join(normalized)}"
+
+
+def caller_name(frame):
+    """Names the first function outside the SDK, utils and the standard library, e.g. 'helpers.get_spend_for_pixels'."""
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if not filename.startswith(_PLUMBING_DIRS):
+            name = getattr(frame.f_code, "co_qualname", frame.f_code.co_name).split(".<locals>")[0]
+            module = os.path.splitext(os.path.basename(filename))[0]
+            return f"{module}.{name}"
+        frame = frame.f_back
+    return "<background>"  # e.g. pages loaded ahead on a prefetch thread
+
+
+class EndpointStats:
+    """Counters and latency histogram of one (run_id, caller, endpoint) group."""
+
+    def __init__(self):
+        self.count = 0
+        self.statuses = {}
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.seconds = 0.0
+        self.max_seconds = 0.0
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+
+    def add(self, status, bytes_sent, bytes_received, seconds):
+        self.count += 1
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+        self.bytes_sent += bytes_sent
+        self.bytes_received += bytes_received
+        self.seconds += seconds
+        self.max_seconds = max(self.max_seconds, seconds)
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if seconds <= bound:
+                self.buckets[i] += 1
+                return
+        self.buckets[-1] += 1
+
+    @property
+    def errors(self):
+        return sum(count for status, count in self.statuses.items() if not status or status >= 400)
+
+    def quantile(self, q):
+        """Upper bound of the histogram bucket holding the q quantile, capped at the slowest call."""
+        rank, seen = q * self.count, 0
+        for bound, count in zip(LATENCY_BUCKETS + (self.max_seconds,), self.buckets):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max_seconds)
+        return self.max_seconds
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "statuses": {str(status): count for status, count in self.statuses.items()},
+            "bytes_sent": self.bytes_sent,
+            "bytes_received": self.bytes_received,
+            "seconds": round(self.seconds, 6),
+            "max_seconds": round(self.max_seconds, 6),
+            "buckets": dict(zip([str(bound) for bound in LATENCY_BUCKETS] + ["+Inf"], self.buckets)),
+        }
+
+
+class ApiMetrics:
+    """Hook aggregating Graph API requests by run_id, caller and endpoint."""
+
+    def __init__(self, run_id=None):
+        self.run_id = run_id
+        self.stats = {}
+        self._lock = threading.Lock()
+
+    def after_call(self, call):
+        if call.response is not None:
+            body = call.response.body()
+        elif call.error is not None and hasattr(call.error, "body"):
+            body = call.error.body()
+        else:
+            body = None
+        if body is not None and not isinstance(body, (str, bytes)):
+            body = json.dumps(body)
+        params = {
+            key: value if isinstance(value, str) else json.dumps(value) for key, value in (call.params or {}).items()
+        }
+        key = (str(self.run_id), caller_name(sys._getframe(1)), endpoint_name(call))
+        with self._lock:
+            stats = self.stats.get(key)
+            if stats is None:
+                stats = self.stats[key] = EndpointStats()
+            stats.add(call.status, len(urlencode(params)), len(body or ""), call.elapsed or 0.0)
+
+    def snapshot(self):
+        """Returns [((run_id, caller, endpoint), stats)] sorted by total time, slowest first."""
+        with self._lock:
+            return sorted(self.stats.items(), key=lambda item: -item[1].seconds)
+
+    def summary_table(self):
+        rows = self.snapshot()
+        if not rows:
+            return "No Graph API requests were made"
+        totals = {}
+        for (run_id, caller, _), stats in rows:
+            totals[(run_id, caller)] = totals.get((run_id, caller), 0.0) + stats.seconds
+        header = (
+            f"{'caller':<55} {'endpoint':<35} {'calls':>6} {'errors':>6} {'sent KB':>8} {'recv KB':>9} "
+            f"{'total s':>8} {'share':>6} {'mean ms':>8} {'p50 ms':>8} {'p95 ms':>8} {'max ms':>8}"
+        )
+        lines = [header, "-" * len(header)]
+        several_runs = len({run_id for run_id, _ in totals}) > 1
+        for (run_id, caller, endpoint), stats in rows:
+            caller_seconds = totals[(run_id, caller)]
+            label = f"{run_id}:{caller}" if several_runs else caller
+            lines.append(
+                f"{label[-55:]:<55} {endpoint[-35:]:<35} {stats.count:>6} {stats.errors:>6} "
+                f"{stats.bytes_sent / 1024:>8.1f} {stats.bytes_received / 1024:>9.1f} {stats.seconds:>8.2f} "
+                f"{100 * stats.seconds / caller_seconds if caller_seconds else 0:>5.0f}% "
+                f"{1000 * stats.seconds / stats.count:>8.1f} {1000 * stats.quantile(0.5):>8.1f} "
+                f"{1000 * stats.quantile(0.95):>8.1f} {1000 * stats.max_seconds:>8.1f}"
+            )
+        return "\n".join(lines)
+
+    def to_json(self):
+        return [
+            {"run_id": run_id, "caller": caller, "endpoint": endpoint, **stats.to_dict()}
+            for (run_id, caller, endpoint), stats in self.snapshot()
+        ]
+
+    def to_prometheus(self):
+        """Metrics in the Prometheus text exposition format."""
+        def labels(run_id, caller, endpoint, **extra):
+            pairs = dict(run_id=run_id, caller=caller, endpoint=endpoint, **extra)
+            escaped = {name: str(value).replace("\\", "\\\\").replace('"', '\\"') for name, value in pairs.items()}
+            return "{" + ",".join(f'{name}="{value}"' for name, value in escaped.items()) + "}"
+
+        lines = [
+            "# HELP graph_api_requests_total Graph API requests by response status.",
+            "# TYPE graph_api_requests_total counter",
+        ]
+        rows = self.snapshot()
+        for key, stats in rows:
+            for status, count in sorted(stats.statuses.items(), key=lambda item: str(item[0])):
+                lines.append(f"graph_api_requests_total{labels(*key, status=status)} {count}")
+        for name, attribute, help_text in (
+            ("graph_api_request_bytes_total", "bytes_sent", "Bytes of request parameters sent."),
+            ("graph_api_response_bytes_total", "bytes_received", "Bytes of response bodies received."),
+        ):
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} counter"]
+            lines += [f"{name}{labels(*key)} {getattr(stats, attribute)}" for key, stats in rows]
+        lines += [
+            "# HELP graph_api_request_duration_seconds Graph API request latency.",
+            "# TYPE graph_api_request_duration_seconds histogram",
+        ]
+        for key, stats in rows:
+            cumulative = 0
+            for bound, count in zip([str(bound) for bound in LATENCY_BUCKETS] + ["+Inf"], stats.buckets):
+                cumulative += count
+                lines.append(f"graph_api_request_duration_seconds_bucket{labels(*key, le=bound)} {cumulative}")
+            lines.append(f"graph_api_request_duration_seconds_sum{labels(*key)} {stats.seconds:.6f}")
+            lines.append(f"graph_api_request_duration_seconds_count{labels(*key)} {stats.count}")
+        return "\n".join(lines) + "\n"
+
+    def export(self, path):
+        """Writes the metrics as JSON for .json paths and as Prometheus text otherwise."""
+        with open(path, "w") as file:
+            if path.endswith(".json"):
+                json.dump(self.to_json(), file, indent=2)
+            else:
+                file.write(self.to_prometheus())
+        return path
+
+    def report(self, export_path=None):
+        """Logs the summary table and writes the export, if any."""
+        print_and_log(self.run_id, f"Graph API requests by caller and endpoint:\n{self.summary_table()}")
+        if export_path:
+            print_and_log(self.run_id, f"Wrote Graph API metrics to {self.export(export_path)}")
+
+
+def enable_instrumentation(run_id=None, export_path=None, report_at_exit=True):
+    """
+    Records metrics for every SDK request and returns the ApiMetrics
+
+    Calling it again keeps the same metrics and switches later requests to run_id.
+    """
+    global _active_metrics
+    if _active_metrics is None:
+        _active_metrics = register_hook(ApiMetrics(run_id))
+        if report_at_exit:
+            metrics = _active_metrics
+            atexit.register(lambda: metrics.report(export_path))
+    elif run_id is not None:
+        _active_metrics.run_id = run_id
+    return _active_metrics
+
+
+def enable_instrumentation_from_env(run_id=None):
+    """Enables instrumentation when META_API_METRICS is set: '1' for the summary, or a path to export to."""
+    setting = os.environ.get(METRICS_ENV_VAR)
+    if not setting:
+        return None
+    return enable_instrumentation(run_id, export_path=None if setting in ("1", "true", "yes") else setting)
+
+
+def disable_instrumentation():
+    global _active_metrics
+    if _active_metrics is not None:
+        unregister_hook(_active_metrics)
+        _active_metrics = None
+
+
+def get_active_metrics():
+    return _active_metrics
+
+
+def main(argv=None):
+    # Imported here to keep the hook itself free of the cassette module
+    from utils.cassettes import run_script
+
+    parser = argparse.ArgumentParser(description="Run a recipe and report its Graph API requests per endpoint.")
+    parser.add_argument("--export", default=None, help="Write the metrics to this .prom, .txt or .json file")
+    parser.add_argument("script", help="Recipe to run, e.g. scale_good_ads/scale_good_ads.py")
+    parser.add_argument("script_args", nargs=argparse.REMAINDER, help="Arguments passed to the recipe")
+    args = parser.parse_args(argv)
+
+    metrics = enable_instrumentation("cli", report_at_exit=False)
+    try:
+        run_script(args.script, args.script_args)
+    finally:
+        metrics.report(args.export)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
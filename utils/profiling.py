@@ -0,0 +1,247 @@
+"""
+Shared --profile option for the recipe entry points.
+
+    parser = argparse.ArgumentParser(...)
+    add_profile_arguments(parser)
+    args = parser.parse_args()
+    with profiled(args.profile, output_dir=args.profile_dir) as profile:
+        main(..., run_id=profile.run_id)
+
+Modes, each writing files named after the run_id into --profile-dir:
+
+- cpu: cProfile of the main thread (<run_id>.cpu.pstats) plus a stack sampler
+  over all threads, keeping only samples that were running Python code
+  (<run_id>.cpu.collapsed)
+- wall: the stack sampler alone, keeping every sample of every thread, with
+  the leaf frame marking [network] or [waiting] (<run_id>.wall.collapsed)
+- memory: tracemalloc allocations by line (<run_id>.memory.txt) and by stack,
+  weighted by bytes (<run_id>.memory.collapsed)
+
+Collapsed files are one "frame;frame;frame count" line per stack, as read by
+flamegraph.pl, speedscope and similar tools. In cpu and wall mode, samples are
+split into waiting on the network, facebook_business CPU work (building an
+object for every returned row), other CPU work and waiting on locks, queues
+or the throttle, and the split is logged at the end of the run.
+"""
+
+import io
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+from utils.demo_utils import print_and_log
+
+PROFILE_MODES = ("cpu", "wall", "memory")
+DEFAULT_PROFILE_DIR = "profiles"
+DEFAULT_SAMPLE_INTERVAL = 0.005  # Seconds between stack samples
+MEMORY_TRACEBACK_DEPTH = 25
+
+NETWORK, SDK, CPU, WAITING = "network", "facebook_business", "cpu", "waiting"
+
+# Leaf frames that mean a thread is blocked on a socket
+_NETWORK_FILES = ("socket.py", "ssl.py", "selectors.py", "client.py", "connection.py")
+# Leaf frames that mean a thread is blocked on another thread or sleeping on purpose
+_WAITING_FILES = ("threading.py", "queue.py", "_base.py", "thread.py")
+_WAITING_FUNCTIONS = {("throttle.py", "acquire"), ("async_reports.py", "wait_for_report_runs")}
+
+
+def add_profile_arguments(parser):
+    """Adds --profile and --profile-dir to an argparse parser."""
+    parser.add_argument(
+        "--profile", choices=PROFILE_MODES, default=None,
+        help="Profile the run: cpu (cProfile and sampled stacks), wall (sampled stacks of all threads) "
+             "or memory (tracemalloc)"
+    )
+    parser.add_argument(
+        "--profile-dir", default=DEFAULT_PROFILE_DIR,
+        help=f"Directory for the profile files (default: {DEFAULT_PROFILE_DIR})"
+    )
+    return parser
+
+
+def new_run_id():
+    return str(abs(hash(time.time())))[:8]
+
+
+def classify_stack(stack):
+    """Returns the category of a stack given as [(file basename, function)], leaf first."""
+    if not stack:
+        return WAITING
+    leaf_file, leaf_function = stack[0]
+    if leaf_file in _NETWORK_FILES:
+        return NETWORK
+    if leaf_file in _WAITING_FILES or (leaf_file, leaf_function) in _WAITING_FUNCTIONS:
+        return WAITING
+    return CPU
+
+
+def _frame_label(code):
+    module = os.path.splitext(os.path.basename(code.co_filename))[0]
+    return f"{module}:{getattr(code, 'co_qualname', code.co_name)}"
+
+
+class StackSampler:
+    """Samples the Python stack of every thread on a background thread."""
+
+    def __init__(self, interval=DEFAULT_SAMPLE_INTERVAL):
+        self.interval = interval
+        self.stacks = Counter()  # (category, collapsed stack) -> samples
+        self.categories = Counter()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self):
+        own_ident = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident != own_ident:
+                    self._sample(names.get(ident, str(ident)), frame)
+
+    def _sample(self, thread_name, frame):
+        stack, labels, in_sdk = [], [], False
+        while frame is not None:
+            code = frame.f_code
+            stack.append((os.path.basename(code.co_filename), code.co_name))
+            labels.append(_frame_label(code))
+            in_sdk = in_sdk or "facebook_business" in code.co_filename
+            frame = frame.f_back
+        category = classify_stack(stack)
+        if category == CPU and in_sdk:
+            category = SDK
+        labels.append(thread_name)
+        if category in (NETWORK, WAITING):
+            labels.insert(0, f"[{category}]")
+        self.stacks[(category, ";".join(reversed(labels)))] += 1
+        self.categories[category] += 1
+
+    def write_collapsed(self, path, categories):
+        with open(path, "w") as file:
+            for (category, stack), count in self.stacks.most_common():
+                if category in categories:
+                    file.write(f"{stack} {count}\n")
+        return path
+
+    def split_lines(self):
+        total = sum(self.categories.values()) or 1
+        labels = {
+            NETWORK: "waiting on the network",
+            SDK: "facebook_business CPU",
+            CPU: "other CPU",
+            WAITING: "waiting on threads, queues or the throttle",
+        }
+        return [
+            f"  {labels[category]:<45} {self.categories[category] * self.interval:8.2f} thread-s "
+            f"({100 * self.categories[category] / total:.0f}%)"
+            for category in (NETWORK, SDK, CPU, WAITING)
+        ]
+
+
+class Profile:
+    """A profiled run; paths lists the files written once the run ends."""
+
+    def __init__(self, mode, run_id, output_dir):
+        self.mode = mode
+        self.run_id = run_id
+        self.output_dir = output_dir
+        self.paths = []
+
+    def path(self, suffix):
+        return os.path.join(self.output_dir, f"{self.run_id}.{self.mode}.{suffix}")
+
+
+@contextmanager
+def profiled(mode, run_id=None, output_dir=DEFAULT_PROFILE_DIR, sample_interval=DEFAULT_SAMPLE_INTERVAL):
+    """
+    Profiles the block in the given mode and logs a summary under run_id
+
+    With mode None the block runs unprofiled. run_id defaults to a new id,
+    available as profile.run_id to pass on to the profiled main().
+    """
+    profile = Profile(mode, run_id or new_run_id(), output_dir)
+    if mode is None:
+        yield profile
+        return
+    if mode not in PROFILE_MODES:
+        raise ValueError(f"Unsupported profile mode {mode!r}, expected one of {PROFILE_MODES}")
+    os.makedirs(output_dir, exist_ok=True)
+    # Profilers are imported only for profiled runs to keep the entry points' cold start unchanged
+    import cProfile
+    import tracemalloc
+
+    sampler = StackSampler(sample_interval).start() if mode in ("cpu", "wall") else None
+    profiler = cProfile.Profile() if mode == "cpu" else None
+    if mode == "memory":
+        tracemalloc.start(MEMORY_TRACEBACK_DEPTH)
+    wall_start, cpu_start = time.perf_counter(), time.process_time()
+    if profiler is not None:
+        profiler.enable()
+    try:
+        yield profile
+    finally:
+        if profiler is not None:
+            profiler.disable()
+        wall, cpu = time.perf_counter() - wall_start, time.process_time() - cpu_start
+        lines = [f"Profile ({mode}): wall {wall:.2f}s, process CPU {cpu:.2f}s"]
+        if sampler is not None:
+            sampler.stop()
+            lines += sampler.split_lines()
+            categories = (SDK, CPU) if mode == "cpu" else (NETWORK, SDK, CPU, WAITING)
+            profile.paths.append(sampler.write_collapsed(profile.path("collapsed"), categories))
+        if profiler is not None:
+            profiler.dump_stats(profile.path("pstats"))
+            profile.paths.append(profile.path("pstats"))
+            lines.append(_top_functions(profiler))
+        if mode == "memory":
+            lines += _write_memory_profile(profile)
+        lines.append(f"Wrote {', '.join(profile.paths)}")
+        print_and_log(profile.run_id, "\n".join(lines))
+
+
+def _top_functions(profiler, limit=15):
+    import pstats
+
+    output = io.StringIO()
+    stats = pstats.Stats(profiler, stream=output)
+    stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(limit)
+    return output.getvalue().strip()
+
+
+def _write_memory_profile(profile):
+    import tracemalloc
+
+    snapshot = tracemalloc.take_snapshot().filter_traces([
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    ])
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    by_line = snapshot.statistics("lineno")
+    with open(profile.path("txt"), "w") as file:
+        file.write(f"Current {current / 2 ** 20:.1f} MiB, peak {peak / 2 ** 20:.1f} MiB\n\n")
+        for stat in by_line[:50]:
+            file.write(f"{stat}\n")
+    with open(profile.path("collapsed"), "w") as file:
+        for stat in snapshot.statistics("traceback"):
+            # Tracebacks run from the oldest frame, as collapsed stacks do
+            stack = ";".join(f"{os.path.basename(frame.filename)}:{frame.lineno}" for frame in stat.traceback)
+            file.write(f"{stack} {stat.size}\n")
+    profile.paths += [profile.path("txt"), profile.path("collapsed")]
+    return [f"  traced memory {current / 2 ** 20:.1f} MiB, peak {peak / 2 ** 20:.1f} MiB"] + [
+        f"  {stat}" for stat in by_line[:10]
+    ]
@@ -1,11 +1,20 @@
-import os
+import logging
 from .constants import get_env_var
 
+logger = logging.getLogger(__name__)
+
 # Long-lived access token for Meta API
 # This is a placeholder token - never commit real tokens to git
 DEFAULT_TOKEN = "PLACEHOLDER_META_ACCESS_TOKEN"
-LL_ACCESS_TOKEN = get_env_var("META_ACCESS_TOKEN", DEFAULT_TOKEN, is_required=True)
 
-# Warning: this is a placeholder token, you should replace it with a valid token
-if LL_ACCESS_TOKEN == DEFAULT_TOKEN:
-    print("WARNING: Using placeholder access token. For production use, set META_ACCESS_TOKEN environment variable.")
\ No newline at end of file
+def __getattr__(name):
+    # Resolved on first access (PEP 562) so that importing this module has no side effects
+    if name != "LL_ACCESS_TOKEN":
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    token = get_env_var("META_ACCESS_TOKEN", DEFAULT_TOKEN, is_required=True)
+
+    # Warning: this is a placeholder token, you should replace it with a valid token
+    if token == DEFAULT_TOKEN:
+        logger.warning("Using placeholder access token. For production use, set META_ACCESS_TOKEN environment variable.")
+    globals()[name] = token
+    return token
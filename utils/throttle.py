@@ -0,0 +1,286 @@
+"""
+Adaptive throttling driven by the Graph API usage headers.
+
+Every response carries how much of the rate limit has been used:
+
+- X-Business-Use-Case-Usage: per business or ad account, call count, CPU time
+  and total time as a percentage, plus estimated_time_to_regain_access (minutes)
+- X-Ad-Account-Usage: acc_id_util_pct for the ad account the request belongs
+  to, plus reset_time_duration (seconds) once throttled. The header does not
+  name the account; see ad_account_usage_key
+- X-App-Usage: app-wide call count, CPU time and total time as a percentage
+
+The Throttle reads these after every response and keeps a token bucket per
+account plus one for the app. While usage is below slowdown_usage requests
+flow at the base rate; between slowdown_usage and target_usage the rate drops
+linearly, and once usage reaches target_usage, or the API reports a time to
+regain access, requests wait. recommended_concurrency() applies the same
+headroom to worker counts so executors scale down together with the buckets:
+
+    throttle = enable_throttling()
+    workers = throttle.recommended_concurrency(8)
+"""
+
+import json
+import threading
+import time
+
+from utils.api_hooks import register_hook, unregister_hook
+
+DEFAULT_RATE = 20.0  # Requests per second per bucket while usage is low
+DEFAULT_BURST = 20  # Requests a bucket allows back to back
+MIN_RATE = 0.2  # Requests per second once usage reaches target_usage
+SLOWDOWN_USAGE = 50.0  # Usage percentage where the rate starts to drop
+TARGET_USAGE = 90.0  # Usage percentage the throttle keeps below
+
+APP_KEY = "app"
+
+BUSINESS_USE_CASE_HEADER = "x-business-use-case-usage"
+AD_ACCOUNT_USAGE_HEADER = "x-ad-account-usage"
+APP_USAGE_HEADER = "x-app-usage"
+
+
+def account_key(node_id):
+    """Normalizes a node id so 'act_123' and '123' share one bucket."""
+    if not node_id:
+        return None
+    node_id = str(node_id)
+    return node_id[4:] if node_id.startswith("act_") else node_id
+
+
+def _load(value):
+    if not value:
+        return None
+    if isinstance(value, (dict, list)):
+        return value
+    try:
+        return json.loads(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _number(value):
+    try:
+        return float(value or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _percent(usage, *names):
+    values = [_number(usage.get(name)) for name in names]
+    return max(values) if values else 0.0
+
+
+def ad_account_usage_key(node_id, business_usage=None):
+    """
+    The bucket X-Ad-Account-Usage is counted against
+
+    For requests on an ad account that is the account in the path. Requests on an ad
+    set, ad or creative report the owning account as the only key of
+    X-Business-Use-Case-Usage, so that key is used. Anything else, e.g. ?ids= requests,
+    can't be attributed to one account and is counted against the app.
+    """
+    node_id = str(node_id or "")
+    if node_id.startswith("act_"):
+        return account_key(node_id)
+    if isinstance(business_usage, dict) and len(business_usage) == 1:
+        return account_key(next(iter(business_usage)))
+    return APP_KEY
+
+
+def parse_usage_headers(headers, node_id=None):
+    """
+    Returns {key: (usage_percent, regain_seconds)} for every usage header in a response
+
+    headers must have lower-case names. Malformed or missing headers are ignored. The ad
+    account header is attributed with ad_account_usage_key.
+    """
+    usage = {}
+
+    def merge(key, percent, regain_seconds):
+        old_percent, old_regain = usage.get(key, (0.0, 0.0))
+        usage[key] = (max(old_percent, percent), max(old_regain, regain_seconds))
+
+    app_usage = _load(headers.get(APP_USAGE_HEADER))
+    if isinstance(app_usage, dict):
+        merge(APP_KEY, _percent(app_usage, "call_count", "total_cputime", "total_time"), 0.0)
+
+    business_usage = _load(headers.get(BUSINESS_USE_CASE_HEADER))
+    if isinstance(business_usage, dict):
+        for business_id, entries in business_usage.items():
+            for entry in entries if isinstance(entries, list) else [entries]:
+                if not isinstance(entry, dict):
+                    continue
+                merge(
+                    account_key(business_id),
+                    _percent(entry, "call_count", "total_cputime", "total_time"),
+                    _number(entry.get("estimated_time_to_regain_access")) * 60,
+                )
+
+    ad_account_usage = _load(headers.get(AD_ACCOUNT_USAGE_HEADER))
+    if isinstance(ad_account_usage, dict):
+        merge(
+            ad_account_usage_key(node_id, business_usage),
+            _number(ad_account_usage.get("acc_id_util_pct")),
+            _number(ad_account_usage.get("reset_time_duration")),
+        )
+    return usage
+
+
+class TokenBucket:
+    """Token bucket whose rate can change while it is in use. Not thread-safe on its own."""
+
+    def __init__(self, rate, capacity, now):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated_at = now
+
+    def refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def wait_time(self, now):
+        """Seconds until a token is available."""
+        self.refill(now)
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self):
+        self.tokens -= 1
+
+
+class Throttle:
+    """
+    Per-account and app-wide request throttling adapted to the reported usage
+
+    Use acquire(node_id) before a request and observe(node_id, headers) after it,
+    or enable_throttling() to have every SDK request do both.
+    """
+
+    def __init__(self, rate=DEFAULT_RATE, burst=DEFAULT_BURST, slowdown_usage=SLOWDOWN_USAGE,
+                 target_usage=TARGET_USAGE, clock=time.monotonic, sleep=time.sleep):
+        self.rate = rate
+        self.burst = burst
+        self.slowdown_usage = slowdown_usage
+        self.target_usage = target_usage
+        self._clock = clock
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self._buckets = {}
+        self._usage = {}  # key -> usage percentage
+        self._regain_at = {}  # key -> clock time when access is regained
+
+    def headroom(self, usage):
+        """Fraction of the base rate allowed at a usage percentage, from 1.0 down to 0.0 at target_usage."""
+        if usage <= self.slowdown_usage:
+            return 1.0
+        if usage >= self.target_usage:
+            return 0.0
+        return (self.target_usage - usage) / (self.target_usage - self.slowdown_usage)
+
+    def _bucket(self, key, now):
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = TokenBucket(self.rate, self.burst, now)
+        return bucket
+
+    def _keys(self, node_id):
+        key = account_key(node_id)
+        return [APP_KEY, key] if key and key != APP_KEY else [APP_KEY]
+
+    def acquire(self, node_id=None):
+        """Blocks until a request on node_id is allowed by the app and account buckets."""
+        while True:
+            with self._lock:
+                now = self._clock()
+                keys = self._keys(node_id)
+                wait = max(
+                    max(self._regain_at.get(key, now) - now, 0.0) for key in keys
+                )
+                if not wait:
+                    buckets = [self._bucket(key, now) for key in keys]
+                    wait = max(bucket.wait_time(now) for bucket in buckets)
+                    if not wait:
+                        for bucket in buckets:
+                            bucket.take()
+                        return
+            self._sleep(wait)
+
+    def observe(self, node_id, headers):
+        """Updates usage and bucket rates from the (lower-case) headers of a response on node_id."""
+        usage = parse_usage_headers(headers, node_id)
+        if not usage:
+            return
+        with self._lock:
+            now = self._clock()
+            for key, (percent, regain_seconds) in usage.items():
+                self._usage[key] = percent
+                if regain_seconds:
+                    self._regain_at[key] = now + regain_seconds
+                else:
+                    self._regain_at.pop(key, None)
+                bucket = self._bucket(key, now)
+                bucket.refill(now)
+                bucket.rate = max(MIN_RATE, self.rate * self.headroom(percent))
+
+    def recommended_concurrency(self, max_workers, node_id=None):
+        """
+        Scales max_workers by the least headroom reported, for node_id and the app or across every key
+
+        Returns at least 1.
+        """
+        max_workers = max(1, max_workers or 1)
+        with self._lock:
+            now = self._clock()
+            keys = self._keys(node_id) if node_id else list(self._usage)
+            if any(self._regain_at.get(key, now) > now for key in keys):
+                return 1
+            headroom = min((self.headroom(self._usage[key]) for key in keys if key in self._usage), default=1.0)
+        return max(1, int(round(max_workers * headroom)))
+
+    def state(self):
+        """Returns {key: {'usage', 'rate', 'tokens', 'regain_in'}} for every bucket seen so far."""
+        with self._lock:
+            now = self._clock()
+            state = {}
+            for key, bucket in self._buckets.items():
+                bucket.refill(now)
+                state[key] = {
+                    "usage": self._usage.get(key, 0.0),
+                    "rate": bucket.rate,
+                    "tokens": bucket.tokens,
+                    "regain_in": max(self._regain_at.get(key, now) - now, 0.0),
+                }
+            return state
+
+    # api_hooks interface
+    def before_call(self, call):
+        self.acquire(call.node_id)
+
+    def after_call(self, call):
+        self.observe(call.node_id, call.response_headers)
+
+
+_active_throttle = None
+
+
+def enable_throttling(throttle=None):
+    """Throttles every SDK request with throttle (or a default Throttle) and returns it."""
+    global _active_throttle
+    if _active_throttle is not None and throttle is None:
+        return _active_throttle
+    disable_throttling()
+    _active_throttle = register_hook(throttle or Throttle())
+    return _active_throttle
+
+
+def disable_throttling():
+    global _active_throttle
+    if _active_throttle is not None:
+        unregister_hook(_active_throttle)
+        _active_throttle = None
+
+
+def get_active_throttle():
+    """The throttle installed by enable_throttling, or None."""
+    return _active_throttle